@@ -0,0 +1,107 @@
+"""
+HTTP load generation shared by the bench_http and bench_endpoints commands.
+"""
+import http.client
+import math
+import threading
+import time
+
+
+class LoadResult:
+    """The successful responses and errors of one measured run."""
+
+    def __init__(self, elapsed):
+        self.elapsed = elapsed
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.error_statuses = {}
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def requests_per_second(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p):
+        """The p-th percentile latency in seconds, interpolated between the closest ranks."""
+        values = sorted(self.latencies)
+        if not values:
+            return None
+        rank = (len(values) - 1) * p / 100
+        low, high = math.floor(rank), math.ceil(rank)
+        return values[low] + (values[high] - values[low]) * (rank - low)
+
+    @property
+    def queries_per_request(self):
+        """Mean X-DB-Queries of the responses, None when the server does not send it."""
+        if not self.queries:
+            return None
+        return sum(self.queries) / len(self.queries)
+
+
+def run_load(url, make_request, concurrency, duration, warmup=0.0):
+    """
+    Sends requests to the server at url (a urlsplit() result) from
+    concurrency keep-alive clients, first for warmup seconds without
+    measuring, then for duration seconds. make_request(client, i) returns the
+    (method, path, headers, body) of the i-th request of a client; path is
+    relative to the path of url. Responses with a status of 400 or more count
+    as errors.
+    """
+    connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    prefix = url.path.rstrip("/")
+    measuring = threading.Event()
+    stopping = threading.Event()
+    results = []
+    results_lock = threading.Lock()
+
+    def client(index):
+        connection = connection_class(url.hostname, url.port, timeout=30)
+        latencies, queries, errors, i = [], [], {}, 0
+        while not stopping.is_set():
+            method, path, headers, body = make_request(index, i)
+            i += 1
+            started = time.perf_counter()
+            try:
+                connection.request(method, prefix + path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                query_count = response.getheader("X-DB-Queries")
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status, query_count = None, None
+            elapsed = time.perf_counter() - started
+            if measuring.is_set() and not stopping.is_set():
+                if status is not None and status < 400:
+                    latencies.append(elapsed)
+                    if query_count is not None:
+                        queries.append(int(query_count))
+                else:
+                    errors[status] = errors.get(status, 0) + 1
+        connection.close()
+        with results_lock:
+            results.append((latencies, queries, errors))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(duration)
+    stopping.set()
+    result = LoadResult(time.perf_counter() - started)
+    for thread in threads:
+        thread.join()
+
+    for latencies, queries, errors in results:
+        result.latencies.extend(latencies)
+        result.queries.extend(queries)
+        for status, count in errors.items():
+            result.errors += count
+            result.error_statuses[status] = result.error_statuses.get(status, 0) + count
+    return result
@@ -0,0 +1,503 @@
+import itertools
+import json
+import subprocess
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from benchmark.load import run_load
+from category.models import Category
+from expense.models import Expense
+from income.models import Income
+from investment.models import Investment, Portfolio
+from report.cache import bump_data_version
+
+# name: (method, path, JSON body). "{...}" fields are filled in with the ids
+# and credentials of the user each client runs as; {row} and {row_name} with
+# a row created for the endpoint (see ROW_ENDPOINTS). Writes come last so the
+# reports above them are measured on the seeded data.
+ENDPOINTS = {
+    "user-profile": ("GET", "/api/user/profile/", None),
+    "expense-list": ("GET", "/api/expense/", None),
+    "expense-page": ("GET", "/api/expense/?page_size=50", None),
+    "expense-detail": ("GET", "/api/expense/{expense}/", None),
+    "expense-export-csv": ("GET", "/api/expense/export-csv/", None),
+    "income-list": ("GET", "/api/income/", None),
+    "income-detail": ("GET", "/api/income/{income}/", None),
+    "income-export-csv": ("GET", "/api/income/export-csv/", None),
+    "category-list": ("GET", "/api/category/", None),
+    "category-detail": ("GET", "/api/category/{category}/", None),
+    "portfolio-list": ("GET", "/api/portfolios/", None),
+    "portfolio-detail": ("GET", "/api/portfolios/{portfolio}/", None),
+    "investment-list": ("GET", "/api/portfolios/{portfolio}/investments/", None),
+    "investment-detail": ("GET", "/api/investments/{investment}/", None),
+    "investment-export-csv": ("GET", "/api/investments/export-csv/", None),
+    "report-date-range": ("GET", "/api/report-date-range/?select=expense&from_date={month_ago}&to_date={today}", None),
+    "report-category": ("GET", "/api/report-category/", None),
+    "report-day-graph": ("GET", "/api/report-day-graph/", None),
+    "report-week-graph": ("GET", "/api/report-week-graph/", None),
+    "report-month-graph": ("GET", "/api/report-month-graph/", None),
+    "report-most-recent-expenses": ("GET", "/api/report-most-recent-expenses/", None),
+    "report-net": ("GET", "/api/report-net/", None),
+    "report-portfolios": ("GET", "/api/report-portfolios/", None),
+    "report-weekly-investments": ("GET", "/api/report-weekly-investments/", None),
+    "report-total-investments": ("GET", "/api/report-total-investments/", None),
+    "report-dashboard": ("GET", "/api/report-dashboard/", None),
+    "report-cache-stats": ("GET", "/api/report-cache-stats/", None),
+    "async-report-date-range": (
+        "GET",
+        "/api/async/report-date-range/?select=expense&from_date={month_ago}&to_date={today}",
+        None,
+    ),
+    "async-report-category": ("GET", "/api/async/report-category/", None),
+    "async-report-day-graph": ("GET", "/api/async/report-day-graph/", None),
+    "async-report-week-graph": ("GET", "/api/async/report-week-graph/", None),
+    "async-report-month-graph": ("GET", "/api/async/report-month-graph/", None),
+    "async-report-most-recent-expenses": ("GET", "/api/async/report-most-recent-expenses/", None),
+    "async-report-net": ("GET", "/api/async/report-net/", None),
+    "async-report-portfolios": ("GET", "/api/async/report-portfolios/", None),
+    "async-report-weekly-investments": ("GET", "/api/async/report-weekly-investments/", None),
+    "async-report-total-investments": ("GET", "/api/async/report-total-investments/", None),
+    "users-list": ("GET", "/api/users/", None),
+    "users-detail": ("GET", "/api/users/{user}/", None),
+    "memory-stats": ("GET", "/api/memory-stats/", None),
+    "token": ("POST", "/api/token/", {"username": "{username}", "password": "{password}"}),
+    "register": ("POST", "/api/user/register/", {"username": "{new_username}", "password": "{password}"}),
+    "expense-create": (
+        "POST",
+        "/api/expense/",
+        {"name": "Benchmark", "amount": "12.50", "description": "{marker}", "category": "{category}"},
+    ),
+    "expense-duplicate": ("POST", "/api/expense/{row}/", None),
+    "expense-update": (
+        "PUT",
+        "/api/expense/{row}/",
+        {"name": "Benchmark", "amount": "15.00", "description": "{marker}", "category": "{category}"},
+    ),
+    "expense-delete": ("DELETE", "/api/expense/{row}/", None),
+    "expense-import": (
+        "POST",
+        "/api/expense/import/",
+        [
+            {"name": "Benchmark", "amount": "12.50", "description": "{marker}", "category": "{category}"},
+            {"name": "Benchmark", "amount": "7.25", "description": "{marker}", "category": "{category}"},
+        ],
+    ),
+    "expense-batch": (
+        "POST",
+        "/api/expense/batch/",
+        [
+            {"op": "create", "data": {"name": "Benchmark", "amount": "12.50", "description": "{marker}", "category": "{category}"}},
+            {"op": "fetch", "ids": ["{expense}"]},
+        ],
+    ),
+    "income-create": ("POST", "/api/income/", {"name": "Benchmark", "amount": "100.00", "description": "{marker}"}),
+    "income-duplicate": ("POST", "/api/income/{row}/", None),
+    "income-update": ("PUT", "/api/income/{row}/", {"name": "Benchmark", "amount": "150.00", "description": "{marker}"}),
+    "income-delete": ("DELETE", "/api/income/{row}/", None),
+    "income-import": (
+        "POST",
+        "/api/income/import/",
+        [
+            {"name": "Benchmark", "amount": "100.00", "description": "{marker}"},
+            {"name": "Benchmark", "amount": "50.00", "description": "{marker}"},
+        ],
+    ),
+    "income-batch": (
+        "POST",
+        "/api/income/batch/",
+        [
+            {"op": "create", "data": {"name": "Benchmark", "amount": "100.00", "description": "{marker}"}},
+            {"op": "fetch", "ids": ["{income}"]},
+        ],
+    ),
+    "category-create": ("POST", "/api/category/", {"name": "{name_prefix}"}),
+    "category-update": ("PUT", "/api/category/{row}/", {"name": "{row_name}", "budget": "100.00"}),
+    "category-delete": ("DELETE", "/api/category/{row}/", None),
+    "portfolio-create": (
+        "POST",
+        "/api/portfolios/",
+        {"name": "{name_prefix}", "budget": "1000", "description": "{marker}"},
+    ),
+    "portfolio-update": ("PUT", "/api/portfolios/{row}/", {"budget": "2000"}),
+    "portfolio-delete": ("DELETE", "/api/portfolios/{row}/", None),
+    # Investments of a cent, to stay within the portfolios' budgets.
+    "investment-create": (
+        "POST",
+        "/api/portfolios/{portfolio}/investments/",
+        {"name": "Benchmark", "amount": "0.01", "value": "0.01", "description": "{marker}"},
+    ),
+    "investment-update": ("PUT", "/api/investments/{row}/", {"value": "0.02"}),
+    "investment-delete": ("DELETE", "/api/investments/{row}/", None),
+    "investment-batch": (
+        "POST",
+        "/api/investments/batch/",
+        [
+            {
+                "op": "create",
+                "data": {"portfolio": "{portfolio}", "name": "Benchmark", "amount": "0.01", "value": "0.01", "description": "{marker}"},
+            },
+            {"op": "fetch", "ids": ["{investment}"]},
+        ],
+    ),
+    "users-update": (
+        "PUT",
+        "/api/users/{row}/",
+        {"username": "{row_name}", "email": "", "first_name": "Bench", "last_name": "Mark"},
+    ),
+    "users-delete": ("DELETE", "/api/users/{row}/", None),
+}
+
+# Endpoints taking credentials instead of a token.
+ANONYMOUS_ENDPOINTS = {"token", "register"}
+# Endpoints for staff only, run as a staff user created for the run.
+ADMIN_ENDPOINTS = {"report-cache-stats", "users-list", "users-detail", "memory-stats", "users-update", "users-delete"}
+# Endpoints working on a {row} of a kind created for them. Deletes get a new
+# row for every request; the others keep working on the same one.
+ROW_ENDPOINTS = {
+    "expense-duplicate": "expense",
+    "expense-update": "expense",
+    "expense-delete": "expense",
+    "income-duplicate": "income",
+    "income-update": "income",
+    "income-delete": "income",
+    "category-update": "category",
+    "category-delete": "category",
+    "portfolio-update": "portfolio",
+    "portfolio-delete": "portfolio",
+    "investment-update": "investment",
+    "investment-delete": "investment",
+    "users-update": "user",
+    "users-delete": "user",
+}
+# Rows created at a time for the endpoints of ROW_ENDPOINTS.
+ROW_BATCH_SIZE = 100
+
+
+def fill(template, values):
+    """Returns the JSON template with the "{...}" fields of its strings filled in from values."""
+    if isinstance(template, str):
+        return template.format(**values)
+    if isinstance(template, list):
+        return [fill(item, values) for item in template]
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    return template
+
+
+def template_strings(template):
+    """Yields the strings of a JSON template."""
+    if isinstance(template, str):
+        yield template
+    elif isinstance(template, (list, tuple)):
+        for item in template:
+            yield from template_strings(item)
+    elif isinstance(template, dict):
+        for value in template.values():
+            yield from template_strings(value)
+
+
+class RowPool:
+    """
+    Rows for the requests of one client to an endpoint of ROW_ENDPOINTS,
+    created ROW_BATCH_SIZE at a time so that creating them barely slows the
+    client down. create(count) returns the (id, name) of count new rows.
+    """
+
+    def __init__(self, create):
+        self.create = create
+        self.rows = []
+
+    def get(self):
+        if not self.rows:
+            self.rows = self.create(ROW_BATCH_SIZE)
+        return self.rows[-1]
+
+    def pop(self):
+        row = self.get()
+        self.rows.pop()
+        return row
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests every API route of a running server in turn, with "
+        "concurrent clients authenticated as users created by seed_data and "
+        "the admin routes as a staff user created for the run. Reports the "
+        "requests per second, p50/p95/p99 latencies and SQL queries per "
+        "request of each, optionally writing them as JSON and comparing them "
+        "with an earlier run. The rows the write routes create are deleted "
+        "afterwards. Left out are DELETE /api/memory-stats/, which would "
+        "reset the figures being collected, and the /admin/ pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL (default: http://127.0.0.1:8000).")
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help=(
+                "Endpoint to run; repeat for several. A prefix such as report selects "
+                f"every report-* endpoint (default: all of {', '.join(ENDPOINTS)})."
+            ),
+        )
+        parser.add_argument("--prefix", default="seed", help="Username prefix of the seeded users to run as (default: seed).")
+        parser.add_argument("--password", default="seed-password", help="Password of the seeded users, for the token endpoint (default: seed-password).")
+        parser.add_argument("--users", type=int, help="Seeded users to spread the clients over (default: one per client).")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default: 8).")
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds to measure each endpoint for (default: 5).")
+        parser.add_argument("--warmup", type=float, default=1.0, help="Seconds of requests before measuring each endpoint (default: 1).")
+        parser.add_argument("--output", help="Write the results as JSON to this file, - for standard output.")
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare with.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise CommandError("--url must be an http(s) URL.")
+        if options["concurrency"] < 1 or options["duration"] <= 0:
+            raise CommandError("--concurrency and --duration must be positive.")
+        names = self.select_endpoints(options["endpoints"])
+        baseline = self.load_baseline(options["compare"]) if options["compare"] else None
+        contexts = self.get_contexts(options["prefix"], options["password"], options["users"] or options["concurrency"])
+
+        run = uuid.uuid4().hex[:8]
+        marker = f"bench_endpoints {run}"
+        registrations = itertools.count()
+        today = timezone.localdate()
+        admin = User.objects.create(username=f"bench-{run}-admin", is_staff=True)
+        admin_token = Token.objects.get_or_create(user=admin)[0].key
+        for context in contexts:
+            context.update(
+                marker=marker,
+                name_prefix=f"bench-{run}",
+                today=today.isoformat(),
+                month_ago=(today - timedelta(days=30)).isoformat(),
+            )
+        pools = {}
+
+        # Progress goes to stderr when the JSON goes to stdout.
+        out = self.stderr if options["output"] == "-" else self.stdout
+        results = {}
+        try:
+            for name in names:
+                method, path, body = ENDPOINTS[name]
+                missing = self.missing_fields(path, body, contexts[0])
+                if missing:
+                    out.write(f"{name}: skipped, the seeded users have no {', '.join(missing)}")
+                    continue
+
+                def make_request(client, i, method=method, path=path, body=body, name=name):
+                    context = contexts[client % len(contexts)]
+                    values = dict(context)
+                    if name == "register":
+                        values["new_username"] = f"bench-{run}-{next(registrations)}"
+                    if name in ROW_ENDPOINTS:
+                        # Each client thread only uses its own pool.
+                        pool = pools.get((name, client))
+                        if pool is None:
+                            kind = ROW_ENDPOINTS[name]
+                            pool = pools[name, client] = RowPool(
+                                lambda count, kind=kind: self.create_rows(kind, context, f"bench-{run}-{uuid.uuid4().hex[:8]}", marker, count)
+                            )
+                        values["row"], values["row_name"] = pool.pop() if method == "DELETE" else pool.get()
+                    headers = {"Accept": "application/json"}
+                    if name in ADMIN_ENDPOINTS:
+                        headers["Authorization"] = f"Token {admin_token}"
+                    elif name not in ANONYMOUS_ENDPOINTS:
+                        headers["Authorization"] = f"Token {context['token']}"
+                    data = None
+                    if body is not None:
+                        headers["Content-Type"] = "application/json"
+                        data = json.dumps(fill(body, values)).encode()
+                    return method, path.format(**values), headers, data
+
+                result = run_load(url, make_request, options["concurrency"], options["duration"], options["warmup"])
+                if not result.requests and None in result.error_statuses:
+                    raise CommandError(f"{name}: no response from {options['url']}; is the server running?")
+                results[name] = self.summarize(method, path, result)
+                out.write(self.format_row(name, results[name], baseline))
+        finally:
+            self.clean_up(run, marker)
+
+        if any(entry["requests"] and entry["queries_per_request"] is None for entry in results.values()):
+            out.write(
+                "The server sent no X-DB-Queries header; set QUERY_COUNT_HEADERS=1 in its "
+                "environment (the default with DEBUG) for the queries per request."
+            )
+        if options["output"]:
+            self.write_output(options, len(contexts), results)
+
+    def select_endpoints(self, selected):
+        if not selected:
+            return list(ENDPOINTS)
+        names = []
+        for value in selected:
+            matches = [name for name in ENDPOINTS if name == value or name.startswith(f"{value}-")]
+            if not matches:
+                raise CommandError(f"Unknown endpoint {value!r}, expected one of {', '.join(ENDPOINTS)}.")
+            names.extend(name for name in matches if name not in names)
+        return names
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)["endpoints"]
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Unable to read the results to compare with from {path}: {e}")
+
+    def get_contexts(self, prefix, password, count):
+        """
+        Returns the token, username and the ids of a few rows of up to count
+        seeded users, whose names start with prefix.
+        """
+        users = list(User.objects.filter(username__startswith=f"{prefix}-", is_active=True).order_by("id")[:count])
+        if not users:
+            raise CommandError(f"No users named {prefix}-*; create some with the seed_data command first.")
+        contexts = []
+        for user in users:
+            contexts.append(
+                {
+                    "user": user.id,
+                    "username": user.username,
+                    "password": password,
+                    "token": Token.objects.get_or_create(user=user)[0].key,
+                    "expense": Expense.objects.filter(user=user).values_list("id", flat=True).first(),
+                    "income": Income.objects.filter(user=user).values_list("id", flat=True).first(),
+                    "category": Category.objects.filter(user=user).values_list("id", flat=True).first(),
+                    "portfolio": Portfolio.objects.filter(user=user).values_list("id", flat=True).first(),
+                    "investment": Investment.objects.filter(portfolio__user=user).values_list("id", flat=True).first(),
+                }
+            )
+        return contexts
+
+    @staticmethod
+    def missing_fields(path, body, context):
+        templates = list(template_strings([path, body]))
+        return [key for key, value in context.items() if value is None and any(f"{{{key}}}" in t for t in templates)]
+
+    @staticmethod
+    def create_rows(kind, context, name_prefix, marker, count):
+        """
+        Creates count rows of kind for the user of context, for the requests
+        of ROW_ENDPOINTS, and returns their (id, name). Their names start with
+        name_prefix, or their descriptions are marker, for clean_up.
+        """
+        names = [f"{name_prefix}-{i}" for i in range(count)]
+        user_id = context["user"]
+        if kind == "expense":
+            Expense.bulk_create_tracked(
+                [Expense(user_id=user_id, category_id=context["category"], name=name, amount=1, description=marker) for name in names]
+            )
+            return list(Expense.objects.filter(user_id=user_id, name__in=names).values_list("id", "name"))
+        if kind == "income":
+            Income.bulk_create_tracked([Income(user_id=user_id, name=name, amount=1, description=marker) for name in names])
+            return list(Income.objects.filter(user_id=user_id, name__in=names).values_list("id", "name"))
+        # bulk_create sends no signals; see bulk_create_tracked.
+        if kind == "category":
+            Category.objects.bulk_create(Category(user_id=user_id, name=name, budget=0) for name in names)
+            bump_data_version(user_id)
+            return list(Category.objects.filter(user_id=user_id, name__in=names).values_list("id", "name"))
+        if kind == "portfolio":
+            Portfolio.objects.bulk_create(Portfolio(user_id=user_id, name=name, description=marker) for name in names)
+            bump_data_version(user_id)
+            return list(Portfolio.objects.filter(user_id=user_id, name__in=names).values_list("id", "name"))
+        if kind == "investment":
+            Investment.objects.bulk_create(
+                Investment(portfolio_id=context["portfolio"], name=name, amount=0, value=0, description=marker) for name in names
+            )
+            bump_data_version(user_id)
+            return list(
+                Investment.objects.filter(portfolio_id=context["portfolio"], name__in=names).values_list("id", "name")
+            )
+        User.objects.bulk_create(User(username=name) for name in names)
+        return list(User.objects.filter(username__in=names).values_list("id", "username"))
+
+    @staticmethod
+    def summarize(method, path, result):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        queries = result.queries_per_request
+        return {
+            "method": method,
+            "path": path,
+            "requests": result.requests,
+            "errors": result.errors,
+            "error_statuses": {str(status): count for status, count in result.error_statuses.items()},
+            "requests_per_second": round(result.requests_per_second, 1),
+            "p50_ms": ms(result.percentile(50)),
+            "p95_ms": ms(result.percentile(95)),
+            "p99_ms": ms(result.percentile(99)),
+            "max_ms": ms(max(result.latencies, default=None)),
+            "queries_per_request": None if queries is None else round(queries, 2),
+        }
+
+    @staticmethod
+    def format_row(name, entry, baseline):
+        def number(value, width=7):
+            return "-".rjust(width) if value is None else f"{value:>{width}.1f}"
+
+        row = (
+            f"{name:<33} {number(entry['requests_per_second'], 8)} req/s"
+            f"  p50 {number(entry['p50_ms'])}  p95 {number(entry['p95_ms'])}"
+            f"  p99 {number(entry['p99_ms'])} ms  queries {number(entry['queries_per_request'], 5)}"
+        )
+        if entry["errors"]:
+            statuses = ", ".join(f"{count} x {status}" for status, count in entry["error_statuses"].items())
+            row += f"  errors {statuses}"
+        previous = (baseline or {}).get(name)
+        if previous:
+            changes = []
+            for key, label in (("requests_per_second", "req/s"), ("p50_ms", "p50"), ("p95_ms", "p95"), ("p99_ms", "p99")):
+                if entry[key] is not None and previous.get(key):
+                    changes.append(f"{label} {(entry[key] - previous[key]) / previous[key]:+.0%}")
+            if previous.get("queries_per_request") is not None and entry["queries_per_request"] is not None:
+                changes.append(f"queries {entry['queries_per_request'] - previous['queries_per_request']:+.1f}")
+            if changes:
+                row += f"  [{', '.join(changes)}]"
+        return row
+
+    @staticmethod
+    def clean_up(run, marker):
+        """Deletes the rows the write endpoints and create_rows created, and the staff user."""
+        # Deleting a user keeps its categories, with no user.
+        Category.objects.filter(user__username__startswith=f"bench-{run}-").delete()
+        User.objects.filter(username__startswith=f"bench-{run}-").delete()
+        Expense.delete_tracked(Expense.objects.filter(description=marker))
+        Income.delete_tracked(Income.objects.filter(description=marker))
+        Investment.objects.filter(description=marker).delete()
+        Portfolio.objects.filter(name__startswith=f"bench-{run}").delete()
+        Category.objects.filter(name__startswith=f"bench-{run}").delete()
+
+    def write_output(self, options, user_count, results):
+        try:
+            revision = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+            ).stdout.strip() or None
+        except OSError:
+            revision = None
+        document = {
+            "created": timezone.now().isoformat(),
+            "revision": revision,
+            "url": options["url"],
+            "database": connection.vendor,
+            "users": user_count,
+            "concurrency": options["concurrency"],
+            "duration": options["duration"],
+            "warmup": options["warmup"],
+            "endpoints": results,
+        }
+        text = json.dumps(document, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(text)
+        else:
+            Path(options["output"]).write_text(text + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
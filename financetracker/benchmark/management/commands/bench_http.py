@@ -0,0 +1,63 @@
+import statistics
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from benchmark.load import run_load
+
+DEFAULT_PATHS = (
+    "/api/report-net/",
+    "/api/report-category/",
+    "/api/report-day-graph/",
+    "/api/category/",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends GET requests to a running server from concurrent keep-alive "
+        "clients for a fixed time and reports the requests per second and "
+        "latencies, e.g. to compare runserver with gunicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL (default: http://127.0.0.1:8000).")
+        parser.add_argument("--path", action="append", dest="paths", help=f"Path to request; repeat for several (default: {', '.join(DEFAULT_PATHS)}).")
+        parser.add_argument("--token", help="API token to send.")
+        parser.add_argument("--user", help="Send the token of this user instead, creating it if needed.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default: 8).")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds to measure for (default: 10).")
+        parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of requests before measuring (default: 2).")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise CommandError("--url must be an http(s) URL.")
+        paths = options["paths"] or list(DEFAULT_PATHS)
+        headers = {"Accept": "application/json"}
+        token = options["token"]
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}.")
+            token = Token.objects.get_or_create(user=user)[0].key
+        if token:
+            headers["Authorization"] = f"Token {token}"
+
+        def make_request(client, i):
+            return "GET", paths[(client + i) % len(paths)], headers, None
+
+        result = run_load(url, make_request, options["concurrency"], options["duration"], options["warmup"])
+        if not result.requests:
+            raise CommandError(f"No successful responses ({result.errors} errors); is the server running?")
+        latencies = sorted(result.latencies)
+        self.stdout.write(f"{result.requests} requests in {result.elapsed:.1f}s, {result.errors} errors")
+        self.stdout.write(f"requests/s: {result.requests_per_second:.1f}")
+        self.stdout.write(
+            f"latency ms: mean {statistics.fmean(latencies) * 1000:.1f}, "
+            f"median {statistics.median(latencies) * 1000:.1f}, "
+            f"max {latencies[-1] * 1000:.1f}"
+        )
@@ -0,0 +1,263 @@
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from benchmark.rows import create_rows
+from benchmark.stats import welch_t_test
+from category.models import Category
+from category.serializers import CategoryReadSerializer, CategorySerializer
+from expense.models import Expense
+from expense.serializers import ExpenseReadSerializer, ExpenseSerializer
+from income.models import Income
+from income.serializers import IncomeReadSerializer, IncomeSerializer
+from investment.models import Investment, Portfolio
+from investment.serializers import (
+    InvestmentReadSerializer,
+    InvestmentSerializer,
+    PortfolioReadSerializer,
+    PortfolioSerializer,
+)
+
+BASELINE = Path(__file__).resolve().parents[2] / "baselines" / "bench_micro.json"
+
+
+def category_properties(user, from_date, to_date):
+    return [
+        (category.total_expense_cost, category.remaining_budget, category.is_budget_exceeded)
+        for category in Category.objects.filter(user=user).with_spending()
+    ]
+
+
+def portfolio_properties(user, from_date, to_date):
+    return [
+        (portfolio.total_value, portfolio.total_invested, portfolio.total_return, portfolio.remaining_budget)
+        for portfolio in Portfolio.objects.filter(user=user).with_totals()
+    ]
+
+
+def serialize(serializer_class, queryset, **kwargs):
+    def case(user, from_date, to_date):
+        return serializer_class(queryset(user), **kwargs).data
+
+    return case
+
+
+def expenses(user):
+    return Expense.objects.filter(user=user)
+
+
+def incomes(user):
+    return Income.objects.filter(user=user)
+
+
+def categories(user):
+    return Category.objects.filter(user=user).with_spending()
+
+
+def portfolios(user):
+    return Portfolio.objects.filter(user=user).with_totals()
+
+
+def investments(user):
+    return Investment.objects.filter(portfolio__user=user)
+
+
+# name: function(user, from_date, to_date) running the code measured, over
+# the rows of a user created by benchmark.rows.create_rows.
+CASES = {
+    "expense-total": lambda user, from_date, to_date: Expense.get_expense_total(from_date, to_date, user),
+    "income-total": lambda user, from_date, to_date: Income.get_income_total(from_date, to_date, user),
+    "net-month": lambda user, from_date, to_date: Expense.get_net_expenses_for_the_month(user),
+    "category-properties": category_properties,
+    "portfolio-properties": portfolio_properties,
+    "serializer-expense": serialize(ExpenseSerializer, expenses, many=True),
+    "serializer-expense-read": serialize(ExpenseReadSerializer, expenses),
+    "serializer-income": serialize(IncomeSerializer, incomes, many=True),
+    "serializer-income-read": serialize(IncomeReadSerializer, incomes),
+    "serializer-category": serialize(CategorySerializer, categories, many=True),
+    "serializer-category-read": serialize(CategoryReadSerializer, categories),
+    "serializer-portfolio": serialize(PortfolioSerializer, portfolios, many=True),
+    "serializer-portfolio-read": serialize(PortfolioReadSerializer, portfolios),
+    "serializer-investment": serialize(InvestmentSerializer, investments, many=True),
+    "serializer-investment-read": serialize(InvestmentReadSerializer, investments),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the report aggregations, the Category and Portfolio computed "
+        "properties and every serializer over generated rows of several sizes. "
+        "--save stores the timings as the baseline kept in the repository; "
+        "--compare runs Welch's t-test against it and fails on significant "
+        "slowdowns. The rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated rows per model (default: 1000,10000,100000).")
+        parser.add_argument(
+            "--case",
+            action="append",
+            dest="cases",
+            help=f"Case to run; repeat for several. A prefix such as serializer selects every serializer-* case (default: all of {', '.join(CASES)}).",
+        )
+        parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case and size (default: 10).")
+        parser.add_argument("--save", nargs="?", const=str(BASELINE), help=f"Store the timings as a baseline (default file: {BASELINE.name}).")
+        parser.add_argument("--compare", nargs="?", const=str(BASELINE), help=f"Compare the timings with a baseline (default file: {BASELINE.name}).")
+        parser.add_argument("--alpha", type=float, default=0.01, help="Significance level of the comparison (default: 0.01).")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.05,
+            help="Smallest relative change of the mean reported as a slowdown or speedup (default: 0.05).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated numbers of rows.")
+        if any(size < 1 for size in sizes) or options["repeat"] < 2:
+            raise CommandError("--sizes must be positive and --repeat at least 2.")
+        names = self.select_cases(options["cases"])
+        baseline = self.load(options["compare"]) if options["compare"] else None
+        if baseline:
+            for line in self.environment_differences(baseline.get("environment", {})):
+                self.stdout.write(self.style.WARNING(line))
+
+        results = {}
+        for size in sizes:
+            results.update(self.run_size(size, names, options["repeat"]))
+
+        slowdowns = 0
+        for key, result in results.items():
+            previous = (baseline or {}).get("results", {}).get(key)
+            verdict = self.compare(previous, result, options["alpha"], options["threshold"]) if previous else None
+            slowdowns += verdict is not None and verdict[0] == "slower"
+            self.stdout.write(self.format_row(key, result, previous, verdict))
+
+        if options["save"]:
+            self.save(options["save"], options["repeat"], results)
+        if slowdowns:
+            raise CommandError(f"{slowdowns} significant slowdowns against {options['compare']}.")
+
+    def select_cases(self, selected):
+        if not selected:
+            return list(CASES)
+        names = []
+        for value in selected:
+            matches = [name for name in CASES if name == value or name.startswith(f"{value}-")]
+            if not matches:
+                raise CommandError(f"Unknown case {value!r}, expected one of {', '.join(CASES)}.")
+            names.extend(name for name in matches if name not in names)
+        return names
+
+    def run_size(self, size, names, repeat):
+        """Returns {"case/size": timings} for the cases over size generated rows per model."""
+        results = {}
+        self.stdout.write(f"Creating {size} rows per model...")
+        with transaction.atomic():
+            user = create_rows(size)
+            to_date = timezone.localdate()
+            from_date = to_date - timedelta(days=365)
+            for name in names:
+                case = CASES[name]
+                # One untimed run fills the connection's and the
+                # serializers' caches.
+                case(user, from_date, to_date)
+                samples = []
+                for _ in range(repeat):
+                    gc.collect()
+                    started = time.perf_counter()
+                    case(user, from_date, to_date)
+                    samples.append((time.perf_counter() - started) * 1000)
+                results[f"{name}/{size}"] = {
+                    "mean_ms": round(statistics.fmean(samples), 4),
+                    "stdev_ms": round(statistics.stdev(samples), 4),
+                    "min_ms": round(min(samples), 4),
+                    "samples_ms": [round(sample, 4) for sample in samples],
+                }
+            transaction.set_rollback(True)
+        return results
+
+    @staticmethod
+    def compare(previous, result, alpha, threshold):
+        """
+        Returns ("slower" or "faster" or "", relative change of the mean,
+        p-value of the change) of result against the previous timings.
+        """
+        t, df, p_slower = welch_t_test(previous["samples_ms"], result["samples_ms"])
+        change = result["mean_ms"] / previous["mean_ms"] - 1 if previous["mean_ms"] else 0.0
+        if p_slower < alpha and change > threshold:
+            return "slower", change, p_slower
+        if 1 - p_slower < alpha and change < -threshold:
+            return "faster", change, 1 - p_slower
+        return "", change, min(p_slower, 1 - p_slower)
+
+    def format_row(self, key, result, previous, verdict):
+        row = f"{key:<34} {result['mean_ms']:>10.2f} ms ± {result['stdev_ms']:>8.2f}  min {result['min_ms']:>10.2f}"
+        if verdict is None:
+            return row
+        label, change, p = verdict
+        row += f"  baseline {previous['mean_ms']:>10.2f} ms  {change:+7.1%}  p={p:.3g}"
+        if label == "slower":
+            return self.style.ERROR(f"{row}  SLOWER")
+        if label == "faster":
+            return self.style.SUCCESS(f"{row}  faster")
+        return row
+
+    @staticmethod
+    def environment():
+        try:
+            revision = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+            ).stdout.strip() or None
+        except OSError:
+            revision = None
+        return {
+            "revision": revision,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "machine": f"{platform.system()} {platform.machine()}",
+            "processor": platform.processor() or None,
+        }
+
+    def environment_differences(self, recorded):
+        current = self.environment()
+        return [
+            f"The baseline was recorded with {key} {recorded[key]}, this run uses {current[key]}."
+            for key in ("python", "django", "database", "machine")
+            if recorded.get(key) and recorded[key] != current[key]
+        ]
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Unable to read the baseline {path}: {e}")
+
+    def save(self, path, repeat, results):
+        """Writes the results to path, keeping the cases and sizes of an existing file not run this time."""
+        path = Path(path)
+        existing = self.load(path).get("results", {}) if path.exists() else {}
+        document = {
+            "created": timezone.now().isoformat(),
+            "environment": self.environment(),
+            "repeat": repeat,
+            "results": {**existing, **results},
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(document, indent=2) + "\n")
+        self.stdout.write(f"Baseline written to {path}")
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from benchmark.rows import create_rows
+
+from category.models import Category
+from category.serializers import CategoryReadSerializer, CategorySerializer
+from expense.models import Expense
+from expense.serializers import ExpenseReadSerializer, ExpenseSerializer
+from income.models import Income
+from income.serializers import IncomeReadSerializer, IncomeSerializer
+from investment.models import Investment, Portfolio
+from investment.serializers import (
+    InvestmentReadSerializer,
+    InvestmentSerializer,
+    PortfolioReadSerializer,
+    PortfolioSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders generated rows with each ModelSerializer and with its values() "
+        "fast path, checks that both produce the same bytes and reports the speedup. "
+        "The rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows per model (default: 10000).")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the best is kept (default: 5).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = create_rows(options["rows"])
+            cases = [
+                ("expenses", Expense.objects.filter(user=user), ExpenseSerializer, ExpenseReadSerializer),
+                ("income", Income.objects.filter(user=user), IncomeSerializer, IncomeReadSerializer),
+                ("categories", Category.objects.filter(user=user).with_spending(), CategorySerializer, CategoryReadSerializer),
+                ("portfolios", Portfolio.objects.filter(user=user).with_totals(), PortfolioSerializer, PortfolioReadSerializer),
+                ("investments", Investment.objects.filter(portfolio__user=user), InvestmentSerializer, InvestmentReadSerializer),
+            ]
+            self.stdout.write(f"{'case':<12} {'rows':>7} {'drf ms':>9} {'fast ms':>9} {'speedup':>8}")
+            for name, queryset, serializer_class, read_serializer_class in cases:
+                drf, drf_ms = self.measure(
+                    lambda: serializer_class(queryset.all(), many=True).data, options["repeat"]
+                )
+                fast, fast_ms = self.measure(lambda: read_serializer_class(queryset.all()).data, options["repeat"])
+                if drf != fast:
+                    raise CommandError(f"{read_serializer_class.__name__} output differs from {serializer_class.__name__}.")
+                rows = queryset.count()
+                self.stdout.write(f"{name:<12} {rows:>7} {drf_ms:>9.1f} {fast_ms:>9.1f} {drf_ms / fast_ms:>7.1f}x")
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Fast path output is byte-identical."))
+
+    def measure(self, serialize, repeat):
+        """Returns the rendered JSON and the best wall time in ms of repeat runs."""
+        renderer = JSONRenderer()
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(serialize())
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return content, best
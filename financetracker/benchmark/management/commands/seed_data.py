@@ -0,0 +1,338 @@
+import math
+import multiprocessing
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import accumulate
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from category.models import DEFAULT_CATEGORY_NAMES, Category
+from expense.models import Expense
+from income.models import Income
+from investment.models import Investment, Portfolio
+from report.models import DailyRollup
+
+DATE_DISTRIBUTIONS = ("uniform", "recent")
+
+EXPENSE_NAMES = ("Coffee", "Lunch", "Taxi", "Groceries", "Movie", "Rent", "Phone bill", "Gym", "Books", "Fuel")
+INCOME_NAMES = ("Salary", "Freelance", "Interest", "Dividends", "Refund", "Gift")
+INVESTMENT_NAMES = ("Index fund", "Bonds", "Gold", "Tech stocks", "REIT", "Crypto")
+# Portfolio budgets cover their investments with a quarter to spare, and are
+# at least MIN_PORTFOLIO_BUDGET.
+BUDGET_HEADROOM = 1.25
+MIN_PORTFOLIO_BUDGET = 10000.0
+
+
+class RandomData:
+    """Draws the dates, amounts and categories of one user's rows."""
+
+    def __init__(self, config, user_id):
+        # Seeded per user, so the data does not depend on the worker count.
+        self.rng = random.Random(f"{config['seed']}:{user_id}")
+        self.config = config
+        self.today = datetime.now().date()
+
+    def day(self):
+        days = self.config["days"]
+        if self.config["date_distribution"] == "recent":
+            # Exponential, most rows in the latest quarter of the window.
+            offset = min(int(self.rng.expovariate(4 / days)), days - 1)
+        else:
+            offset = self.rng.randrange(days)
+        return self.today - timedelta(days=offset)
+
+    def amount(self, mu, sigma):
+        return round(self.rng.lognormvariate(mu, sigma), 2)
+
+    def choice(self, values, cum_weights=None):
+        if cum_weights is None:
+            return self.rng.choice(values)
+        return self.rng.choices(values, cum_weights=cum_weights)[0]
+
+
+class RowWriter:
+    """
+    Inserts rows of the given columns of a model, batch_size rows per
+    executemany() call.
+
+    Building a model instance per row and letting bulk_create run every
+    field's pre_save and conversion costs far more than the insert itself at
+    millions of rows, so rows are plain tuples of database values instead.
+    auto_now and auto_now_add do not apply: seeding sets those dates itself,
+    spreading rows over the past rather than putting them all on today.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.statements = {}
+        self.pending = defaultdict(list)
+        self.counts = Counter()
+
+    def statement(self, model, columns):
+        key = (model, columns)
+        if key not in self.statements:
+            quote = connection.ops.quote_name
+            fields = [model._meta.get_field(column).column for column in columns]
+            self.statements[key] = "INSERT INTO %s (%s) VALUES (%s)" % (
+                quote(model._meta.db_table),
+                ", ".join(quote(field) for field in fields),
+                ", ".join(["%s"] * len(fields)),
+            )
+        return self.statements[key]
+
+    def add(self, model, columns, row):
+        pending = self.pending[(model, columns)]
+        pending.append(row)
+        if len(pending) >= self.batch_size:
+            self.flush((model, columns))
+
+    def flush(self, key=None):
+        for model, columns in [key] if key else list(self.pending):
+            rows = self.pending.pop((model, columns), [])
+            if rows:
+                with connection.cursor() as cursor:
+                    cursor.executemany(self.statement(model, columns), rows)
+                self.counts[model.__name__] += len(rows)
+
+
+def init_worker():
+    # Workers started with spawn or forkserver rather than fork begin with
+    # a fresh interpreter.
+    if not apps.ready:
+        django.setup()
+
+
+EXPENSE_COLUMNS = ("user_id", "category_id", "name", "amount", "date")
+INCOME_COLUMNS = ("user_id", "name", "amount", "date")
+INVESTMENT_COLUMNS = ("portfolio_id", "name", "amount", "value", "date_invested", "created_at", "updated_at")
+ROLLUP_COLUMNS = ("kind", "user_id", "day", "category_id", "total", "count")
+
+
+def portfolio_budget(investments):
+    """Returns a budget, rounded up to hundreds, that the investments fit in."""
+    invested = sum(amount for _, amount, _, _ in investments)
+    return max(MIN_PORTFOLIO_BUDGET, math.ceil(invested * BUDGET_HEADROOM / 100) * 100)
+
+
+def seed_users(user_ids, config):
+    """
+    Creates the default categories, portfolios, expenses, incomes and
+    investments of user_ids and their daily rollup, in one transaction.
+    Returns the number of rows created per model.
+    """
+    writer = RowWriter(config["batch_size"])
+    rollup = defaultdict(lambda: [0.0, 0])
+    ops = connection.ops
+    days = {}
+    now = ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            (Category(user_id=user_id, name=name) for user_id in user_ids for name in DEFAULT_CATEGORY_NAMES),
+            batch_size=config["batch_size"],
+        )
+        writer.counts["Category"] += len(user_ids) * len(DEFAULT_CATEGORY_NAMES)
+        # Investments are drawn before their portfolios are created, so that
+        # every budget can cover them: the API refuses investments beyond it.
+        generators = {user_id: RandomData(config, user_id) for user_id in user_ids}
+        planned = {}
+        for user_id, data in generators.items():
+            planned[user_id] = []
+            for _ in range(config["portfolios"]):
+                investments = []
+                for _ in range(config["investments"]):
+                    amount = data.amount(config["investment_mu"], config["investment_sigma"])
+                    value = round(amount * data.rng.lognormvariate(0.02, 0.15), 2)
+                    investments.append((data.choice(INVESTMENT_NAMES), amount, value, data.day()))
+                planned[user_id].append(investments)
+        Portfolio.objects.bulk_create(
+            (
+                Portfolio(user_id=user_id, name=f"Portfolio {i + 1}", budget=portfolio_budget(investments))
+                for user_id in user_ids
+                for i, investments in enumerate(planned[user_id])
+            ),
+            batch_size=config["batch_size"],
+        )
+        writer.counts["Portfolio"] += len(user_ids) * config["portfolios"]
+        # Read the ids back rather than relying on bulk_create returning
+        # them, which MySQL cannot do.
+        categories = defaultdict(list)
+        for user_id, category_id in (
+            Category.objects.filter(user_id__in=user_ids).order_by("id").values_list("user_id", "id")
+        ):
+            categories[user_id].append(category_id)
+        portfolios = defaultdict(list)
+        for user_id, portfolio_id in (
+            Portfolio.objects.filter(user_id__in=user_ids).order_by("id").values_list("user_id", "id")
+        ):
+            portfolios[user_id].append(portfolio_id)
+
+        def db_day(day):
+            if day not in days:
+                days[day] = ops.adapt_datefield_value(day)
+            return days[day]
+
+        cum_weights = list(accumulate(config["category_weights"]))
+        for user_id in user_ids:
+            data = generators[user_id]
+            # The defaults are the user's first categories, in creation order.
+            user_categories = categories[user_id][: len(DEFAULT_CATEGORY_NAMES)]
+            for _ in range(config["expenses"]):
+                day = data.day()
+                category_id = data.choice(user_categories, cum_weights)
+                amount = data.amount(config["expense_mu"], config["expense_sigma"])
+                writer.add(
+                    Expense,
+                    EXPENSE_COLUMNS,
+                    (user_id, category_id, data.choice(EXPENSE_NAMES), amount, db_day(day)),
+                )
+                entry = rollup[(DailyRollup.EXPENSE, user_id, day, category_id)]
+                entry[0] += amount
+                entry[1] += 1
+            for _ in range(config["incomes"]):
+                day = data.day()
+                amount = data.amount(config["income_mu"], config["income_sigma"])
+                writer.add(Income, INCOME_COLUMNS, (user_id, data.choice(INCOME_NAMES), amount, db_day(day)))
+                entry = rollup[(DailyRollup.INCOME, user_id, day, None)]
+                entry[0] += amount
+                entry[1] += 1
+            for portfolio_id, investments in zip(portfolios[user_id], planned[user_id]):
+                for name, amount, value, day in investments:
+                    writer.add(
+                        Investment,
+                        INVESTMENT_COLUMNS,
+                        (portfolio_id, name, amount, value, db_day(day), now, now),
+                    )
+        # The users are new, so their rollup rows can be inserted outright.
+        for (kind, user_id, day, category_id), (total, count) in rollup.items():
+            writer.add(DailyRollup, ROLLUP_COLUMNS, (kind, user_id, db_day(day), category_id, total, count))
+        writer.flush()
+    return writer.counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates users with their default categories, portfolios, expenses, "
+        "incomes and investments for scale testing. Rows are inserted in "
+        "batches, optionally from several processes, and the daily "
+        "rollup of the new users is written along with them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Users to create (default: 10).")
+        parser.add_argument("--expenses", type=int, default=1000, help="Expenses per user (default: 1000).")
+        parser.add_argument("--incomes", type=int, default=50, help="Incomes per user (default: 50).")
+        parser.add_argument("--portfolios", type=int, default=2, help="Portfolios per user (default: 2).")
+        parser.add_argument("--investments", type=int, default=25, help="Investments per portfolio (default: 25).")
+        parser.add_argument("--days", type=int, default=365, help="Spread the rows over this many past days (default: 365).")
+        parser.add_argument(
+            "--date-distribution",
+            choices=DATE_DISTRIBUTIONS,
+            default="uniform",
+            help="uniform over --days, or recent: exponentially more rows on recent days (default: uniform).",
+        )
+        parser.add_argument(
+            "--category-weights",
+            default="30,15,25,10,10,10",
+            help=f"Relative share of expenses per default category, in the order {', '.join(DEFAULT_CATEGORY_NAMES)} (default: 30,15,25,10,10,10).",
+        )
+        parser.add_argument("--expense-amount", default="3.0,1.0", help="mu,sigma of the log-normal expense amounts (default: 3.0,1.0, a median of 20).")
+        parser.add_argument("--income-amount", default="7.0,0.8", help="mu,sigma of the log-normal income amounts (default: 7.0,0.8).")
+        parser.add_argument("--investment-amount", default="6.0,1.0", help="mu,sigma of the log-normal investment amounts (default: 6.0,1.0).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT (default: 5000).")
+        parser.add_argument("--workers", type=int, default=1, help="Processes inserting in parallel (default: 1).")
+        parser.add_argument("--seed", default="financetracker", help="Random seed, for reproducible data (default: financetracker).")
+        parser.add_argument("--prefix", default="seed", help="Username prefix of the created users (default: seed).")
+        parser.add_argument("--password", default="seed-password", help="Password of every created user (default: seed-password).")
+
+    def handle(self, *args, **options):
+        config = self.get_config(options)
+        workers = options["workers"]
+        if workers > 1 and connection.vendor == "sqlite":
+            self.stderr.write("SQLite allows a single writer; using --workers 1.")
+            workers = 1
+
+        started = time.perf_counter()
+        user_ids = self.create_users(options["users"], options["prefix"], options["password"])
+        # Enough chunks to keep every worker busy, small enough that a
+        # chunk's rollup stays small in memory.
+        chunk_size = max(1, min(50, math.ceil(len(user_ids) / (workers * 4))))
+        chunks = [user_ids[i : i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        seed = partial(seed_users, config=config)
+
+        totals = Counter({"User": len(user_ids)})
+        if workers == 1:
+            results = map(seed, chunks)
+            self.report(results, totals, len(chunks), started)
+        else:
+            # Forked workers must open connections of their own.
+            connections.close_all()
+            with multiprocessing.get_context().Pool(workers, initializer=init_worker) as pool:
+                self.report(pool.imap_unordered(seed, chunks), totals, len(chunks), started)
+
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        summary = ", ".join(f"{count} {model}" for model, count in sorted(totals.items()))
+        self.stdout.write(self.style.SUCCESS(f"Created {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s): {summary}."))
+
+    def get_config(self, options):
+        def pair(name):
+            try:
+                mu, sigma = (float(value) for value in options[name].split(","))
+            except ValueError:
+                raise CommandError(f"--{name.replace('_', '-')} must be mu,sigma.")
+            return mu, sigma
+
+        try:
+            weights = [float(weight) for weight in options["category_weights"].split(",")]
+        except ValueError:
+            raise CommandError("--category-weights must be comma separated numbers.")
+        if len(weights) != len(DEFAULT_CATEGORY_NAMES) or min(weights) < 0 or not sum(weights):
+            raise CommandError(f"--category-weights needs {len(DEFAULT_CATEGORY_NAMES)} non-negative weights.")
+        for name in ("users", "expenses", "incomes", "portfolios", "investments"):
+            if options[name] < 0:
+                raise CommandError(f"--{name} must not be negative.")
+        if options["days"] < 1 or options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--days, --batch-size and --workers must be positive.")
+
+        config = {
+            name: options[name]
+            for name in ("expenses", "incomes", "portfolios", "investments", "days", "date_distribution", "batch_size", "seed")
+        }
+        config["category_weights"] = weights
+        config["expense_mu"], config["expense_sigma"] = pair("expense_amount")
+        config["income_mu"], config["income_sigma"] = pair("income_amount")
+        config["investment_mu"], config["investment_sigma"] = pair("investment_amount")
+        return config
+
+    def create_users(self, count, prefix, password):
+        """
+        Creates count users with bulk_create and returns their ids. The
+        default categories the post_save signal would add are created with
+        the rest of each user's data.
+        """
+        run = uuid.uuid4().hex[:8]
+        usernames = [f"{prefix}-{run}-{i}" for i in range(count)]
+        # Hashing is deliberately slow, so every user shares one hash.
+        password = make_password(password)
+        User.objects.bulk_create((User(username=username, password=password) for username in usernames), batch_size=5000)
+        return list(
+            User.objects.filter(username__startswith=f"{prefix}-{run}-").order_by("id").values_list("id", flat=True)
+        )
+
+    def report(self, results, totals, chunk_count, started):
+        for done, counts in enumerate(results, start=1):
+            totals.update(counts)
+            rows = sum(totals.values())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{done}/{chunk_count} chunks, {rows} rows, {rows / elapsed:.0f} rows/s")
@@ -0,0 +1,55 @@
+"""
+Generated rows for the benchmark commands.
+"""
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from category.models import Category
+from expense.models import Expense
+from income.models import Income
+from investment.models import Investment, Portfolio
+
+
+def create_rows(count):
+    """
+    Creates a user with count categories, expenses, incomes, portfolios and
+    investments, the expenses and incomes added to the daily rollup, and
+    returns it. Callers run it in a transaction they roll back.
+    """
+    user = User.objects.create(username=f"bench-{uuid.uuid4().hex[:12]}")
+    Category.objects.bulk_create(
+        Category(user=user, name=f"Category {i}", budget=Decimal(i % 500) if i % 3 else None)
+        for i in range(count)
+    )
+    categories = list(Category.objects.filter(user=user).order_by("id"))
+    Expense.bulk_create_tracked(
+        [
+            Expense(
+                user=user,
+                category=categories[i % len(categories)],
+                name=f"Expense {i}",
+                amount=i * 1.25,
+                description="" if i % 2 else f"Note {i}",
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    Income.bulk_create_tracked(
+        [Income(user=user, name=f"Income {i}", amount=i * 2.5) for i in range(count)],
+        batch_size=1000,
+    )
+    Portfolio.objects.bulk_create(
+        Portfolio(user=user, name=f"Portfolio {i}", budget=i * 10.0) for i in range(count)
+    )
+    portfolios = list(Portfolio.objects.filter(user=user).order_by("id"))
+    Investment.objects.bulk_create(
+        (
+            Investment(portfolio=portfolios[i], name=f"Investment {i}", amount=i * 1.5, value=i * 1.75)
+            for i in range(count)
+        ),
+        batch_size=1000,
+    )
+    return user
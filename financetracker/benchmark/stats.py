@@ -0,0 +1,72 @@
+"""
+Statistics for comparing benchmark timings, without depending on SciPy.
+"""
+import math
+import statistics
+
+
+def welch_t_test(baseline, current):
+    """
+    Welch's t-test of whether the mean of current is greater than the mean of
+    baseline, without assuming equal variances. Returns (t, degrees of
+    freedom, one-sided p-value); p is small when current is significantly
+    slower. Both samples need at least two values.
+    """
+    if len(baseline) < 2 or len(current) < 2:
+        raise ValueError("Welch's t-test needs at least two values per sample.")
+    mean_baseline, mean_current = statistics.fmean(baseline), statistics.fmean(current)
+    error_baseline = statistics.variance(baseline) / len(baseline)
+    error_current = statistics.variance(current) / len(current)
+    error = error_baseline + error_current
+    if error == 0:
+        # Identical repeated values: the difference is certain either way.
+        if mean_current == mean_baseline:
+            return 0.0, math.inf, 0.5
+        return math.copysign(math.inf, mean_current - mean_baseline), math.inf, float(mean_current < mean_baseline)
+    t = (mean_current - mean_baseline) / math.sqrt(error)
+    df = error**2 / (
+        error_baseline**2 / (len(baseline) - 1) + error_current**2 / (len(current) - 1)
+    )
+    return t, df, t_survival(t, df)
+
+
+def t_survival(t, df):
+    """P(T > t) for Student's t distribution with df degrees of freedom."""
+    tail = 0.5 * regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t))
+    return tail if t >= 0 else 1 - tail
+
+
+def regularized_incomplete_beta(a, b, x):
+    """I_x(a, b), evaluated with its continued fraction (Numerical Recipes, 6.4)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    )
+    # The continued fraction converges quickly only below this point; use
+    # the symmetry I_x(a, b) = 1 - I_(1-x)(b, a) above it.
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1 - front * _beta_continued_fraction(b, a, 1 - x) / b
+
+
+def _beta_continued_fraction(a, b, x, iterations=200, epsilon=3e-14):
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, iterations + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= d * c
+        if abs(d * c - 1) < epsilon:
+            break
+    return result
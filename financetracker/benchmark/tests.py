@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+
+from .stats import t_survival, welch_t_test
+
+
+class WelchTTestTests(SimpleTestCase):
+    def test_t_survival_matches_the_t_table(self):
+        # Two-sided 5% critical values: P(T > t) = 0.025.
+        for t, df in ((12.706, 1), (2.571, 5), (2.228, 10), (1.96, 10**6)):
+            self.assertAlmostEqual(t_survival(t, df), 0.025, places=4)
+        self.assertAlmostEqual(t_survival(-2.228, 10), 0.975, places=4)
+        self.assertEqual(t_survival(0, 3), 0.5)
+
+    def test_slower_sample_is_significant(self):
+        baseline = [19.1, 20.3, 18.7, 20.0, 19.5, 19.9, 20.4, 19.2]
+        current = [20.1, 21.0, 20.6, 19.9, 21.4, 20.8, 21.2, 20.5]
+        t, df, p = welch_t_test(baseline, current)
+        self.assertAlmostEqual(t, 3.7092, places=4)
+        self.assertAlmostEqual(df, 13.658, places=3)
+        self.assertLess(p, 0.01)
+        self.assertGreater(welch_t_test(current, baseline)[2], 0.99)
+
+    def test_identical_samples(self):
+        self.assertEqual(welch_t_test([1.0, 1.0], [1.0, 1.0])[2], 0.5)
+        self.assertEqual(welch_t_test([1.0, 1.0], [2.0, 2.0])[2], 0.0)
+
+    def test_needs_two_values(self):
+        with self.assertRaises(ValueError):
+            welch_t_test([1.0], [1.0, 2.0])
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['user', 'date'], name='category_user_date_idx'),
+        ),
+    ]
@@ -1,27 +1,63 @@
 from django.db import models
+from django.db.models import BooleanField, Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from expense.models import Expense
 from django.db.models.signals import post_save
 
+class CategoryQuerySet(models.QuerySet):
+    def with_spending(self):
+        """
+        Annotates each category with spent, remaining and exceeded, computed
+        with one grouped join on its daily expense rollup instead of a query
+        per category.
+        """
+        return self.annotate(
+            spent=Coalesce(Sum("daily_rollups__total"), Value(0.0)),
+        ).annotate(
+            remaining=Cast("budget", FloatField()) - F("spent"),
+            exceeded=Case(
+                When(
+                    Q(budget__isnull=False) & Q(spent__gt=Cast("budget", FloatField())),
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+
+
 class Category(models.Model):
     user = models.ForeignKey(User, related_name="categories", on_delete=models.SET_NULL, null=True)
     name = models.CharField(max_length=50, null=True, blank=True)
     date = models.DateField(auto_now=True)
     budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=None)
 
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="category_user_date_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
+    # Spent comes from the with_spending() annotation when present.
     @property
     def total_expense_cost(self):
-        expenses = Expense.objects.filter(category=self.id)
-        return sum(expense.amount for expense in expenses)
+        if hasattr(self, "spent"):
+            return self.spent
+        total = Expense.objects.filter(category=self.id).aggregate(total=Sum("amount"))
+        return total["total"] or 0
 
+    # Computed from the current budget, which an update may have changed
+    # since the remaining and exceeded annotations were read.
     @property
     def remaining_budget(self):
         if self.budget is not None:
-            return self.budget - self.total_expense_cost
+            return float(self.budget) - self.total_expense_cost
         return None
 
     @property
@@ -30,13 +66,19 @@ class Category(models.Model):
             return self.total_expense_cost > self.budget
         return False
 
+DEFAULT_CATEGORY_NAMES = (
+    "Food and Drinks",
+    "Transport",
+    "Groceries",
+    "Personal",
+    "Services",
+    "Miscellaneous",
+)
+
+
 # Create default categories with budgets when a new user is created
 @receiver(post_save, sender=User)
 def create_default_categories(sender, instance, created, **kwargs):
     if created:
-        Category.objects.create(user=instance, name="Food and Drinks")
-        Category.objects.create(user=instance, name="Transport")
-        Category.objects.create(user=instance, name="Groceries")
-        Category.objects.create(user=instance, name="Personal")
-        Category.objects.create(user=instance, name="Services")
-        Category.objects.create(user=instance, name="Miscellaneous")
+        for name in DEFAULT_CATEGORY_NAMES:
+            Category.objects.create(user=instance, name=name)
@@ -1,9 +1,21 @@
 from rest_framework import serializers
 
+from financetracker.serializers import ValuesSerializer
 from .models import Category
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    spent = serializers.FloatField(source="total_expense_cost", read_only=True)
+    remaining = serializers.FloatField(source="remaining_budget", read_only=True)
+    exceeded = serializers.BooleanField(source="is_budget_exceeded", read_only=True)
+
     class Meta:
         model = Category
         fields = '__all__'
+
+
+class CategoryReadSerializer(ValuesSerializer):
+    """Reads categories annotated by Category.objects.with_spending()."""
+
+    serializer_class = CategorySerializer
+    sources = {"spent": "spent", "remaining": "remaining", "exceeded": "exceeded"}
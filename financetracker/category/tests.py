@@ -1,3 +1,63 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
 
-# Create your tests here.
+from expense.models import Expense
+from financetracker.testing import QueryBudgetMixin
+
+from .models import Category
+
+
+class CategoryQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="budget")
+        cls.token = Token.objects.create(user=user)
+        categories = Category.objects.bulk_create(
+            Category(user=user, name=f"Category {i}", budget=100) for i in range(20)
+        )
+        Expense.bulk_create_tracked(
+            [
+                Expense(user=user, category=categories[i % 20], name=f"Expense {i}", amount=i)
+                for i in range(100)
+            ]
+        )
+        cls.category = categories[0]
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_list_stays_within_query_budget(self):
+        with self.assertWithinQueryBudget("/api/category/"):
+            response = self.get("/api/category/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.data["filtered"]),
+            Category.objects.filter(user_id=self.category.user_id).count(),
+        )
+
+    def test_detail_stays_within_query_budget(self):
+        path = f"/api/category/{self.category.pk}/"
+        with self.assertWithinQueryBudget(path):
+            response = self.get(path)
+        self.assertEqual(response.status_code, 200)
+
+
+class CategoryDetailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="detail")
+        self.token = Token.objects.create(user=self.user)
+        self.category = Category.objects.create(user=self.user, name="Rent", budget=100)
+        Expense.objects.create(user=self.user, category=self.category, name="Deposit", amount=30)
+
+    def test_update_reports_remaining_budget_against_the_new_budget(self):
+        response = self.client.put(
+            f"/api/category/{self.category.pk}/",
+            {"name": "Rent", "budget": 10},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["spent"], 30)
+        self.assertEqual(response.data["remaining"], -20)
+        self.assertTrue(response.data["exceeded"])
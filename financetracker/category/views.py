@@ -4,10 +4,11 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from report.cache import conditional_on_data_version
 
 
 from .models import Category
-from .serializers import CategorySerializer
+from .serializers import CategoryReadSerializer, CategorySerializer
 
 
 class CategoryListView(APIView):
@@ -16,7 +17,9 @@ class CategoryListView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
     def get(self, request, format=None):
         """
         Get method to retrieve categories for the authenticated user.
@@ -25,8 +28,8 @@ class CategoryListView(APIView):
             A Response object with the serialized category data and a status code.
         """
         try:
-            category = Category.objects.filter(user=request.user)
-            serializer = CategorySerializer(category, many=True)
+            category = Category.objects.filter(user=request.user).with_spending()
+            serializer = CategoryReadSerializer(category)
             data = {"filtered": serializer.data}
             return Response(data, status=status.HTTP_200_OK)
 
@@ -69,6 +72,7 @@ class CategoryDetailView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 4}
 
     def get_object(self, pk):
         """
@@ -84,7 +88,7 @@ class CategoryDetailView(APIView):
         - Http404: If the category with the provided primary key does not exist.
         """
         try:
-            return Category.objects.get(pk=pk)
+            return Category.objects.with_spending().get(pk=pk)
         except Category.DoesNotExist:
             raise Http404
 
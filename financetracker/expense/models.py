@@ -1,14 +1,13 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from financetracker.dates import month_range
 import calendar
-from income.models import Income
-from datetime import timedelta, datetime
+from report.models import DailyRollup, RollupTrackedModel
+from datetime import date, timedelta, datetime
 
-today = datetime.now().date()
-one_week_ago = today - timedelta(days=7)
-current_month = today.month
-
-class Expense(models.Model):
+class Expense(RollupTrackedModel):
     user = models.ForeignKey(
         User, related_name="expenses", on_delete=models.SET_NULL, null=True
     )
@@ -20,80 +19,155 @@ class Expense(models.Model):
     description = models.TextField(null=True, blank=True)
     date = models.DateField(auto_now=True)
 
+    rollup_kind = DailyRollup.EXPENSE
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date", "id"], name="expense_user_date_id_idx"),
+            models.Index(fields=["category", "amount"], name="expense_category_amount_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
     @staticmethod
     def get_expense_total(from_date, to_date, user):
-        if from_date == to_date:
-            filtered_expense = Expense.objects.filter(user=user).filter(date=to_date)
-            expense_sum = round(
-                (sum(expense.amount for expense in filtered_expense)), 2
-            )
-            return expense_sum
-        else:
-            filtered_expense = (
-                Expense.objects.filter(user=user)
-                .filter(date__range=(from_date, to_date))
-                .order_by("-id")
-            )
-            expense_sum = round(
-                (sum(expense.amount for expense in filtered_expense)), 2
-            )
-            return expense_sum
+        total = DailyRollup.objects.total(user, DailyRollup.EXPENSE, from_date, to_date)
+        return round(total, 2)
 
     @staticmethod
-    def get_expenses_daily_for_the_week(user):
+    def get_expenses_daily(user, from_date, to_date):
+        """
+        Returns the expense total for every day between from_date and to_date
+        (both inclusive) as a list of {"day", "amount"} dicts.
+
+        The totals come from a single GROUP BY day query on the daily rollup;
+        days without any expense are filled in with 0.
+        """
+        totals = DailyRollup.objects.daily_totals(
+            user, DailyRollup.EXPENSE, from_date, to_date
+        )
         data = []
-        delta = today - one_week_ago
-        for i in range(delta.days + 1):
-            day = one_week_ago + timedelta(days=i)
-            queryset = Expense.objects.filter(user=user).filter(date__startswith=day)
-            day_cost = sum([expense.amount for expense in queryset])
-            data.append({"day": day, "amount": day_cost})
+        for i in range((to_date - from_date).days + 1):
+            day = from_date + timedelta(days=i)
+            data.append({"day": day, "amount": totals.get(day, 0)})
         return data
 
     @staticmethod
-    def get_expenses_monthly_for_the_year(user):
+    def get_expenses_daily_for_the_week(user, days=7):
+        to_date = datetime.now().date()
+        return Expense.get_expenses_daily(user, to_date - timedelta(days=days), to_date)
+
+    @staticmethod
+    def get_expenses_monthly(user, from_year, to_year):
+        """
+        Returns the expense total for every month from January of from_year to
+        December of to_year as a list of {"year", "month", "amount"} dicts.
+
+        The totals come from a single query on the daily rollup grouped by
+        TruncMonth; months without any expense are filled in with 0.
+        """
+        totals = DailyRollup.objects.monthly_totals(
+            user, DailyRollup.EXPENSE, date(from_year, 1, 1), date(to_year, 12, 31)
+        )
+        return Expense.fill_monthly(totals, from_year, to_year)
+
+    @staticmethod
+    def fill_monthly(totals, from_year, to_year):
+        """
+        Turns {first day of month: total} into the list returned by
+        get_expenses_monthly, with 0 for the months missing from totals.
+        """
         data = []
-        for i in range(1, 13):
-            months = Expense.objects.filter(user=user).filter(date__month=i)
-            month_cost = sum([expense.amount for expense in months])
-            month_name = calendar.month_name[i]
-            data.append({"month": month_name, "amount": month_cost})
+        for year in range(from_year, to_year + 1):
+            for i in range(1, 13):
+                month_cost = totals.get(date(year, i, 1), 0)
+                data.append(
+                    {"year": year, "month": calendar.month_name[i], "amount": month_cost}
+                )
         return data
 
     @staticmethod
-    def get_net_expenses_for_the_month(user):
-        total_expenses = Expense.objects.filter(user=user).filter(
-            date__month=str(current_month)
+    def get_expenses_monthly_for_the_year(user, year=None):
+        if year is None:
+            year = datetime.now().year
+        return [
+            {"month": entry["month"], "amount": entry["amount"]}
+            for entry in Expense.get_expenses_monthly(user, year, year)
+        ]
+
+    @staticmethod
+    def get_net_summary(user, year=None, month=None):
+        """
+        Returns the expense and income sums and counts for a month, their net
+        value and the number of categories touched that month.
+
+        Every figure is a correlated subquery on the user's row, the sums and
+        counts reading the daily rollup, so the whole summary costs a single
+        round trip.
+        """
+        from category.models import Category
+
+        from_date, to_date = month_range(year, month)
+
+        def aggregated(queryset, aggregate, default):
+            return Coalesce(
+                Subquery(
+                    queryset.values("user")
+                    .annotate(value=aggregate)
+                    .values("value")
+                ),
+                default,
+            )
+
+        expenses = DailyRollup.objects.filter(
+            user=OuterRef("pk"), kind=DailyRollup.EXPENSE, day__range=(from_date, to_date)
         )
-        expense_count = (
-            Expense.objects.filter(user=user)
-            .filter(date__month=str(current_month))
-            .all()
-            .count()
+        incomes = DailyRollup.objects.filter(
+            user=OuterRef("pk"), kind=DailyRollup.INCOME, day__range=(from_date, to_date)
         )
-        expense_sum = round((sum(expense.amount for expense in total_expenses)), 2)
-        total_income = Income.objects.filter(user=user).filter(
-            date__month=str(current_month)
+        categories = Category.objects.filter(
+            user=OuterRef("pk"), date__range=(from_date, to_date)
         )
-        income_count = (
-            Income.objects.filter(user=user)
-            .filter(date__month=str(current_month))
-            .all()
-            .count()
+        totals = (
+            User.objects.filter(pk=user.pk)
+            .annotate(
+                expense_sum=aggregated(expenses, Sum("total"), 0.0),
+                expense_count=aggregated(expenses, Sum("count"), 0),
+                income_sum=aggregated(incomes, Sum("total"), 0.0),
+                income_count=aggregated(incomes, Sum("count"), 0),
+                category_count=aggregated(categories, Count("id"), 0),
+            )
+            .values(
+                "expense_sum",
+                "expense_count",
+                "income_sum",
+                "income_count",
+                "category_count",
+            )
+            .get()
         )
-        income_sum = round((sum(income.amount for income in total_income)), 2)
-        net_value = round((income_sum - expense_sum), 2)
-        data = (
-            {
-                "expense": expense_sum,
-                "income": income_sum,
-                "net": net_value,
-                "incomeCount": income_count,
-                "expenseCount": expense_count,
-            },
+        return Expense.build_net_summary(
+            totals["expense_sum"],
+            totals["expense_count"],
+            totals["income_sum"],
+            totals["income_count"],
+            totals["category_count"],
         )
 
-        return data
+    @staticmethod
+    def build_net_summary(expense_sum, expense_count, income_sum, income_count, category_count):
+        expense_sum = round(expense_sum, 2)
+        income_sum = round(income_sum, 2)
+        return {
+            "expense": expense_sum,
+            "income": income_sum,
+            "net": round((income_sum - expense_sum), 2),
+            "incomeCount": income_count,
+            "expenseCount": expense_count,
+            "categoryCount": category_count,
+        }
+
+    @staticmethod
+    def get_net_expenses_for_the_month(user, year=None, month=None):
+        return (Expense.get_net_summary(user, year, month),)
@@ -1,7 +1,12 @@
 from rest_framework import serializers
 
+from financetracker.serializers import ValuesSerializer
 from .models import Expense
 class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = '__all__'
+
+
+class ExpenseReadSerializer(ValuesSerializer):
+    serializer_class = ExpenseSerializer
@@ -1,3 +1,202 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet, Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from category.models import Category
+from financetracker.testing import QueryBudgetMixin
+from report.cache import get_data_version
+from report.models import DailyRollup
+
+from .models import Expense
+from .views import ExportExpenseCsv
+
+
+class ExpenseQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="budget")
+        cls.token = Token.objects.create(user=user)
+        categories = Category.objects.bulk_create(
+            Category(user=user, name=f"Category {i}", budget=100) for i in range(10)
+        )
+        Expense.bulk_create_tracked(
+            [
+                Expense(user=user, category=categories[i % 10], name=f"Expense {i}", amount=i)
+                for i in range(100)
+            ]
+        )
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_list_stays_within_query_budget(self):
+        with self.assertWithinQueryBudget("/api/expense/"):
+            response = self.get("/api/expense/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 100)
+
+    def test_csv_export_does_not_query_per_row(self):
+        # The token lookup and one batch of rows with their categories joined.
+        with self.assertWithinQueryBudget(ExportExpenseCsv, budget=2):
+            response = self.get("/api/expense/export-csv/")
+            content = b"".join(response.streaming_content)
+        self.assertEqual(len(content.splitlines()), 101)
+
+
+class ExpenseImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="importer")
+        self.token = Token.objects.create(user=self.user)
+
+    def post(self, body, content_type):
+        return self.client.post(
+            "/api/expense/import/", body, content_type=content_type, HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def test_csv_body_with_a_charset_parameter(self):
+        response = self.post("name,amount,description,category\nLunch,12,,Transport\n", "text/csv; charset=utf-8")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {"imported": 1})
+
+    def test_csv_body_is_decoded_with_its_charset(self):
+        # The test client encodes the body with the charset it is sent with.
+        response = self.post("name,amount,description,category\nCafé,3,,\n", "text/csv; charset=ISO-8859-1")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Expense.objects.get(user=self.user).name, "Café")
+
+    def test_category_names_and_ids_are_looked_up_apart(self):
+        transport = Category.objects.get(user=self.user, name="Transport")
+        named_after_id = Category.objects.create(user=self.user, name=str(transport.pk))
+        other_user_category = User.objects.create(username="other").categories.first()
+        rows = [
+            {"name": "By name", "amount": 1, "category": str(transport.pk)},
+            {"name": "By id", "amount": 1, "category": transport.pk},
+            {"name": "By id text", "amount": 1, "category": str(named_after_id.pk)},
+            {"name": "Case", "amount": 1, "category": "transport"},
+        ]
+        response = self.post(rows, "application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            dict(Expense.objects.filter(user=self.user).values_list("name", "category_id")),
+            {"By name": named_after_id.pk, "By id": transport.pk, "By id text": named_after_id.pk, "Case": transport.pk},
+        )
+        response = self.post([{"name": "Theirs", "amount": 1, "category": other_user_category.pk}], "application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [{"row": 1, "errors": {"category": "Unknown category."}}])
+
+
+class ExpenseBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="batcher")
+        self.token = Token.objects.create(user=self.user)
+        self.category = Category.objects.filter(user=self.user).first()
+
+    def post(self, operations):
+        return self.client.post(
+            "/api/expense/batch/", operations, content_type="application/json", HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def rollup(self):
+        totals = DailyRollup.objects.filter(user=self.user, kind=DailyRollup.EXPENSE).aggregate(
+            total=Sum("total"), count=Sum("count")
+        )
+        return totals["total"], totals["count"]
+
+    def create(self, name, amount=1):
+        return {"op": "create", "data": {"name": name, "amount": amount, "category": self.category.pk}}
+
+    def test_creates_without_returned_ids_use_one_insert(self):
+        # As on MySQL, which does not return the ids of bulk inserted rows.
+        Expense.objects.create(user=self.user, category=self.category, name="Earlier", amount=1)
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post([self.create(f"Expense {i}", i) for i in range(200)])
+        self.assertEqual(response.status_code, 200)
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "expense_expense"')]
+        self.assertLessEqual(len(inserts), 2)
+        self.assertLess(len(queries), 20)
+        ids = [result["data"]["id"] for result in response.data["results"]]
+        self.assertEqual(
+            [Expense.objects.get(pk=pk).name for pk in ids], [f"Expense {i}" for i in range(200)]
+        )
+
+    def test_rows_created_concurrently_are_told_apart(self):
+        bulk_create = QuerySet.bulk_create
+
+        def racing_bulk_create(queryset, objs, *args, **kwargs):
+            created = bulk_create(queryset, objs, *args, **kwargs)
+            if queryset.model is Expense:
+                # Another request of the same user inserts a row meanwhile.
+                bulk_create(Expense.objects.all(), [Expense(user=self.user, name="Elsewhere", amount=5)])
+            return created
+
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            with mock.patch.object(QuerySet, "bulk_create", racing_bulk_create):
+                response = self.post([self.create("First"), self.create("Second")])
+        self.assertEqual(response.status_code, 200)
+        ids = [result["data"]["id"] for result in response.data["results"]]
+        self.assertEqual([Expense.objects.get(pk=pk).name for pk in ids], ["First", "Second"])
+
+    def test_invalid_operation_rejects_the_whole_batch(self):
+        kept = Expense.objects.create(user=self.user, category=self.category, name="Kept", amount=10)
+        others = User.objects.create(username="other")
+        theirs = Expense.objects.create(user=others, name="Theirs", amount=1)
+        response = self.post(
+            [
+                self.create("New"),
+                {"op": "update", "id": kept.pk, "data": {"amount": 20}},
+                {"op": "delete", "id": theirs.pk},
+                {"op": "update", "id": kept.pk, "data": {"amount": 30}},
+                {"op": "create", "data": {"name": "No amount", "amount": "many", "category": self.category.pk}},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result["status"] for result in response.data["results"]], [424, 424, 404, 409, 400])
+        self.assertEqual(list(Expense.objects.filter(user=self.user).values_list("name", "amount")), [("Kept", 10)])
+        self.assertTrue(Expense.objects.filter(pk=theirs.pk).exists())
+        self.assertEqual(self.rollup(), (10, 1))
+
+    def test_applied_batch_keeps_the_rollup_and_reports_in_step(self):
+        updated = Expense.objects.create(user=self.user, category=self.category, name="Updated", amount=10)
+        deleted = Expense.objects.create(user=self.user, category=self.category, name="Deleted", amount=20)
+        version = get_data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(
+                [
+                    self.create("New", 5),
+                    {"op": "update", "id": updated.pk, "data": {"amount": 12}},
+                    {"op": "delete", "id": deleted.pk},
+                    {"op": "fetch", "ids": [updated.pk, deleted.pk]},
+                ]
+            )
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [201, 200, 204, 200])
+        self.assertEqual([row["amount"] for row in results[3]["data"]], [12])
+        self.assertEqual(results[3]["missing"], [deleted.pk])
+        self.assertEqual(self.rollup(), (17, 2))
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+
+class ExpensePaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="pager")
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}")
 
-# Create your tests here.
+    def test_invalid_cursor_is_reported_as_such(self):
+        for path in (
+            "/api/expense/?cursor=bogus",
+            "/api/report-date-range/?select=expense&from_date=2026-01-01&to_date=2026-12-31&cursor=bogus",
+            "/api/async/report-date-range/?select=expense&from_date=2026-01-01&to_date=2026-12-31&cursor=bogus",
+        ):
+            response = self.get(path)
+            self.assertEqual(response.status_code, 404, path)
+            self.assertEqual(response.json(), {"detail": "Invalid cursor"}, path)
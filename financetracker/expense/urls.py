@@ -6,5 +6,7 @@ urlpatterns = [
     path("expense/", views.ExpenseListView.as_view(), name="expense_list"),
     path("expense/<int:pk>/", views.ExpenseDetailView.as_view(), name="expense_detail"),
     path("expense/export-csv/", views.ExportExpenseCsv.as_view(), name="export_csv"),
+    path("expense/import/", views.ImportExpenseView.as_view(), name="import_expenses"),
+    path("expense/batch/", views.ExpenseBatchView.as_view(), name="expense_batch"),
 
 ]
@@ -1,14 +1,27 @@
 from django.http import Http404
-from django.http.response import HttpResponse
 from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import csv
+from report.cache import conditional_on_data_version
+from financetracker.batch import BatchView
+from financetracker.dates import date_range_from_request, month_range
+from financetracker.pagination import KeysetPagination
+from category.models import Category
+from financetracker.tabular import (
+    IMPORT_BATCH_SIZE,
+    MAX_REPORTED_ERRORS,
+    clean_rows,
+    iterate_in_batches,
+    number_column,
+    read_rows,
+    reference_column,
+    stream_csv,
+    text_column,
+)
 from .models import Expense
-from .serializers import ExpenseSerializer
-from datetime import datetime
-current_month = datetime.now().month
+from .serializers import ExpenseReadSerializer, ExpenseSerializer
 
 class ExpenseListView(APIView):
     """
@@ -17,6 +30,8 @@ class ExpenseListView(APIView):
     GET request:
     - Retrieves expenses for the authenticated user for the current month.
     - Returns a list of serialized expense objects.
+    - With a cursor or page_size query parameter, returns one page of
+      {"next", "results"} instead, newest first (see KeysetPagination).
 
     POST request:
     - Creates a new expense for the authenticated user.
@@ -30,16 +45,25 @@ class ExpenseListView(APIView):
     If any error occurs during retrieval or creation of expenses, appropriate error responses are returned.
     """
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
     def get(self, request):
         try:
             results = (
                 Expense.objects.filter(user=request.user)
-                .filter(date__month=str(current_month))
+                .filter(date__range=month_range())
                 .order_by("-id")
             )
-            serializer = ExpenseSerializer(results, many=True)
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(ExpenseReadSerializer.values(results), request, view=self)
+            if page is not None:
+                return paginator.get_paginated_response(ExpenseReadSerializer(page).data)
+            serializer = ExpenseReadSerializer(results)
             return Response(serializer.data, status=status.HTTP_200_OK)
+        except APIException:
+            # Such as the invalid cursor error of KeysetPagination.
+            raise
         except:
             return Response(
                 data={"message": "Unable to retrieve expenses"},
@@ -79,6 +103,7 @@ class ExpenseDetailView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 4}
 
     def get_object(self, pk):
         """
@@ -213,28 +238,121 @@ class ExportExpenseCsv(APIView):
     API view to export expenses as a CSV file.
 
     This view allows users to download their expenses as a CSV file.
-    The CSV file will contain the following columns: name, category, amount, description, budget.
+    The CSV file will contain the following columns: name, category, amount, description, budget, date.
+
+    Supported query parameters:
+    - from_date: The start date of the export (format: YYYY-MM-DD, default: start of the current month).
+    - to_date: The end date of the export (format: YYYY-MM-DD, default: end of the current month).
+
+    The file is streamed in batches, with the category joined into each batch,
+    so memory use does not grow with the number of exported rows.
     """
 
     def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=expenses.csv"
-        writer = csv.writer(response)
-        writer.writerow(["name", "category", "amount", "description", "budget"])
-        expenses = (
-            Expense.objects.filter(user=request.user)
-            .filter(date__month=str(current_month))
-            .order_by("-id")
+        try:
+            from_date, to_date = date_range_from_request(request)
+        except ValueError:
+            return Response(
+                data={"message": "Invalid date range"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        expenses = Expense.objects.filter(user=request.user).filter(
+            date__range=(from_date, to_date)
         )
-        
-        for expense in expenses:
-            writer.writerow(
-                [
-                    expense.name,
-                    expense.category.name,
-                    expense.amount,
-                    expense.description,
-                    expense.category.budget,
-                ]
+        rows = iterate_in_batches(
+            expenses,
+            ["name", "category__name", "amount", "description", "category__budget", "date"],
+        )
+        return stream_csv(
+            "expenses.csv",
+            ["name", "category", "amount", "description", "budget", "date"],
+            rows,
+        )
+
+
+class ImportExpenseView(APIView):
+    """
+    API view for importing many expenses at once.
+
+    POST request:
+    - Accepts a CSV file upload (field "file"), a text/csv body or a JSON array.
+    - Each row has the columns name, amount, description and category, where
+      category is the name of one of the user's categories, or its ID. A
+      text cell is matched against the names first and only then as an ID;
+      a JSON integer is only matched as an ID.
+    - Rows are validated in a single pass and categories are resolved with one
+      lookup. If any row is invalid nothing is imported and the errors are
+      returned per row; otherwise every row is inserted with batched
+      bulk_create in a single transaction.
+    - Imported expenses are dated today, like every new expense.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    columns = {
+        "name": text_column(max_length=30),
+        "amount": number_column(),
+        "description": text_column(),
+        "category": reference_column(),
+    }
+
+    def post(self, request):
+        try:
+            rows = read_rows(request)
+        except ValueError as e:
+            return Response(data={"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cleaned, errors = clean_rows(rows, self.columns)
+        row_errors = {error["row"]: error["errors"] for error in errors}
+        # Names and ids are kept apart: a category named "5" must not be
+        # confused with the category whose id is 5.
+        category_ids, category_names = set(), {}
+        for category_id, name in Category.objects.filter(user=request.user).values_list("id", "name"):
+            category_ids.add(category_id)
+            if name:
+                category_names.setdefault(name.casefold(), category_id)
+        expenses = []
+        for number, row in enumerate(cleaned, start=1):
+            category = row["category"]
+            category_id = None
+            if isinstance(category, int):
+                category_id = category if category in category_ids else None
+            elif category is not None:
+                category_id = category_names.get(category.casefold())
+                if category_id is None and category.isdigit() and int(category) in category_ids:
+                    category_id = int(category)
+            if category is not None and category_id is None:
+                row_errors.setdefault(number, {})["category"] = "Unknown category."
+                continue
+            expenses.append(
+                Expense(
+                    name=row["name"],
+                    amount=row["amount"],
+                    description=row["description"],
+                    category_id=category_id,
+                    user=request.user,
+                )
+            )
+        if row_errors:
+            errors = [{"row": number, "errors": row_errors[number]} for number in sorted(row_errors)]
+            return Response(
+                data={
+                    "message": "Unable to import expenses",
+                    "errorCount": len(errors),
+                    "errors": errors[:MAX_REPORTED_ERRORS],
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        return response
+        Expense.bulk_create_tracked(expenses, batch_size=IMPORT_BATCH_SIZE)
+        return Response(data={"imported": len(expenses)}, status=status.HTTP_201_CREATED)
+
+
+class ExpenseBatchView(BatchView):
+    """
+    API view for applying many expense operations in one request, e.g. when
+    syncing offline edits. See BatchView for the request format; category
+    must be one of the user's categories.
+    """
+
+    model = Expense
+    serializer_class = ExpenseSerializer
+    relations = {"category": Category}
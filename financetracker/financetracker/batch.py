@@ -0,0 +1,306 @@
+"""
+Batch endpoints: many create, update, delete and fetch operations on a user's
+rows in one request.
+"""
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from report.cache import bump_data_version
+from report.models import DailyRollup, RollupTrackedModel
+
+MAX_BATCH_OPERATIONS = 1000
+OPERATIONS = ("create", "update", "delete", "fetch")
+
+
+def parse_id(value):
+    """Returns value as a positive integer id, None if it is not one."""
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class BatchView(APIView):
+    """
+    Base view applying a list of operations to the rows of one model.
+
+    POST request:
+    - Expects a JSON array of operations, or an object with the array under
+      "operations", at most MAX_BATCH_OPERATIONS long:
+        - {"op": "create", "data": {...}}
+        - {"op": "update", "id": 1, "data": {...}} (partial update)
+        - {"op": "delete", "id": 1}
+        - {"op": "fetch", "ids": [1, 2]}
+    - Every id is checked against the user's rows with one locking query and
+      the related ids in the data with one query per relation. If any
+      operation is invalid nothing is written and a 400 response lists the
+      errors per operation.
+    - Otherwise all creates, updates and deletes are applied with one
+      bulk_create, one bulk_update and one filtered delete inside a single
+      transaction, and the response holds a result per operation, in request
+      order. Fetches see the rows as they are after the batch.
+
+    Subclasses set model and serializer_class, and may change:
+    - owner_lookup: the lookup from the model to the owning user.
+    - owner_fields: fields set to the user on create and never read from data.
+    - relations: {field name: model} for foreign keys in the data, which must
+      point to rows owned by the user through their user field.
+    - validate_changes(): further checks across all the valid operations.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    model = None
+    serializer_class = None
+    owner_lookup = "user"
+    owner_fields = ("user",)
+    relations = {}
+
+    def get_queryset(self, request):
+        return self.model._default_manager.filter(**{self.owner_lookup: request.user})
+
+    def get_input_serializer(self, instance, data):
+        serializer = self.serializer_class(instance, data=data, partial=instance is not None)
+        # Relations are resolved for the whole batch at once instead of with
+        # a query per field per operation, and owners come from the request.
+        for name in (*self.owner_fields, *self.relations):
+            serializer.fields.pop(name, None)
+        return serializer
+
+    def create_rows(self, request, objs):
+        manager = self.model._default_manager
+        if connection.features.can_return_rows_from_bulk_insert or not objs:
+            manager.bulk_create(objs)
+            return
+        # MySQL does not hand back the ids of bulk inserted rows, which the
+        # response needs. Auto-increment ids grow in insertion order, so they
+        # are read back with one query for the user's rows above the highest
+        # id there was before the insert.
+        last_pk = manager.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+        manager.bulk_create(objs)
+        fields = [field.attname for field in self.model._meta.concrete_fields if not field.primary_key]
+        rows = list(self.get_queryset(request).filter(pk__gt=last_pk).order_by("pk").values("pk", *fields))
+        if len(rows) > len(objs):
+            # Rows the user created concurrently elsewhere are interleaved:
+            # keep those holding the values of the batch's rows, in order.
+            remaining = iter(rows)
+            rows = [
+                next((row for row in remaining if all(row[name] == getattr(obj, name) for name in fields)), None)
+                for obj in objs
+            ]
+        if len(rows) != len(objs) or None in rows:
+            raise DatabaseError("Unable to read back the ids of the created rows")
+        for obj, row in zip(objs, rows):
+            obj.pk = row["pk"]
+
+    def delete_rows(self, pks):
+        self.model._default_manager.filter(pk__in=pks).delete()
+
+    def post(self, request):
+        operations = request.data
+        if isinstance(operations, dict):
+            operations = operations.get("operations")
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            return Response(
+                data={"message": "Expected a JSON array of operations"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return Response(
+                data={"message": f"At most {MAX_BATCH_OPERATIONS} operations are allowed per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [{"op": operation.get("op")} for operation in operations]
+
+        def fail(index, code, errors):
+            results[index].update(status=code, errors=errors)
+
+        ids = set()
+        written = set()
+        for index, operation in enumerate(operations):
+            op = operation.get("op")
+            if op not in OPERATIONS:
+                fail(index, status.HTTP_400_BAD_REQUEST, {"op": f"Expected one of {', '.join(OPERATIONS)}."})
+                continue
+            if op in ("create", "update") and not isinstance(operation.get("data"), dict):
+                fail(index, status.HTTP_400_BAD_REQUEST, {"data": "Expected an object."})
+                continue
+            if op in ("update", "delete"):
+                pk = parse_id(operation.get("id"))
+                if pk is None:
+                    fail(index, status.HTTP_400_BAD_REQUEST, {"id": "A valid integer is required."})
+                    continue
+                results[index]["id"] = pk
+                if pk in written:
+                    fail(index, status.HTTP_409_CONFLICT, {"id": "Only one update or delete per id is allowed."})
+                else:
+                    written.add(pk)
+                    ids.add(pk)
+            elif op == "fetch":
+                fetch_ids = operation.get("ids")
+                if not isinstance(fetch_ids, list):
+                    fail(index, status.HTTP_400_BAD_REQUEST, {"ids": "Expected a list of ids."})
+                    continue
+                fetch_ids = [parse_id(pk) for pk in fetch_ids]
+                if None in fetch_ids:
+                    fail(index, status.HTTP_400_BAD_REQUEST, {"ids": "A valid integer is required."})
+                    continue
+                ids.update(fetch_ids)
+                results[index]["ids"] = fetch_ids
+
+        with transaction.atomic():
+            rows = self.get_queryset(request).select_for_update().in_bulk(ids)
+            changes = self.validate(request, operations, results, rows, fail)
+            if any("errors" in result for result in results):
+                for result in results:
+                    result.setdefault("status", status.HTTP_424_FAILED_DEPENDENCY)
+                    result.pop("ids", None)
+                return Response(
+                    data={"message": "No operation was applied", "results": results},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            self.apply(request, operations, results, rows, changes)
+        return Response(data={"results": results}, status=status.HTTP_200_OK)
+
+    def validate(self, request, operations, results, rows, fail):
+        """
+        Validates the data of every create and update and checks that updated
+        and deleted ids belong to the user. Returns {index: field values}.
+        """
+        changes = {}
+        related_ids = {name: set() for name in self.relations}
+        for index, operation in enumerate(operations):
+            if "errors" in results[index] or results[index]["op"] not in ("create", "update", "delete"):
+                continue
+            instance = None
+            if results[index]["op"] != "create":
+                instance = rows.get(results[index]["id"])
+                if instance is None:
+                    fail(index, status.HTTP_404_NOT_FOUND, {"id": "Not found."})
+                    continue
+                if results[index]["op"] == "delete":
+                    continue
+            data = operation["data"]
+            serializer = self.get_input_serializer(instance, data)
+            if not serializer.is_valid():
+                fail(index, status.HTTP_400_BAD_REQUEST, serializer.errors)
+                continue
+            values = dict(serializer.validated_data)
+            errors = {}
+            for name in self.relations:
+                field = self.model._meta.get_field(name)
+                if data.get(name) in (None, ""):
+                    if name in data and field.null:
+                        values[field.attname] = None
+                    elif name in data or (instance is None and not field.null):
+                        errors[name] = "This field is required."
+                    continue
+                pk = parse_id(data[name])
+                if pk is None:
+                    errors[name] = "A valid integer is required."
+                    continue
+                values[field.attname] = pk
+                related_ids[name].add(pk)
+            if errors:
+                fail(index, status.HTTP_400_BAD_REQUEST, errors)
+                continue
+            changes[index] = values
+
+        for name, model in self.relations.items():
+            if not related_ids[name]:
+                continue
+            attname = self.model._meta.get_field(name).attname
+            owned = set(
+                model._default_manager.filter(user=request.user, pk__in=related_ids[name])
+                .values_list("pk", flat=True)
+            )
+            for index, values in changes.items():
+                pk = values.get(attname)
+                if pk is not None and pk not in owned:
+                    fail(index, status.HTTP_400_BAD_REQUEST, {name: f'Invalid pk "{pk}" - object does not exist.'})
+        self.validate_changes(
+            request, results, {index: values for index, values in changes.items() if "errors" not in results[index]}, fail
+        )
+        return changes
+
+    def validate_changes(self, request, results, changes, fail):
+        """
+        Hook for rules spanning several operations. changes holds the field
+        values of the creates and updates that are valid so far; call fail()
+        for those breaking a rule.
+        """
+
+    def apply(self, request, operations, results, rows, changes):
+        tracked = issubclass(self.model, RollupTrackedModel)
+        entries = []
+        defaults = {name: request.user for name in self.owner_fields}
+        objs = {}
+        for index, values in changes.items():
+            if results[index]["op"] == "create":
+                objs[index] = self.model(**defaults, **values)
+        self.create_rows(request, list(objs.values()))
+        if tracked:
+            entries.extend(obj.rollup_entry() for obj in objs.values())
+
+        updated = []
+        fields = set()
+        auto_now = [field for field in self.model._meta.concrete_fields if getattr(field, "auto_now", False)]
+        for index, values in changes.items():
+            if results[index]["op"] != "update":
+                continue
+            obj = objs[index] = rows[results[index]["id"]]
+            if tracked:
+                entries.append(obj.rollup_entry(-1))
+            for name, value in values.items():
+                setattr(obj, name, value)
+                fields.add(self.model._meta.get_field(name).name)
+            # bulk_update does not run pre_save, so do what save() would.
+            for field in auto_now:
+                field.pre_save(obj, add=False)
+                fields.add(field.name)
+            if tracked:
+                entries.append(obj.rollup_entry())
+            updated.append(obj)
+        if updated:
+            self.model._default_manager.bulk_update(updated, sorted(fields))
+
+        deleted = [result["id"] for result in results if result["op"] == "delete"]
+        if deleted:
+            if tracked:
+                entries.extend(rows[pk].rollup_entry(-1) for pk in deleted)
+            self.delete_rows(deleted)
+            for pk in deleted:
+                del rows[pk]
+
+        if tracked:
+            DailyRollup.objects.apply(self.model.rollup_kind, entries)
+        if changes or deleted:
+            bump_data_version(request.user.pk)
+
+        for index, result in enumerate(results):
+            if result["op"] == "fetch":
+                fetch_ids = list(dict.fromkeys(result.pop("ids")))
+                objs[index] = [rows[pk] for pk in fetch_ids if pk in rows]
+                result["missing"] = [pk for pk in fetch_ids if pk not in rows]
+        serialized = {}
+        pending = [obj for value in objs.values() for obj in (value if isinstance(value, list) else [value])]
+        pending = list({id(obj): obj for obj in pending}.values())
+        for obj, data in zip(pending, self.serializer_class(pending, many=True).data):
+            serialized[id(obj)] = data
+        for index, result in enumerate(results):
+            op = result["op"]
+            if op == "create":
+                result.update(status=status.HTTP_201_CREATED, data=serialized[id(objs[index])])
+            elif op == "update":
+                result.update(status=status.HTTP_200_OK, data=serialized[id(objs[index])])
+            elif op == "delete":
+                result["status"] = status.HTTP_204_NO_CONTENT
+            else:
+                result.update(status=status.HTTP_200_OK, data=[serialized[id(obj)] for obj in objs[index]])
@@ -0,0 +1,34 @@
+import calendar
+from datetime import date, datetime
+
+
+def month_range(year=None, month=None):
+    """
+    Returns the first and last day of a month as a (from_date, to_date) tuple,
+    defaulting to the current year and month.
+
+    Filtering on date__range=month_range(...) instead of date__month lets the
+    database use an index on the date column.
+    """
+    today = datetime.now().date()
+    year = today.year if year is None else int(year)
+    month = today.month if month is None else int(month)
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+
+def date_range_from_request(request):
+    """
+    Reads the from_date and to_date query parameters (YYYY-MM-DD) of a
+    request, each defaulting to the matching end of the current month.
+
+    Raises ValueError if a date is malformed or the range is reversed.
+    """
+    first_day, last_day = month_range()
+    from_date = request.GET.get("from_date")
+    to_date = request.GET.get("to_date")
+    from_date = date.fromisoformat(from_date) if from_date else first_day
+    to_date = date.fromisoformat(to_date) if to_date else last_day
+    if from_date > to_date:
+        raise ValueError("from_date must not be after to_date")
+    return from_date, to_date
@@ -0,0 +1,149 @@
+"""
+Per-request SQL instrumentation.
+
+QueryCountMiddleware counts the queries each request runs and how long they
+take. With QUERY_COUNT_HEADERS on (the default while DEBUG is) the figures
+are returned in X-DB-Queries and X-DB-Time (milliseconds) headers. Requests
+running more queries than the budget of their view are logged to the
+financetracker.queries logger.
+
+A view declares its budget with a query_budget attribute, either a number
+of queries or a dict of them by HTTP method. It counts every query of a
+request, authentication included:
+
+    class CategoryListView(APIView):
+        query_budget = {"GET": 3}
+
+Views without one fall back to settings.DEFAULT_QUERY_BUDGET, None for no
+budget. financetracker.testing.QueryBudgetMixin checks budgets in tests.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("financetracker.queries")
+
+
+def get_query_budget(view, method="GET"):
+    """Returns the query budget of a view class or function for method, or the default."""
+    if isinstance(view, type):
+        view_class = view
+    else:
+        view_class = getattr(view, "view_class", None) or getattr(view, "cls", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is None:
+        budget = getattr(view, "query_budget", None)
+    if isinstance(budget, dict):
+        budget = budget.get(method.upper())
+    if budget is None:
+        budget = getattr(settings, "DEFAULT_QUERY_BUDGET", None)
+    return budget
+
+
+class QueryCounter:
+    """An execute wrapper (see connection.execute_wrapper) adding up queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+class QueryCountMiddleware:
+    """
+    Counts the SQL queries of every request on the request thread's
+    connections. Under ASGI that is the thread the request's synchronous
+    code runs on. Queries run on other threads, such as those the
+    asynchronous report views start, are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.add_headers = getattr(settings, "QUERY_COUNT_HEADERS", settings.DEBUG)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        request.query_budget = None
+        with self.counting(counter):
+            response = self.get_response(request)
+        return self.finish(request, counter, response)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        request.query_budget = None
+        # Connections belong to a thread: wrap those of the thread the
+        # synchronous views and middleware of this request run on.
+        counting = await sync_to_async(self.counting)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counting.close)()
+        return self.finish(request, counter, response)
+
+    def finish(self, request, counter, response):
+        if self.add_headers:
+            response["X-DB-Queries"] = str(counter.count)
+            response["X-DB-Time"] = f"{counter.duration_ms:.1f}"
+        if response.streaming and not response.is_async:
+            # Streamed rows are read while the response is sent: keep
+            # counting until it ends. The headers only cover the queries
+            # made before streaming started.
+            response.streaming_content = self.stream(request, counter, response.streaming_content)
+        else:
+            self.check_budget(request, counter)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
+
+    @staticmethod
+    def counting(counter):
+        stack = ExitStack()
+        for connection in connections.all(initialized_only=False):
+            stack.enter_context(connection.execute_wrapper(counter))
+        return stack
+
+    def stream(self, request, counter, content):
+        iterator = iter(content)
+        while True:
+            with self.counting(counter):
+                chunk = next(iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+        self.check_budget(request, counter)
+
+    def check_budget(self, request, counter):
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s ran %d queries in %.1f ms, over the budget of %d of %s",
+                request.method,
+                request.get_full_path(),
+                counter.count,
+                counter.duration_ms,
+                budget,
+                request.resolver_match.view_name if request.resolver_match else "the view",
+            )
@@ -0,0 +1,104 @@
+"""
+Faster renderers for the REST API.
+
+ORJSONRenderer is a drop-in replacement for DRF's JSONRenderer that encodes
+with orjson and produces the same bytes; MessagePackRenderer offers msgpack
+to clients that ask for it. Both libraries are optional: without orjson the
+DRF renderer is used, and settings only advertise msgpack when it is
+installed.
+"""
+import re
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# Types orjson does not encode itself (datetimes are passed through on purpose)
+# go through DRF's encoder, as they would with the stdlib json module.
+encoder_default = JSONEncoder().default
+
+# orjson writes an exponent as a lowercase "e" followed by "-" or a digit.
+EXPONENT = re.compile(rb"e[-\d]")
+
+
+def may_differ_from_stdlib(content):
+    """
+    Returns whether orjson output may contain a float that Python's json
+    writes differently: those below 1e-4 or from 1e16 up, which the stdlib
+    writes as "1e-05" and "1e+16" where orjson writes "0.00001" and "1e16".
+    A string that only looks like such a float costs the slow path, never a
+    different result.
+    """
+    if b"0.0000" in content:
+        return True
+    for match in EXPONENT.finditer(content):
+        if match.start() and content[match.start() - 1] in b"0123456789":
+            return True
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson.
+
+    Output is byte-for-byte what JSONRenderer produces with the default
+    UNICODE_JSON and COMPACT_JSON settings: datetimes, dates, times,
+    Decimals and lazy strings go through DRF's encoder, U+2028 and U+2029
+    are escaped and floats keep Python's notation. Indented output
+    (application/json; indent=4, the browsable API) and other JSON settings
+    are left to JSONRenderer, as is everything when orjson is missing.
+
+    One difference remains: NaN and infinite floats are rendered as null
+    instead of failing with STRICT_JSON.
+    """
+
+    options = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encoder_default, option=self.options)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits and the like: let the stdlib encoder
+            # render them or raise its usual error.
+            return super().render(data, accepted_media_type, renderer_context)
+        if may_differ_from_stdlib(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack for clients sending Accept: application/msgpack.
+
+    Values JSON has no type for are converted by DRF's encoder, so dates and
+    Decimals arrive as the same strings and numbers as in JSON responses.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encoder_default, use_bin_type=True, datetime=False)
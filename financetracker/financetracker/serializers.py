@@ -0,0 +1,95 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import fields
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+
+# Fields whose to_representation is exactly one of these builtins, which are
+# called directly. Subclasses may override it, so only exact types qualify.
+BUILTIN_CONVERTERS = {
+    fields.CharField: str,
+    fields.FloatField: float,
+    fields.IntegerField: int,
+}
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer used with many=True.
+
+    The serializer's readable fields are compiled once per class into
+    (field name, values() column, converter) triples, where the converter is
+    the bound field's own to_representation. Rows are then fetched with
+    .values() and turned into dicts without creating model instances or
+    going through the serializer machinery per row, while producing exactly
+    what serializer_class(queryset, many=True).data would.
+
+    Subclasses set serializer_class, and sources to map fields whose source
+    is not a model field, such as a property backed by an annotation, to
+    the values() column holding the same value.
+
+        ExpenseReadSerializer(queryset).data
+    """
+
+    serializer_class = None
+    sources = {}
+
+    def __init__(self, rows):
+        # A queryset of model rows, or rows already fetched with values().
+        self.rows = rows
+
+    @classmethod
+    def get_columns(cls):
+        if "_columns" not in cls.__dict__:
+            cls._columns = cls.compile()
+        return cls._columns
+
+    @classmethod
+    def compile(cls):
+        serializer = cls.serializer_class()
+        opts = serializer.Meta.model._meta
+        columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in cls.sources:
+                column = cls.sources[name]
+            elif field.source in {f.name for f in opts.concrete_fields}:
+                column = field.source
+            else:
+                raise ImproperlyConfigured(
+                    f"{cls.__name__} cannot read {name!r} from values(); add it to sources."
+                )
+            if isinstance(field, PrimaryKeyRelatedField):
+                # values() already holds the related id, which is what the
+                # field renders for the pk-only object DRF would pass it.
+                to_representation = (lambda value: value) if field.pk_field is None else field.pk_field.to_representation
+            elif isinstance(field, RelatedField):
+                raise ImproperlyConfigured(f"{cls.__name__} only supports primary key relations.")
+            else:
+                to_representation = BUILTIN_CONVERTERS.get(type(field), field.to_representation)
+            columns.append((name, column, to_representation))
+        return columns
+
+    @classmethod
+    def values(cls, queryset):
+        """Returns queryset.values() with the columns the serializer reads."""
+        return queryset.values(*dict.fromkeys(column for _, column, _ in cls.get_columns()))
+
+    @classmethod
+    def serialize(cls, rows):
+        columns = cls.get_columns()
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, to_representation in columns:
+                value = row[column]
+                item[name] = None if value is None else to_representation(value)
+            data.append(item)
+        return data
+
+    @property
+    def data(self):
+        rows = self.rows
+        if isinstance(rows, QuerySet):
+            rows = self.values(rows)
+        return self.serialize(rows)
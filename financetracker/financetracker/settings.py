@@ -1,3 +1,4 @@
+from importlib.util import find_spec
 from pathlib import Path
 import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,18 +35,32 @@ INSTALLED_APPS = [
     'category',
     'expense',
     'investment',
+    'report',
+    'benchmark',
+    'profiling',
 
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'user.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
 
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson backed JSON, with the same output as DRF's JSONRenderer, and
+    # MessagePack for clients sending Accept/Content-Type: application/msgpack.
+    'DEFAULT_RENDERER_CLASSES': (
+        'financetracker.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ) + (('financetracker.renderers.MessagePackRenderer',) if find_spec('msgpack') else ()),
+    'DEFAULT_PARSER_CLASSES': (
+        'financetracker.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ) + (('financetracker.parsers.MessagePackParser',) if find_spec('msgpack') else ()),
 }
 
 JAZZMIN_SETTINGS = {
@@ -124,6 +139,7 @@ JAZZMIN_SETTINGS = {
 
 
 MIDDLEWARE = [
+    'financetracker.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -131,8 +147,39 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
+    'profiling.memory.MemoryTrackingMiddleware',
 ]
 
+# SQL instrumentation (see financetracker/middleware.py): X-DB-Queries and
+# X-DB-Time response headers outside production (or with QUERY_COUNT_HEADERS=1
+# in the environment, for benchmarks), and a warning for requests running more
+# queries than their view's query_budget, or than DEFAULT_QUERY_BUDGET for
+# views without one (None: no budget).
+QUERY_COUNT_HEADERS = os.environ.get('QUERY_COUNT_HEADERS', '1' if DEBUG else '0') == '1'
+DEFAULT_QUERY_BUDGET = None
+
+# Request profiling (see profiling/middleware.py): requests of staff users
+# sending the PROFILING_HEADER header, and a PROFILING_SAMPLE_RATE fraction
+# of all requests, run under cProfile. At most PROFILING_MAX_PROFILES are
+# kept in PROFILING_DIR; staff browse them at /admin/profiles/.
+PROFILING_HEADER = 'X-Profile'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', 200))
+
+# Per-view memory tracking (see profiling/memory.py), off by default:
+# MEMORY_TRACKING=rss records each request's growth of the process's resident
+# set, MEMORY_TRACKING=tracemalloc also its allocation peak and the call sites
+# holding the memory, keeping MEMORY_TRACKING_FRAMES frames per allocation.
+# Sites are only collected for requests peaking above
+# MEMORY_TRACKING_SNAPSHOT_BYTES, and requests above MEMORY_TRACKING_WARN_BYTES
+# are logged. Figures are served at /api/memory-stats/ (admin only).
+MEMORY_TRACKING = os.environ.get('MEMORY_TRACKING', '')
+MEMORY_TRACKING_FRAMES = int(os.environ.get('MEMORY_TRACKING_FRAMES', 25))
+MEMORY_TRACKING_SNAPSHOT_BYTES = int(os.environ.get('MEMORY_TRACKING_SNAPSHOT_BYTES', 1024 * 1024))
+MEMORY_TRACKING_WARN_BYTES = int(os.environ.get('MEMORY_TRACKING_WARN_BYTES', 100 * 1024 * 1024))
+
 ROOT_URLCONF = 'financetracker.urls'
 
 TEMPLATES = [
@@ -178,8 +225,59 @@ DATABASES = {
         'PASSWORD': os.environ.get('MYSQL_ROOT_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': '3306',
+        # Keep each worker thread's connection open between requests for up
+        # to CONN_MAX_AGE seconds instead of connecting on every request, and
+        # check it is still alive before reusing it.
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+
+# Caches
+# REPORT_CACHE_BACKEND selects where cached reports and per-user data versions
+# live: 'locmem' for a single process, 'file' or 'db' (run createcachetable
+# first) to share them between workers, or the dotted path of any other
+# Django cache backend. A write invalidates its user's reports by bumping the
+# version in this cache, which only the processes sharing it see: 'locmem' is
+# only correct while one process serves every request (runserver, tests), and
+# gunicorn.conf.py defaults to 'db'. WEB_CONCURRENCY is the number of server
+# processes; the report.E001 system check fails when it is above 1 and the
+# report cache is 'locmem', and gunicorn then refuses to start.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_CACHE_TIMEOUT = 24 * 60 * 60
+REPORT_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'reports'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.report-cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'report_cache'),
+}
+_report_cache_backend, _report_cache_location = REPORT_CACHE_BACKENDS.get(
+    os.environ.get('REPORT_CACHE_BACKEND', 'locmem'),
+    (os.environ.get('REPORT_CACHE_BACKEND'), ''),
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    REPORT_CACHE_ALIAS: {
+        'BACKEND': _report_cache_backend,
+        'LOCATION': os.environ.get('REPORT_CACHE_LOCATION', _report_cache_location),
+        'TIMEOUT': REPORT_CACHE_TIMEOUT,
+    },
+}
+
+# Token authentication cache (see user/authentication.py): up to
+# TOKEN_AUTH_CACHE_SIZE tokens are kept in each process for
+# TOKEN_AUTH_CACHE_TTL seconds. TOKEN_AUTH_CACHE_ALIAS names a cache from
+# CACHES shared by all workers, the report cache unless set ('' for none). A
+# revoked token is only dropped from the LRU of the process revoking it, so the
+# user.E001 system check fails when WEB_CONCURRENCY is above 1 and the LRU is
+# on; gunicorn.conf.py turns it off.
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_CACHE_ALIAS = os.environ.get('TOKEN_AUTH_CACHE_ALIAS', REPORT_CACHE_ALIAS) or None
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,171 @@
+"""
+Helpers for moving rows in and out of the API as CSV or JSON.
+"""
+import csv
+import io
+import math
+
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_header_parameters
+
+EXPORT_BATCH_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ROWS = 200000
+MAX_REPORTED_ERRORS = 1000
+
+
+class Echo:
+    """A file-like object whose write() hands the value back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iterate_in_batches(queryset, fields, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields values_list rows of fields from queryset, newest id first, fetching
+    batch_size rows per query.
+
+    Each batch continues after the last id seen rather than using an offset or
+    a server-side cursor, so memory stays flat on every database backend and
+    late batches are as cheap as early ones.
+    """
+    last_id = None
+    while True:
+        batch = queryset.order_by("-id")
+        if last_id is not None:
+            batch = batch.filter(id__lt=last_id)
+        rows = list(batch.values_list("id", *fields)[:batch_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+
+def stream_csv(filename, header, rows, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Returns a StreamingHttpResponse that writes header and rows as CSV while
+    rows is consumed, sending batch_size rows per chunk.
+    """
+    writer = csv.writer(Echo())
+
+    def generate():
+        yield writer.writerow(header)
+        chunk = []
+        for row in rows:
+            chunk.append(writer.writerow(row))
+            if len(chunk) >= batch_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    response = StreamingHttpResponse(generate(), content_type="text/csv")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+def read_rows(request):
+    """
+    Returns the rows sent with a request as a list of dicts. Rows can come as
+    a CSV file upload in the "file" field, a text/csv body or a JSON array of
+    objects.
+
+    Raises ValueError if the payload is none of these or has too many rows.
+    """
+    media_type, params = parse_header_parameters(request.content_type)
+    if media_type.lower() == "text/csv":
+        charset = params.get("charset", "utf-8").lower()
+        if charset in ("utf-8", "utf8"):
+            # Also drops the byte order mark spreadsheet tools often write.
+            charset = "utf-8-sig"
+        # Read the stream rather than request.body, which refuses bodies larger
+        # than DATA_UPLOAD_MAX_MEMORY_SIZE; the row limit below bounds imports.
+        try:
+            text = request.stream.read().decode(charset) if request.stream else ""
+        except LookupError:
+            raise ValueError(f"Unsupported charset {charset!r}")
+        rows = list(csv.DictReader(io.StringIO(text)))
+    elif "file" in request.FILES:
+        text = request.FILES["file"].read().decode("utf-8-sig")
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        rows = request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("Expected a CSV file or a JSON array of objects")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} rows can be imported at once")
+    return rows
+
+
+def text_column(max_length=None, required=False, default=None):
+    def clean(value):
+        if value is None or value == "":
+            if required:
+                raise ValueError("This field is required.")
+            return default
+        value = str(value)
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f"Ensure this field has no more than {max_length} characters.")
+        return value
+
+    return clean
+
+
+def reference_column():
+    """
+    A column naming a related row by name or by id. JSON integers are kept
+    as ints, so that they are only matched as ids; anything else is text.
+    """
+    text = text_column()
+
+    def clean(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return text(value)
+
+    return clean
+
+
+def number_column(required=True, default=0):
+    def clean(value):
+        if value is None or value == "":
+            if required:
+                raise ValueError("This field is required.")
+            return default
+        if isinstance(value, bool):
+            raise ValueError("A valid number is required.")
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("A valid number is required.")
+        if not math.isfinite(value):
+            raise ValueError("A valid number is required.")
+        return value
+
+    return clean
+
+
+def clean_rows(rows, columns):
+    """
+    Runs every row through the cleaner of each column in a single pass.
+
+    Returns the cleaned rows and a list of {"row", "errors"} entries, where row
+    is the 1-based position of the offending row and errors maps each invalid
+    column to its message.
+    """
+    cleaned = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        values = {}
+        row_errors = {}
+        for name, clean in columns.items():
+            try:
+                values[name] = clean(row.get(name))
+            except ValueError as e:
+                row_errors[name] = str(e)
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+        cleaned.append(values)
+    return cleaned, errors
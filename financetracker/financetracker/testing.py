@@ -0,0 +1,59 @@
+"""
+Test helpers.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from .middleware import get_query_budget
+
+
+class _AssertWithinBudgetContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection, label):
+        self.test_case = test_case
+        self.budget = budget
+        self.label = label
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        executed = len(self)
+        if executed > self.budget:
+            queries = "\n".join(
+                f"{i}. {query['sql']}" for i, query in enumerate(self.captured_queries, start=1)
+            )
+            self.test_case.fail(
+                f"{executed} queries executed by {self.label}, over its budget of {self.budget}:\n{queries}"
+            )
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin checking that code stays within a view's query budget
+    (see financetracker.middleware).
+
+        class CategoryTests(QueryBudgetMixin, TestCase):
+            def test_list(self):
+                with self.assertWithinQueryBudget("/api/category/"):
+                    self.client.get("/api/category/", HTTP_AUTHORIZATION=...)
+    """
+
+    def assertWithinQueryBudget(self, view, method="GET", budget=None, using=DEFAULT_DB_ALIAS):
+        """
+        Returns a context manager failing the test when the queries run
+        inside it exceed the budget of view for method. view is a URL path,
+        a view class or a view function; an explicit budget overrides the
+        view's.
+        """
+        if isinstance(view, str):
+            label = view
+            view = resolve(view).func
+        else:
+            label = getattr(view, "__name__", repr(view))
+        if budget is None:
+            budget = get_query_budget(view, method)
+        if budget is None:
+            raise ValueError(f"{label} declares no {method} query budget.")
+        return _AssertWithinBudgetContext(self, budget, connections[using], label)
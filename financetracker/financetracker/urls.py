@@ -14,13 +14,22 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path, include
 
 urlpatterns = [
+    path('admin/profiles/', include('profiling.urls')),
     path('admin/', admin.site.urls),
     path('api/', include('user.urls')),
     path('api/', include('income.urls')),
     path('api/', include('expense.urls')),
     path('api/', include('category.urls')),
+    path('api/', include('investment.urls')),
     path('api/', include('report.urls')),
+    path('api/', include('profiling.api_urls')),
+    path('api/async/', include('report.async_urls')),
 ]
+
+# Serves the admin's static files while DEBUG is on, as runserver does;
+# a no-op otherwise.
+urlpatterns += staticfiles_urlpatterns()
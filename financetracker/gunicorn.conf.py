@@ -0,0 +1,111 @@
+"""
+Gunicorn configuration for serving the API in production.
+
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment:
+
+- GUNICORN_BIND: Address to listen on (default: 0.0.0.0:8000).
+- GUNICORN_WORKER_CLASS: "gthread" (default) serves financetracker.wsgi with
+  threaded workers; "uvicorn" serves financetracker.asgi with uvicorn
+  workers, which the asynchronous report views under /api/async/ need.
+- WEB_CONCURRENCY: Number of worker processes (default: 2 x cores + 1).
+- REPORT_CACHE_BACKEND: Defaults to "db" rather than "locmem" here, as the
+  workers must share the report cache; run createcachetable beforehand.
+- TOKEN_AUTH_CACHE_SIZE: Defaults to 0 here, so that tokens are only cached
+  in the shared cache and every worker sees a revoked token at once.
+- GUNICORN_THREADS: Threads per gthread worker (default: 4).
+- GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE: Worker timeout and keep-alive
+  seconds (defaults: 30 and 5).
+- GUNICORN_MAX_REQUESTS: Restart a worker after this many requests, with
+  some jitter, to bound slow leaks (default: 10000, 0 disables).
+
+Management commands changing data, such as a shell revoking a token, must
+run with the same REPORT_CACHE_BACKEND to reach the workers' caches; the
+docker-compose.yml services set it for every process of their containers.
+
+Every gthread thread keeps its own database connection open for CONN_MAX_AGE
+seconds (60 by default), so a host holds up to WEB_CONCURRENCY x
+GUNICORN_THREADS connections: 8 x cores + 4 with the defaults, 36 on 4 cores
+and 132 on 16. MySQL accepts 151 connections unless its max_connections is
+raised, shared by every host and management command using the database.
+Lower WEB_CONCURRENCY or GUNICORN_THREADS, or raise max_connections, so that
+the sum over all hosts stays below it. With uvicorn workers connections are
+closed after each request (CONN_MAX_AGE defaults to 0 here), and a worker
+holds one for each request it is serving.
+
+The application is loaded once in the master before the workers are forked
+(preload_app), so they share its memory pages until they write to them. The
+master runs the system checks before starting any worker and refuses to
+start if they find an error, such as a per-process report cache (report.E001).
+"""
+import gc
+import os
+
+
+def cpu_count():
+    # The cores this process may run on, which a container limits.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+WORKER_CLASSES = {
+    "gthread": ("gthread", "financetracker.wsgi:application"),
+    "uvicorn": ("uvicorn.workers.UvicornWorker", "financetracker.asgi:application"),
+}
+
+worker_class, wsgi_app = WORKER_CLASSES[os.environ.get("GUNICORN_WORKER_CLASS", "gthread")]
+
+if worker_class != "gthread":
+    # Under ASGI every request runs its database code on a thread of its
+    # own, so a connection kept open after the request would never be
+    # reused: keep them per request unless told otherwise.
+    os.environ.setdefault("CONN_MAX_AGE", "0")
+
+# Read by the settings, which the preloaded application imports later.
+os.environ.setdefault("REPORT_CACHE_BACKEND", "db")
+os.environ.setdefault("TOKEN_AUTH_CACHE_SIZE", "0")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * cpu_count() + 1))
+# Lets the report.E001 check see how many processes share the caches.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+accesslog = "-"
+errorlog = "-"
+# Nginx in front of the workers sets X-Forwarded-For and X-Forwarded-Proto.
+forwarded_allow_ips = "*"
+
+
+def pre_fork(server, worker):
+    from django.db import connections
+
+    # A connection opened while loading the app must not be shared by the
+    # forked workers.
+    connections.close_all()
+    # Move everything allocated so far out of the garbage collector's
+    # reach: collections in the workers would otherwise touch every
+    # preloaded object and copy the pages they live on.
+    gc.freeze()
+
+
+def on_starting(server):
+    import django
+    from django.core.management import call_command
+    from django.core.management.base import SystemCheckError
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "financetracker.settings")
+    django.setup()
+    try:
+        call_command("check")
+    except SystemCheckError as exc:
+        server.log.error("%s", exc)
+        raise SystemExit(1)
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('income', '0002_alter_income_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date', 'id'], name='income_user_date_id_idx'),
+        ),
+    ]
@@ -1,24 +1,26 @@
 from django.db import models
 from django.db import models
 from django.contrib.auth.models import User
+from report.models import DailyRollup, RollupTrackedModel
 
-class Income(models.Model):
+class Income(RollupTrackedModel):
     user = models.ForeignKey(User, related_name="incomes", on_delete=models.SET_NULL, null=True)
     name = models.CharField(max_length=30, blank=True, null=True, default="Income")
     amount = models.FloatField(default=0, blank=True)
     description = models.TextField(null=True, blank=True)
     date = models.DateField(auto_now=True)
 
+    rollup_kind = DailyRollup.INCOME
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date", "id"], name="income_user_date_id_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
     @staticmethod
     def get_income_total(from_date, to_date, user):
-        if from_date == to_date:
-            filtered_income = Income.objects.filter(user=user, date=to_date)
-            income_sum = round(sum(income.amount for income in filtered_income), 2)
-            return income_sum
-        else:
-            filtered_income = Income.objects.filter(user=user, date__range=(from_date, to_date)).order_by("-id")
-            income_sum = round(sum(income.amount for income in filtered_income), 2)
-            return income_sum
+        total = DailyRollup.objects.total(user, DailyRollup.INCOME, from_date, to_date)
+        return round(total, 2)
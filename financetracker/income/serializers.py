@@ -1,9 +1,14 @@
 #serializer for income model
 from rest_framework import serializers
+from financetracker.serializers import ValuesSerializer
 from .models import Income
 
 class IncomeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Income
         fields = "__all__"
-        
\ No newline at end of file
+        
+
+
+class IncomeReadSerializer(ValuesSerializer):
+    serializer_class = IncomeSerializer
@@ -5,4 +5,7 @@ from . import views
 urlpatterns = [
     path("income/", views.IncomeListView.as_view(), name="income_list"),
     path("income/<int:pk>/", views.IncomeDetailView.as_view(), name="income_detail"),
+    path("income/export-csv/", views.ExportIncomeCsv.as_view(), name="export_income_csv"),
+    path("income/import/", views.ImportIncomeView.as_view(), name="import_income"),
+    path("income/batch/", views.IncomeBatchView.as_view(), name="income_batch"),
 ]
@@ -1,38 +1,50 @@
 from django.http import Http404
 from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from report.cache import conditional_on_data_version
+from financetracker.dates import month_range
+from financetracker.pagination import KeysetPagination
 
-from income.serializers import IncomeSerializer
-from datetime import datetime, time, timedelta
+from income.serializers import IncomeReadSerializer, IncomeSerializer
 
 from .models import Income
 
-current_month = datetime.now().date().month
-
 class IncomeListView(APIView):
     """
     API view for managing income records.
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
     def get(self, request, format=None):
         """
         Retrieve income records for the authenticated user.
 
         Returns:
-            A Response object containing the serialized income records.
+            A Response object containing the serialized income records, or one
+            page of {"next", "results"} when a cursor or page_size query
+            parameter is given (see KeysetPagination).
         """
         try:
             results = (
                 Income.objects.all()
                 .filter(user=request.user)
-                .filter(date__month=str(current_month))
+                .filter(date__range=month_range())
             )
-            serializer = IncomeSerializer(results, many=True)
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(IncomeReadSerializer.values(results), request, view=self)
+            if page is not None:
+                return paginator.get_paginated_response(IncomeReadSerializer(page).data)
+            serializer = IncomeReadSerializer(results)
             return Response(serializer.data, status=status.HTTP_200_OK)
+        except APIException:
+            # Such as the invalid cursor error of KeysetPagination.
+            raise
         except:
             return Response(
                 data={"message": "Unable to retrieve income"}, status=status.HTTP_401_UNAUTHORIZED
@@ -72,6 +84,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from income.models import Income
 from income.serializers import IncomeSerializer
+from financetracker.batch import BatchView
+from financetracker.dates import date_range_from_request
+from financetracker.tabular import (
+    IMPORT_BATCH_SIZE,
+    MAX_REPORTED_ERRORS,
+    clean_rows,
+    iterate_in_batches,
+    number_column,
+    read_rows,
+    stream_csv,
+    text_column,
+)
 
 class IncomeDetailView(APIView):
     """
@@ -86,6 +110,7 @@ class IncomeDetailView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 4}
 
     def get_object(self, pk):
         """
@@ -200,3 +225,77 @@ class IncomeDetailView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(data={"message": "Not permitted"}, status=status.HTTP_403_FORBIDDEN)
+
+
+class ExportIncomeCsv(APIView):
+    """
+    API view to export income records as a CSV file.
+
+    The CSV file will contain the following columns: name, amount, description, date.
+
+    Supported query parameters:
+    - from_date: The start date of the export (format: YYYY-MM-DD, default: start of the current month).
+    - to_date: The end date of the export (format: YYYY-MM-DD, default: end of the current month).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            from_date, to_date = date_range_from_request(request)
+        except ValueError:
+            return Response(
+                data={"message": "Invalid date range"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        incomes = Income.objects.filter(user=request.user, date__range=(from_date, to_date))
+        rows = iterate_in_batches(incomes, ["name", "amount", "description", "date"])
+        return stream_csv("income.csv", ["name", "amount", "description", "date"], rows)
+
+
+class ImportIncomeView(APIView):
+    """
+    API view for importing many income records at once.
+
+    Accepts a CSV file upload (field "file"), a text/csv body or a JSON array
+    whose rows have the columns name, amount and description. Rows are
+    validated in a single pass; if any row is invalid nothing is imported and
+    the errors are returned per row, otherwise every row is inserted with
+    batched bulk_create in a single transaction.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    columns = {
+        "name": text_column(max_length=30, default="Income"),
+        "amount": number_column(),
+        "description": text_column(),
+    }
+
+    def post(self, request):
+        try:
+            rows = read_rows(request)
+        except ValueError as e:
+            return Response(data={"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cleaned, errors = clean_rows(rows, self.columns)
+        if errors:
+            return Response(
+                data={
+                    "message": "Unable to import income",
+                    "errorCount": len(errors),
+                    "errors": errors[:MAX_REPORTED_ERRORS],
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        incomes = [Income(user=request.user, **row) for row in cleaned]
+        Income.bulk_create_tracked(incomes, batch_size=IMPORT_BATCH_SIZE)
+        return Response(data={"imported": len(incomes)}, status=status.HTTP_201_CREATED)
+
+
+class IncomeBatchView(BatchView):
+    """
+    API view for applying many income operations in one request, e.g. when
+    syncing offline edits. See BatchView for the request format.
+    """
+
+    model = Income
+    serializer_class = IncomeSerializer
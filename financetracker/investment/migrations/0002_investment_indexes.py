@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['portfolio', 'date_invested'], name='investment_portfolio_date_idx'),
+        ),
+    ]
@@ -1,7 +1,23 @@
 from django.db import models
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 import datetime
 
+
+class PortfolioQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotates each portfolio with value_total and invested_total,
+        computed with one grouped join on its investments instead of
+        iterating them per portfolio.
+        """
+        return self.annotate(
+            value_total=Coalesce(Sum("investments__value"), Value(0.0)),
+            invested_total=Coalesce(Sum("investments__amount"), Value(0.0)),
+        )
+
+
 class Portfolio(models.Model):
     user = models.ForeignKey(User, related_name="portfolios", on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -10,16 +26,23 @@ class Portfolio(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PortfolioQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    # Totals come from the with_totals() annotations when present.
     @property
     def total_value(self):
-        return sum(investment.value for investment in self.investments.all())
+        if hasattr(self, "value_total"):
+            return self.value_total
+        return self.investments.aggregate(total=Sum("value"))["total"] or 0
 
     @property
     def total_invested(self):
-        return sum(investment.amount for investment in self.investments.all())
+        if hasattr(self, "invested_total"):
+            return self.invested_total
+        return self.investments.aggregate(total=Sum("amount"))["total"] or 0
 
     @property
     def total_return(self):
@@ -40,6 +63,11 @@ class Investment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["portfolio", "date_invested"], name="investment_portfolio_date_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -1,7 +1,14 @@
+from django.db.models import F
 from rest_framework import serializers
+from financetracker.serializers import ValuesSerializer
 from .models import Investment, Portfolio
 
 class PortfolioSerializer(serializers.ModelSerializer):
+        total_value = serializers.FloatField(read_only=True)
+        total_invested = serializers.FloatField(read_only=True)
+        total_return = serializers.FloatField(read_only=True)
+        remaining_budget = serializers.FloatField(read_only=True)
+
         class Meta:
             model = Portfolio
             fields = '__all__'
@@ -9,4 +16,28 @@ class PortfolioSerializer(serializers.ModelSerializer):
 class InvestmentSerializer(serializers.ModelSerializer):
         class Meta:
             model = Investment
-            fields = '__all__'
\ No newline at end of file
+            fields = '__all__'
+
+
+class PortfolioReadSerializer(ValuesSerializer):
+        """Reads portfolios annotated by Portfolio.objects.with_totals()."""
+
+        serializer_class = PortfolioSerializer
+        sources = {
+            "total_value": "value_total",
+            "total_invested": "invested_total",
+            "total_return": "return_total",
+            "remaining_budget": "budget_remaining",
+        }
+
+        @classmethod
+        def values(cls, queryset):
+            return super().values(
+                queryset.annotate(
+                    return_total=F("value_total") - F("invested_total"),
+                    budget_remaining=F("budget") - F("invested_total"),
+                )
+            )
+
+class InvestmentReadSerializer(ValuesSerializer):
+        serializer_class = InvestmentSerializer
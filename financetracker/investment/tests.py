@@ -1,3 +1,41 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.authtoken.models import Token
 
-# Create your tests here.
+from .models import Investment, Portfolio
+
+
+class InvestmentBatchBudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="investor")
+        self.token = Token.objects.create(user=self.user)
+        self.portfolio = Portfolio.objects.create(user=self.user, name="Stocks", budget=100)
+        Investment.objects.create(portfolio=self.portfolio, name="Held", amount=40, value=40)
+
+    def post(self, path, data):
+        return self.client.post(
+            path, data, content_type="application/json", HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def create(self, amount):
+        return {"op": "create", "data": {"portfolio": self.portfolio.pk, "name": "New", "amount": amount, "value": amount}}
+
+    def test_single_create_over_budget_is_rejected(self):
+        response = self.post(f"/api/portfolios/{self.portfolio.pk}/investments/", {"name": "New", "amount": 500, "value": 500})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_create_over_budget_is_rejected(self):
+        response = self.post("/api/investments/batch/", [self.create(500)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["results"][0]["errors"], {"amount": "Insufficient budget."})
+        self.assertEqual(Investment.objects.count(), 1)
+
+    def test_batch_creates_count_against_the_budget_together(self):
+        response = self.post("/api/investments/batch/", [self.create(35), self.create(30)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result["status"] for result in response.data["results"]], [400, 400])
+        self.assertEqual(Investment.objects.count(), 1)
+
+        response = self.post("/api/investments/batch/", [self.create(30), self.create(30)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Portfolio.objects.get().remaining_budget, 0)
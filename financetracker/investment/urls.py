@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import PortfolioListView, PortfolioDetailView, InvestmentListView, InvestmentDetailView
+from .views import PortfolioListView, PortfolioDetailView, InvestmentListView, InvestmentDetailView, ExportInvestmentCsv, InvestmentBatchView
 
 urlpatterns = [
     path('portfolios/', PortfolioListView.as_view(), name='portfolio-list'),
     path('portfolios/<int:pk>/', PortfolioDetailView.as_view(), name='portfolio-detail'),
     path('portfolios/<int:portfolio_pk>/investments/', InvestmentListView.as_view(), name='investment-list'),
     path('investments/<int:pk>/', InvestmentDetailView.as_view(), name='investment-detail'),
+    path('investments/export-csv/', ExportInvestmentCsv.as_view(), name='investment-export-csv'),
+    path('investments/batch/', InvestmentBatchView.as_view(), name='investment-batch'),
 ]
@@ -1,18 +1,24 @@
+from collections import defaultdict
+
 from django.http import Http404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from financetracker.batch import BatchView
+from financetracker.dates import date_range_from_request
+from financetracker.tabular import iterate_in_batches, stream_csv
 from .models import Portfolio, Investment
-from .serializers import PortfolioSerializer, InvestmentSerializer
+from .serializers import InvestmentReadSerializer, InvestmentSerializer, PortfolioReadSerializer, PortfolioSerializer
 
 class PortfolioListView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3}
 
     def get(self, request):
         try:
-            portfolios = Portfolio.objects.filter(user=request.user)
-            serializer = PortfolioSerializer(portfolios, many=True)
+            portfolios = Portfolio.objects.filter(user=request.user).with_totals()
+            serializer = PortfolioReadSerializer(portfolios)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -31,10 +37,11 @@ class PortfolioListView(APIView):
 
 class PortfolioDetailView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3}
 
     def get_object(self, pk, user):
         try:
-            return Portfolio.objects.get(pk=pk, user=user)
+            return Portfolio.objects.with_totals().get(pk=pk, user=user)
         except Portfolio.DoesNotExist:
             raise Http404
 
@@ -64,18 +71,19 @@ class PortfolioDetailView(APIView):
 
 class InvestmentListView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3}
 
     def get(self, request, portfolio_pk):
         try:
             investments = Investment.objects.filter(portfolio__pk=portfolio_pk, portfolio__user=request.user)
-            serializer = InvestmentSerializer(investments, many=True)
+            serializer = InvestmentReadSerializer(investments)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request, portfolio_pk):
         try:
-            portfolio = Portfolio.objects.get(pk=portfolio_pk, user=request.user)
+            portfolio = Portfolio.objects.with_totals().get(pk=portfolio_pk, user=request.user)
             data = request.data
             data['portfolio'] = portfolio.id
             if portfolio.remaining_budget < float(data['amount']):
@@ -95,6 +103,7 @@ class InvestmentListView(APIView):
 
 class InvestmentDetailView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3}
 
     def get_object(self, pk, user):
         try:
@@ -125,3 +134,62 @@ class InvestmentDetailView(APIView):
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportInvestmentCsv(APIView):
+    """
+    API view to export investments as a CSV file.
+
+    The CSV file will contain the following columns: portfolio, name, amount, value, description, date_invested.
+
+    Supported query parameters:
+    - from_date: The start date of the export (format: YYYY-MM-DD, default: start of the current month).
+    - to_date: The end date of the export (format: YYYY-MM-DD, default: end of the current month).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            from_date, to_date = date_range_from_request(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        investments = Investment.objects.filter(
+            portfolio__user=request.user, date_invested__range=(from_date, to_date)
+        )
+        fields = ["portfolio__name", "name", "amount", "value", "description", "date_invested"]
+        header = ["portfolio", "name", "amount", "value", "description", "date_invested"]
+        return stream_csv("investments.csv", header, iterate_in_batches(investments, fields))
+
+
+class InvestmentBatchView(BatchView):
+    """
+    API view for applying many investment operations in one request. See
+    BatchView for the request format; portfolio must be one of the user's
+    portfolios.
+    """
+
+    model = Investment
+    serializer_class = InvestmentSerializer
+    owner_lookup = "portfolio__user"
+    owner_fields = ()
+    relations = {"portfolio": Portfolio}
+
+    def validate_changes(self, request, results, changes, fail):
+        # Creates must fit in the remaining budget of their portfolio, as in
+        # InvestmentListView.post, together with the other creates of the batch.
+        creates = {index: values for index, values in changes.items() if results[index]["op"] == "create"}
+        if not creates:
+            return
+        requested = defaultdict(float)
+        for values in creates.values():
+            requested[values["portfolio_id"]] += values["amount"]
+        portfolios = Portfolio.objects.filter(user=request.user).with_totals().in_bulk(list(requested))
+        for index, values in creates.items():
+            portfolio = portfolios[values["portfolio_id"]]
+            if portfolio.remaining_budget < requested[portfolio.pk]:
+                fail(index, status.HTTP_400_BAD_REQUEST, {"amount": "Insufficient budget."})
+
+    def delete_rows(self, pks):
+        # With the portfolios prefetched the post_delete receiver finds each
+        # owner without a query per investment.
+        Investment.objects.filter(pk__in=pks).prefetch_related("portfolio").delete()
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import MemoryStatsView
+
+urlpatterns = [
+    path("memory-stats/", MemoryStatsView.as_view(), name="memory_stats"),
+]
@@ -0,0 +1,308 @@
+"""
+Per-view memory high-water marks.
+
+MemoryTrackingMiddleware measures what every request costs in memory and
+adds it up per view name, for this process. MEMORY_TRACKING selects how:
+
+- "rss": the growth of the process's resident set size, and of its
+  high-water mark, over the request. Cheap enough to leave on.
+- "tracemalloc": also traces Python allocations (see the tracemalloc
+  module) to find the peak of memory allocated during a request, and the
+  call sites holding the most of it when the view returns. Tracing slows
+  allocations down, so this is meant for diagnosing a worker.
+
+Tracemalloc figures are process-wide: a request is traced only while no
+other one is, and allocations of requests running at the same time on
+other threads are included. Run a single thread per worker
+(GUNICORN_THREADS=1) for exact figures. Requests peaking above
+MEMORY_TRACKING_WARN_BYTES are logged to the financetracker.memory logger.
+The figures are served at /api/memory-stats/ (admin only).
+"""
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger("financetracker.memory")
+
+RSS = "rss"
+TRACEMALLOC = "tracemalloc"
+
+# Call sites kept per view; the least heavy are dropped beyond this.
+MAX_SITES = 100
+TOP_SITES = 10
+
+_views = {}
+_views_lock = threading.Lock()
+# Held by the one request being traced with tracemalloc.
+_tracing_lock = threading.Lock()
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    PAGE_SIZE = 4096
+
+
+def current_rss():
+    """The resident set size of this process in bytes, None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def max_rss():
+    """The high-water mark of the resident set size of this process in bytes."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class ViewMemory:
+    """What the requests of one view cost in memory."""
+
+    def __init__(self):
+        self.requests = 0
+        self.rss_growth_max = 0
+        self.max_rss_growth_total = 0
+        self.traced = 0
+        self.peak_max = 0
+        self.peak_total = 0
+        self.retained_max = 0
+        # site -> the most memory it held when one request's view returned.
+        self.sites = Counter()
+        self.site_requests = Counter()
+
+    def add(self, measurement):
+        self.requests += 1
+        self.rss_growth_max = max(self.rss_growth_max, measurement.rss_growth or 0)
+        self.max_rss_growth_total += measurement.max_rss_growth or 0
+        if measurement.peak is None:
+            return
+        self.traced += 1
+        self.peak_max = max(self.peak_max, measurement.peak)
+        self.peak_total += measurement.peak
+        self.retained_max = max(self.retained_max, measurement.retained)
+        for site, size in measurement.sites.items():
+            self.sites[site] = max(self.sites[site], size)
+            self.site_requests[site] += 1
+        if len(self.sites) > MAX_SITES:
+            kept = dict(self.sites.most_common(MAX_SITES // 2))
+            self.sites = Counter(kept)
+            self.site_requests = Counter({site: self.site_requests[site] for site in kept})
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "rss_growth_bytes_max": self.rss_growth_max,
+            "max_rss_growth_bytes_total": self.max_rss_growth_total,
+            "traced_requests": self.traced,
+            "peak_bytes_max": self.peak_max,
+            "peak_bytes_mean": round(self.peak_total / self.traced) if self.traced else 0,
+            "retained_bytes_max": self.retained_max,
+            "top_sites": [
+                {"site": site, "bytes_max": size, "requests": self.site_requests[site]}
+                for site, size in self.sites.most_common(TOP_SITES)
+            ],
+        }
+
+
+class Measurement:
+    """The memory figures of one request."""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.rss_before = current_rss()
+        self.max_rss_before = max_rss()
+        self.rss_growth = None
+        self.max_rss_growth = None
+        self.peak = None
+        self.retained = None
+        self.sites = {}
+        if trace:
+            # Forgets earlier allocations, so that the peak and the snapshot
+            # only cover what is allocated from now on.
+            tracemalloc.clear_traces()
+
+    def finish(self):
+        if self.trace:
+            self.retained, self.peak = tracemalloc.get_traced_memory()
+            if self.peak >= settings.MEMORY_TRACKING_SNAPSHOT_BYTES:
+                self.sites = allocation_sites(tracemalloc.take_snapshot())
+        rss_after, max_rss_after = current_rss(), max_rss()
+        if self.rss_before is not None and rss_after is not None:
+            self.rss_growth = rss_after - self.rss_before
+        if self.max_rss_before is not None and max_rss_after is not None:
+            self.max_rss_growth = max_rss_after - self.max_rss_before
+
+
+def allocation_sites(snapshot):
+    """
+    Returns {site: bytes} of the memory in snapshot by call site. A site is
+    the innermost frame of the project's own code that led to the
+    allocation, so that memory held by Django or DRF on behalf of a view is
+    attributed to the line of the view; allocations made outside the
+    project's code keep their innermost frame. Frames of the request
+    instrumentation itself are skipped.
+    """
+    root = str(settings.BASE_DIR) + os.sep
+    # The request instrumentation wraps every view: look past it.
+    instrumentation = (os.path.dirname(__file__) + os.sep, os.path.join(root, "financetracker", "middleware.py"))
+    sites = Counter()
+    for statistic in snapshot.statistics("traceback"):
+        frames = list(reversed(statistic.traceback))
+        site = next(
+            (
+                frame
+                for frame in frames
+                if frame.filename.startswith(root)
+                and not frame.filename.startswith(instrumentation)
+                and "-packages" + os.sep not in frame.filename
+            ),
+            frames[0],
+        )
+        filename = site.filename[len(root):] if site.filename.startswith(root) else site.filename
+        sites[f"{filename}:{site.lineno}"] += statistic.size
+    return dict(sites.most_common(TOP_SITES * 2))
+
+
+def record(view_name, measurement):
+    with _views_lock:
+        _views.setdefault(view_name, ViewMemory()).add(measurement)
+    if measurement.peak is not None and measurement.peak > settings.MEMORY_TRACKING_WARN_BYTES:
+        logger.warning(
+            "%s allocated up to %.1f MiB in a request, %.1f MiB of which was still held when it returned",
+            view_name,
+            measurement.peak / 2**20,
+            measurement.retained / 2**20,
+        )
+
+
+def memory_stats():
+    """Returns the memory figures of this process, per view from the heaviest peak down."""
+    with _views_lock:
+        views = {name: view.as_dict() for name, view in _views.items()}
+    return {
+        "mode": settings.MEMORY_TRACKING,
+        "pid": os.getpid(),
+        "rss_bytes": current_rss(),
+        "max_rss_bytes": max_rss(),
+        "views": dict(
+            sorted(
+                views.items(),
+                key=lambda item: (item[1]["peak_bytes_max"], item[1]["rss_growth_bytes_max"]),
+                reverse=True,
+            )
+        ),
+    }
+
+
+def reset_memory_stats():
+    with _views_lock:
+        _views.clear()
+
+
+class TrackedStream:
+    """
+    Streamed content that finishes a measurement when it is exhausted or
+    closed, which the response does even if it was never iterated.
+    """
+
+    def __init__(self, content, finish):
+        self.iterator = iter(content)
+        self.finish = finish
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.finish()
+
+
+class MemoryTrackingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = settings.MEMORY_TRACKING
+        if self.mode not in (RSS, TRACEMALLOC):
+            raise MiddlewareNotUsed
+        if self.mode == TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACKING_FRAMES)
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trace = self.acquire_tracing()
+        try:
+            measurement = Measurement(trace)
+            response = self.get_response(request)
+        except BaseException:
+            if trace:
+                _tracing_lock.release()
+            raise
+        return self.track(request, response, measurement)
+
+    async def __acall__(self, request):
+        trace = self.acquire_tracing()
+        try:
+            measurement = Measurement(trace)
+            response = await self.get_response(request)
+        except BaseException:
+            if trace:
+                _tracing_lock.release()
+            raise
+        return self.track(request, response, measurement)
+
+    def acquire_tracing(self):
+        return (
+            self.mode == TRACEMALLOC
+            and tracemalloc.is_tracing()
+            and _tracing_lock.acquire(blocking=False)
+        )
+
+    def track(self, request, response, measurement):
+        trace = measurement.trace
+
+        def finish():
+            try:
+                measurement.finish()
+            finally:
+                if trace:
+                    _tracing_lock.release()
+            if request.resolver_match is not None:
+                record(request.resolver_match.view_name, measurement)
+
+        if response.streaming and not response.is_async:
+            # Exports allocate while their rows are streamed.
+            response.streaming_content = TrackedStream(response.streaming_content, finish)
+        else:
+            finish()
+        return response
@@ -0,0 +1,282 @@
+"""
+Opt-in profiling of single requests.
+
+ProfilingMiddleware runs a request under cProfile when:
+
+- it carries the PROFILING_HEADER header (X-Profile by default) and its user
+  is staff, authenticated by session or by the API's authentication
+  classes; or
+- it is among the PROFILING_SAMPLE_RATE fraction of all requests picked at
+  random (default 0, none).
+
+Each profile is kept in the ProfileStore (see profiling/store.py). Its
+summary holds the call tree and the time spent in SQL, serialization and
+rendering. The id of the profile is returned in an X-Profile-Id header.
+Staff browse and download the profiles at /admin/profiles/.
+"""
+import cProfile
+import logging
+import pstats
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from financetracker.middleware import QueryCounter, QueryCountMiddleware
+
+from .store import ProfileStore
+
+logger = logging.getLogger(__name__)
+
+# Functions whose cumulative time makes up a phase of the request. Calls
+# nested in another function of the same phase are only counted once.
+# Serialization and rendering include the queries run while they iterate
+# lazy querysets.
+PHASES = {
+    "serialization": (
+        ("rest_framework/serializers.py", "data"),
+        ("financetracker/serializers.py", "data"),
+    ),
+    "rendering": (
+        ("rest_framework/response.py", "rendered_content"),
+        ("rest_framework/renderers.py", "render"),
+        ("financetracker/renderers.py", "render"),
+        ("financetracker/tabular.py", "generate"),
+    ),
+}
+
+# Call tree nodes taking less than this fraction of the request are left out.
+CALL_TREE_MIN_FRACTION = 0.005
+CALL_TREE_MAX_DEPTH = 40
+CALL_TREE_MAX_ROWS = 500
+
+
+class Capture:
+    """The profiler and query counter of one request, and how long it has been measured."""
+
+    def __init__(self, reason):
+        self.reason = reason
+        self.profiler = cProfile.Profile()
+        self.queries = QueryCounter()
+        self.duration = 0.0
+
+    def is_available(self):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler is already running on this thread.
+            return False
+        self.profiler.disable()
+        return True
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.counting = QueryCountMiddleware.counting(self.queries)
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.counting.close()
+        self.duration += time.perf_counter() - self.started
+
+    @contextmanager
+    def measuring(self):
+        self.start()
+        try:
+            yield
+        finally:
+            self.stop()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the thread a request's synchronous code runs on. Under ASGI
+    the coroutines of asynchronous views run on the event loop instead and
+    only show up through the synchronous calls they await.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = "HTTP_" + settings.PROFILING_HEADER.upper().replace("-", "_")
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self.get_reason(request)
+        if reason is None:
+            return self.get_response(request)
+        capture = Capture(reason)
+        if not capture.is_available():
+            return self.get_response(request)
+        with capture.measuring():
+            response = self.get_response(request)
+        return self.finish(request, capture, response)
+
+    async def __acall__(self, request):
+        reason = await sync_to_async(self.get_reason)(request)
+        if reason is None:
+            return await self.get_response(request)
+        capture = Capture(reason)
+        # Profile the thread the request's synchronous code runs on.
+        if not await sync_to_async(capture.is_available)():
+            return await self.get_response(request)
+        await sync_to_async(capture.start)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(capture.stop)()
+        return await sync_to_async(self.finish)(request, capture, response)
+
+    def finish(self, request, capture, response):
+        if response.streaming and not response.is_async:
+            # Streamed rows are read and rendered while the response is
+            # sent: keep profiling until it ends. The id is known upfront.
+            profile_id = ProfileStore.new_id()
+            response["X-Profile-Id"] = profile_id
+            response.streaming_content = self.stream(request, response, capture, profile_id, response.streaming_content)
+        else:
+            response["X-Profile-Id"] = self.save(request, response, capture)
+        return response
+
+    def get_reason(self, request):
+        if self.header in request.META and self.is_staff(request):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            # API clients authenticate in the view; do it now to know
+            # whether the request may be profiled.
+            try:
+                user = Request(
+                    request,
+                    authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+                ).user
+            except APIException:
+                return False
+        return user.is_active and user.is_staff
+
+    def stream(self, request, response, capture, profile_id, content):
+        iterator = iter(content)
+        while True:
+            with capture.measuring():
+                chunk = next(iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+        self.save(request, response, capture, profile_id)
+
+    def save(self, request, response, capture, profile_id=None):
+        stats = pstats.Stats(capture.profiler)
+        total_ms = capture.duration * 1000
+        user = getattr(request, "user", None)
+        summary = {
+            "created": timezone.now().isoformat(),
+            "reason": capture.reason,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": request.resolver_match.view_name if request.resolver_match else None,
+            "user": user.get_username() if user is not None and user.is_authenticated else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "sql_ms": round(capture.queries.duration_ms, 2),
+            "sql_queries": capture.queries.count,
+            **{f"{phase}_ms": round(phase_time(stats, functions) * 1000, 2) for phase, functions in PHASES.items()},
+            "call_tree": call_tree(stats, capture.duration),
+        }
+        try:
+            return ProfileStore().save(capture.profiler, summary, profile_id)
+        except OSError:
+            logger.exception("Unable to store the profile of %s %s", request.method, request.get_full_path())
+            return ""
+
+
+def matches(function, patterns):
+    filename, _, name = function
+    filename = filename.replace("\\", "/")
+    return any(name == function_name and filename.endswith(suffix) for suffix, function_name in patterns)
+
+
+def phase_time(stats, patterns):
+    """
+    Returns the seconds spent in the functions matching patterns, adding up
+    the cumulative time of the calls made to them from functions that do
+    not match, so that nested calls are not counted twice.
+    """
+    phase = {function for function in stats.stats if matches(function, patterns)}
+    seconds = 0.0
+    for function in phase:
+        callers = stats.stats[function][4]
+        seconds += sum(timing[3] for caller, timing in callers.items() if caller not in phase)
+    return seconds
+
+
+def describe(function):
+    filename, line, name = function
+    if filename == "~":
+        # Built-in functions, such as "<method 'execute' of ...>".
+        return name
+    return f"{name} ({shorten(filename)}:{line})"
+
+
+def shorten(filename):
+    filename = filename.replace("\\", "/")
+    for marker in ("/site-packages/", "/dist-packages/", str(settings.BASE_DIR).replace("\\", "/") + "/"):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+
+def call_tree(stats, total):
+    """
+    Flattens the profile into [depth, function, calls, own ms, cumulative ms]
+    rows, each followed by the functions it called, heaviest first, up to
+    CALL_TREE_MAX_ROWS rows. cProfile records timings per caller rather than
+    per call path, so a callee shows everything its caller spent in it, from
+    wherever that caller was called. Calls under CALL_TREE_MIN_FRACTION of
+    total seconds are left out, and recursion is cut where a function
+    reappears on its own path.
+    """
+    stats.calc_callees()
+    callees = stats.all_callees
+    threshold = total * CALL_TREE_MIN_FRACTION
+    # The profiled code was entered from the middleware: its roots are the
+    # functions no profiled function called.
+    roots = [
+        (function, stats.stats[function][1], stats.stats[function][2], stats.stats[function][3])
+        for function, (_, _, _, _, callers) in stats.stats.items()
+        if not callers
+    ]
+    rows = []
+
+    def visit(entries, depth, path):
+        for function, calls, own, cumulative in sorted(entries, key=lambda entry: -entry[3]):
+            if len(rows) >= CALL_TREE_MAX_ROWS:
+                return
+            if cumulative < threshold or function in path:
+                continue
+            rows.append([depth, describe(function), calls, round(own * 1000, 2), round(cumulative * 1000, 2)])
+            if depth < CALL_TREE_MAX_DEPTH:
+                children = [
+                    (callee, timing[1], timing[2], timing[3]) for callee, timing in callees.get(function, {}).items()
+                ]
+                visit(children, depth + 1, path | {function})
+
+    visit(roots, 0, frozenset())
+    return rows
@@ -0,0 +1,86 @@
+"""
+A bounded on-disk store of request profiles.
+
+Every profile is a pair of files in PROFILING_DIR: <id>.prof, the raw
+cProfile data that pstats, snakeviz and friends read, and <id>.json, its
+summary. Ids start with the UTC time of the request, so they sort
+chronologically. Once more than PROFILING_MAX_PROFILES are stored the
+oldest are deleted. Several processes may share the directory.
+"""
+import json
+import re
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+ID_PATTERN = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+
+
+class ProfileStore:
+    def __init__(self, directory=None, max_profiles=None):
+        self.directory = Path(directory or settings.PROFILING_DIR)
+        self.max_profiles = settings.PROFILING_MAX_PROFILES if max_profiles is None else max_profiles
+
+    @staticmethod
+    def new_id():
+        return f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profiler, summary, profile_id=None):
+        """
+        Stores a cProfile.Profile and its summary dict under profile_id, a
+        new id by default, and returns the id.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = profile_id or self.new_id()
+        profiler.dump_stats(self.directory / f"{profile_id}.prof")
+        # The summary is written last: profiles without one are not listed.
+        temporary = self.directory / f".{profile_id}.json"
+        temporary.write_text(json.dumps({"id": profile_id, **summary}))
+        temporary.replace(self.directory / f"{profile_id}.json")
+        self.prune()
+        return profile_id
+
+    def ids(self):
+        """Returns the ids of the stored profiles, newest first."""
+        if not self.directory.is_dir():
+            return []
+        ids = (path.stem for path in self.directory.glob("*.json"))
+        return sorted((profile_id for profile_id in ids if ID_PATTERN.match(profile_id)), reverse=True)
+
+    def list(self):
+        """Returns the summaries of the stored profiles, newest first."""
+        summaries = []
+        for profile_id in self.ids():
+            summary = self.get(profile_id)
+            if summary is not None:
+                summaries.append(summary)
+        return summaries
+
+    def get(self, profile_id):
+        """Returns the summary of a profile, None if there is no such profile."""
+        if not ID_PATTERN.match(profile_id):
+            return None
+        try:
+            return json.loads((self.directory / f"{profile_id}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id):
+        """Returns the path of the raw profile data, None if there is no such profile."""
+        if not ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.prof"
+        return path if path.is_file() else None
+
+    def delete(self, profile_id):
+        if not ID_PATTERN.match(profile_id):
+            return
+        for suffix in (".json", ".prof"):
+            # Another process may be deleting it as well.
+            (self.directory / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+    def prune(self):
+        for profile_id in self.ids()[self.max_profiles:]:
+            self.delete(profile_id)
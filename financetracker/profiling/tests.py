@@ -0,0 +1,202 @@
+import cProfile
+import tempfile
+import tracemalloc
+
+from asgiref.sync import SyncToAsync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from category.models import Category
+from expense.models import Expense
+
+from . import memory
+from .store import ProfileStore
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.member = User.objects.create(username="member")
+        cls.staff_token = Token.objects.create(user=cls.staff)
+        cls.member_token = Token.objects.create(user=cls.member)
+        category = Category.objects.filter(user=cls.staff).first()
+        Expense.bulk_create_tracked(
+            [Expense(user=cls.staff, category=category, name=f"Expense {i}", amount=i) for i in range(20)]
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILING_DIR=directory.name, PROFILING_SAMPLE_RATE=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = ProfileStore()
+
+    def get(self, path, token, **headers):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {token.key}", **headers)
+
+    def test_staff_request_with_header_is_profiled(self):
+        response = self.get("/api/expense/", self.staff_token, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        profile = self.store.get(response["X-Profile-Id"])
+        self.assertEqual(profile["view"], "expense_list")
+        self.assertEqual(profile["user"], "staff")
+        self.assertEqual(profile["reason"], "header")
+        self.assertGreaterEqual(profile["sql_queries"], 1)
+        self.assertGreater(profile["serialization_ms"], 0)
+        self.assertGreater(profile["rendering_ms"], 0)
+        self.assertLessEqual(profile["serialization_ms"], profile["total_ms"])
+        self.assertTrue(any("ExpenseListView" in row[1] or "get (expense/views.py" in row[1] for row in profile["call_tree"]))
+        self.assertIsNotNone(self.store.stats_path(profile["id"]))
+
+    def test_header_is_ignored_for_other_users(self):
+        response = self.get("/api/expense/", self.member_token, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(self.store.ids(), [])
+
+    def test_requests_without_header_are_not_profiled(self):
+        response = self.get("/api/expense/", self.staff_token)
+        self.assertNotIn("X-Profile-Id", response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_profiled(self):
+        response = self.client.get("/api/expense/")
+        self.assertEqual(response.status_code, 401)
+        profile = self.store.get(response["X-Profile-Id"])
+        self.assertEqual(profile["reason"], "sampled")
+        self.assertIsNone(profile["user"])
+
+    def test_streamed_response_is_profiled_until_it_ends(self):
+        response = self.get("/api/expense/export-csv/", self.staff_token, HTTP_X_PROFILE="1")
+        profile_id = response["X-Profile-Id"]
+        self.assertIsNone(self.store.get(profile_id))
+        b"".join(response.streaming_content)
+        profile = self.store.get(profile_id)
+        self.assertGreater(profile["rendering_ms"], 0)
+        self.assertGreaterEqual(profile["sql_queries"], 1)
+
+    def test_store_keeps_the_newest_profiles(self):
+        store = ProfileStore(max_profiles=2)
+        ids = [store.save(cProfile.Profile(), {"path": str(i)}, f"20260101T00000{i}-0000000{i}") for i in range(3)]
+        self.assertEqual(store.ids(), ids[:0:-1])
+        self.assertIsNone(store.stats_path(ids[0]))
+
+    def test_store_rejects_other_file_names(self):
+        self.assertIsNone(self.store.get("../settings"))
+        self.assertIsNone(self.store.stats_path("../settings"))
+
+    def test_admin_pages(self):
+        response = self.get("/api/expense/", self.staff_token, HTTP_X_PROFILE="1")
+        profile_id = response["X-Profile-Id"]
+
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get("/admin/profiles/").status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/admin/profiles/")
+        self.assertContains(response, "/api/expense/")
+        response = self.client.get(f"/admin/profiles/{profile_id}/")
+        self.assertContains(response, "Call tree")
+        response = self.client.get(f"/admin/profiles/{profile_id}/download/")
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="{profile_id}.prof"')
+        self.assertEqual(self.client.get("/admin/profiles/20260101T000000-00000000/").status_code, 404)
+
+
+class MemoryTrackingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.member = User.objects.create(username="member")
+        cls.staff_token = Token.objects.create(user=cls.staff)
+        cls.member_token = Token.objects.create(user=cls.member)
+        category = Category.objects.filter(user=cls.staff).first()
+        Expense.bulk_create_tracked(
+            [Expense(user=cls.staff, category=category, name=f"Expense {i}", amount=i) for i in range(500)]
+        )
+
+    def setUp(self):
+        memory.reset_memory_stats()
+        self.addCleanup(memory.reset_memory_stats)
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+
+    def get(self, path, token=None):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {(token or self.staff_token).key}")
+
+    def stats(self):
+        response = self.get("/api/memory-stats/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["views"]
+
+    @override_settings(MEMORY_TRACKING="tracemalloc", MEMORY_TRACKING_SNAPSHOT_BYTES=0)
+    def test_tracemalloc_records_peaks_and_sites_per_view(self):
+        self.assertEqual(self.get("/api/expense/").status_code, 200)
+        expenses = self.stats()["expense_list"]
+        self.assertEqual(expenses["requests"], 1)
+        self.assertEqual(expenses["traced_requests"], 1)
+        self.assertGreater(expenses["peak_bytes_max"], 0)
+        self.assertGreaterEqual(expenses["peak_bytes_max"], expenses["retained_bytes_max"])
+        sites = [site["site"] for site in expenses["top_sites"]]
+        self.assertTrue(any(site.startswith(("expense/", "financetracker/serializers.py")) for site in sites), sites)
+
+    @override_settings(MEMORY_TRACKING="tracemalloc")
+    def test_unread_stream_releases_the_tracing_lock(self):
+        response = self.get("/api/expense/export-csv/")
+        self.assertTrue(memory._tracing_lock.locked())
+        response.close()
+        self.assertFalse(memory._tracing_lock.locked())
+        self.assertEqual(self.stats()["export_csv"]["traced_requests"], 1)
+
+    @override_settings(MEMORY_TRACKING="rss")
+    def test_rss_mode_counts_requests_without_tracing(self):
+        self.get("/api/expense/")
+        expenses = self.stats()["expense_list"]
+        self.assertEqual(expenses["requests"], 1)
+        self.assertEqual(expenses["traced_requests"], 0)
+
+    @override_settings(MEMORY_TRACKING="")
+    def test_nothing_is_recorded_when_off(self):
+        self.get("/api/expense/")
+        self.assertEqual(self.stats(), {})
+
+    def test_stats_need_an_admin(self):
+        self.assertEqual(self.get("/api/memory-stats/", self.member_token).status_code, 403)
+
+
+@override_settings(MEMORY_TRACKING="rss", QUERY_COUNT_HEADERS=True)
+class AsyncMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.staff_token = Token.objects.create(user=cls.staff)
+        category = Category.objects.filter(user=cls.staff).first()
+        Expense.bulk_create_tracked([Expense(user=cls.staff, category=category, name="Lunch", amount=12)])
+
+    def setUp(self):
+        memory.reset_memory_stats()
+        self.addCleanup(memory.reset_memory_stats)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILING_DIR=directory.name, PROFILING_SAMPLE_RATE=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_asgi_middleware_chain_stays_asynchronous(self):
+        chain = ASGIHandler()._middleware_chain
+        self.assertNotIsInstance(chain, SyncToAsync)
+        self.assertTrue(iscoroutinefunction(chain))
+
+    async def test_asgi_requests_are_counted_profiled_and_measured(self):
+        response = await AsyncClient().get(
+            "/api/expense/", headers={"Authorization": f"Token {self.staff_token.key}", "X-Profile": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(int(response["X-DB-Queries"]), 1)
+        profile = ProfileStore().get(response["X-Profile-Id"])
+        self.assertEqual(profile["view"], "expense_list")
+        self.assertGreaterEqual(profile["sql_queries"], 1)
+        self.assertEqual(memory.memory_stats()["views"]["expense_list"]["requests"], 1)
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from django.urls import path
+
+from . import views
+
+app_name = "profiling"
+
+# Staff only, like the rest of the admin.
+urlpatterns = [
+    path("", admin.site.admin_view(views.profile_list), name="profile_list"),
+    path("<str:profile_id>/", admin.site.admin_view(views.profile_detail), name="profile_detail"),
+    path("<str:profile_id>/download/", admin.site.admin_view(views.profile_download), name="profile_download"),
+]
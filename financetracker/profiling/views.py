@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .memory import memory_stats, reset_memory_stats
+from .middleware import PHASES
+from .store import ProfileStore
+
+# Columns of the profile list after the request itself.
+TIMINGS = ["total_ms", "sql_ms", *(f"{phase}_ms" for phase in PHASES)]
+
+
+def profile_list(request):
+    """Lists the stored request profiles, newest first."""
+    profiles = ProfileStore().list()
+    for profile in profiles:
+        profile["timings"] = [profile.get(timing) for timing in TIMINGS]
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "profiles": profiles,
+        "header": settings.PROFILING_HEADER,
+        "timings": [timing.removesuffix("_ms").replace("_", " ") for timing in TIMINGS],
+    }
+    return render(request, "profiling/profile_list.html", context)
+
+
+def profile_detail(request, profile_id):
+    """Shows the summary and call tree of a profile."""
+    profile = ProfileStore().get(profile_id)
+    if profile is None:
+        raise Http404("No such profile.")
+    context = {
+        **admin.site.each_context(request),
+        "title": f"{profile['method']} {profile['path']}",
+        "profile": profile,
+        "timings": [(timing.removesuffix("_ms").replace("_", " "), profile.get(timing)) for timing in TIMINGS],
+    }
+    return render(request, "profiling/profile_detail.html", context)
+
+
+def profile_download(request, profile_id):
+    """Returns the raw cProfile data of a profile, for pstats or snakeviz."""
+    path = ProfileStore().stats_path(profile_id)
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name, content_type="application/octet-stream")
+
+
+class MemoryStatsView(APIView):
+    """
+    API view exposing the per-view memory figures of the serving process
+    (see profiling/memory.py). DELETE resets them.
+
+    Requires an admin user.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(memory_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        reset_memory_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
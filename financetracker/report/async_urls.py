@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path("report-date-range/", async_views.AsyncReportDateRangeView.as_view(), name="async_report_date_range"),
+    path("report-category/", async_views.AsyncReportCategoryView.as_view(), name="async_report_category"),
+    path("report-day-graph/", async_views.AsyncReportDayGraph.as_view(), name="async_report_day_graph"),
+    path("report-week-graph/", async_views.AsyncReportWeekGraph.as_view(), name="async_report_week_graph"),
+    path("report-month-graph/", async_views.AsyncReportMonthGraph.as_view(), name="async_report_month_graph"),
+    path("report-most-recent-expenses/", async_views.AsyncReportMostRecentView.as_view(), name="async_report_most_recent_expenses"),
+    path("report-net/", async_views.AsyncReportNetView.as_view(), name="async_report_net"),
+    path("report-portfolios/", async_views.AsyncReportPortfolioPerformanceSummaryView.as_view(), name="async_report_portfolios"),
+    path("report-weekly-investments/", async_views.AsyncReportInvestmentsWeekGraphView.as_view(), name="async_report_weekly_investments"),
+    path("report-total-investments/", async_views.AsyncReportInvestmentsTotalView.as_view(), name="async_report_total_investments"),
+]
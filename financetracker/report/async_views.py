@@ -0,0 +1,280 @@
+"""
+Asynchronous versions of the report endpoints, for deployments served over
+ASGI (see financetracker/asgi.py).
+
+Each view authenticates the request like the REST framework views do, then
+awaits its queries instead of running them on the request thread. Queries
+that do not depend on each other, such as the expense, income and category
+figures of the net report, are issued at the same time, each on a thread of
+its own with its own database connection, so a report takes as long as its
+slowest query rather than the sum of all of them, and the event loop keeps
+serving other requests while it waits.
+
+Responses carry the same data as the views in report/views.py and are
+cached per user and data version the same way, but are not conditional:
+they carry no ETag or Last-Modified header.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from expense.models import Expense
+from expense.serializers import ExpenseReadSerializer
+from income.models import Income
+from income.serializers import IncomeReadSerializer
+from category.models import Category
+from financetracker.dates import month_range
+from financetracker.pagination import KeysetPagination
+from financetracker.renderers import ORJSONRenderer
+from .cache import HIT, MISS, get_cache, record_cache_outcome, response_cache_key
+from .models import DailyRollup
+from .views import (
+    EXPENSE,
+    INCOME,
+    get_category_spending,
+    get_expenses_by_month,
+    get_expenses_daily_for_the_week,
+    get_most_recent_expenses,
+    get_portfolio_summary,
+    get_total_investments,
+    get_weekly_investments,
+    parse_days,
+)
+
+
+def _run_isolated(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # The query ran on a worker thread with a connection of its own,
+        # which request_finished never sees: release it here, or keep it
+        # for reuse within CONN_MAX_AGE.
+        close_old_connections()
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    Runs the synchronous func in the default thread pool and awaits its
+    result. Unlike a plain sync_to_async call, queries awaited together with
+    asyncio.gather really run at the same time.
+    """
+    return await sync_to_async(_run_isolated, thread_sensitive=False)(func, *args, **kwargs)
+
+
+class AsyncReportView(View):
+    """
+    Base class for asynchronous report views.
+
+    Subclasses implement the coroutine get_data(request), which returns the
+    response data; any other exception than an APIException it raises
+    turns into an error response with error_message and error_status, like
+    the bare except clauses of the synchronous views.
+    """
+
+    http_method_names = ["get", "options"]
+    error_message = "Unable to get the report"
+    error_status = status.HTTP_400_BAD_REQUEST
+    cached = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            request = await sync_to_async(self.authenticate)(request)
+        except exceptions.AuthenticationFailed as exc:
+            return self.render_unauthenticated(request, exc)
+        if not request.user.is_authenticated:
+            return self.render_unauthenticated(request, exceptions.NotAuthenticated())
+
+        if not self.cached:
+            return await self.respond(request)
+
+        cache = get_cache()
+        key = await sync_to_async(response_cache_key)(request)
+        view_name = type(self).__name__
+        data = await cache.aget(key)
+        if data is not None:
+            record_cache_outcome(view_name, HIT)
+            response = self.render(data)
+            response["X-Report-Cache"] = HIT
+            return response
+
+        record_cache_outcome(view_name, MISS)
+        response = await self.respond(request)
+        if response.status_code == status.HTTP_200_OK:
+            await cache.aset(key, response.data, timeout=settings.REPORT_CACHE_TIMEOUT)
+        response["X-Report-Cache"] = MISS
+        return response
+
+    def authenticate(self, request):
+        """
+        Wraps the request in a REST framework Request and authenticates it
+        with the configured authentication classes.
+        """
+        request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        # Authentication queries the database, so it happens here rather
+        # than on first access from the event loop.
+        request.user
+        return request
+
+    async def respond(self, request):
+        try:
+            data = await self.get_data(request)
+        except exceptions.APIException as exc:
+            # Such as the invalid cursor error of KeysetPagination, answered
+            # as the REST framework's exception handler would.
+            return self.render({"detail": str(exc.detail)}, exc.status_code)
+        except Exception:
+            return self.render({"message": self.error_message}, self.error_status)
+        return self.render(data)
+
+    async def get_data(self, request):
+        raise NotImplementedError
+
+    def render_unauthenticated(self, request, exc):
+        response = self.render({"detail": str(exc.detail)}, status.HTTP_401_UNAUTHORIZED)
+        authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        if authenticators:
+            response["WWW-Authenticate"] = authenticators[0]().authenticate_header(request)
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        response = HttpResponse(
+            ORJSONRenderer().render(data),
+            content_type="application/json",
+            status=status_code,
+        )
+        response.data = data
+        return response
+
+
+class AsyncReportDateRangeView(AsyncReportView):
+    """
+    Asynchronous ReportDateRangeView: the page of rows and the total over
+    the date range are fetched concurrently.
+    """
+
+    error_message = "Results not found, Invalid parameters"
+    error_status = status.HTTP_404_NOT_FOUND
+    sources = {
+        EXPENSE: (Expense, ExpenseReadSerializer, Expense.get_expense_total),
+        INCOME: (Income, IncomeReadSerializer, Income.get_income_total),
+    }
+
+    async def get_data(self, request):
+        from_date = request.GET.get("from_date")
+        to_date = request.GET.get("to_date")
+        model, serializer_class, get_total = self.sources[request.GET.get("select")]
+        rows = serializer_class.values(
+            model.objects.filter(user=request.user)
+            .filter(date__range=(from_date, to_date))
+            .order_by("-id")
+        )
+        paginator = KeysetPagination()
+        page, total = await asyncio.gather(
+            run_query(self.get_page, paginator, rows, request),
+            run_query(get_total, from_date, to_date, request.user),
+        )
+        data = {"filtered": serializer_class(page).data, "total": total}
+        if paginator.is_requested(request):
+            data["next"] = paginator.get_next_link()
+        return data
+
+    def get_page(self, paginator, rows, request):
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return list(rows) if page is None else page
+
+
+class AsyncReportDayGraph(AsyncReportView):
+    error_message = "Unable to get daily expenses for the last week"
+
+    async def get_data(self, request):
+        days = parse_days(request.GET.get("days", 7))
+        return {"filtered": await run_query(Expense.get_expenses_daily_for_the_week, request.user, days)}
+
+
+class AsyncReportWeekGraph(AsyncReportView):
+    error_message = "Unable to get expenses for each week of the month"
+
+    async def get_data(self, request):
+        return {"filtered": await run_query(get_expenses_daily_for_the_week, request.user)}
+
+
+class AsyncReportMonthGraph(AsyncReportView):
+    error_message = "Unable to get monthly expenses for the year"
+
+    async def get_data(self, request):
+        data = await run_query(
+            get_expenses_by_month,
+            request.user,
+            request.GET.get("year"),
+            request.GET.get("from_year"),
+            request.GET.get("to_year"),
+        )
+        return {"filtered": data}
+
+
+class AsyncReportMostRecentView(AsyncReportView):
+    error_message = "Unable to get most recent expenses"
+
+    async def get_data(self, request):
+        return {"filtered": await run_query(get_most_recent_expenses, request.user)}
+
+
+class AsyncReportNetView(AsyncReportView):
+    """
+    Asynchronous ReportNetView: the expense and income sums and counts and
+    the category count are three queries issued concurrently, where the
+    synchronous view folds them into one statement of correlated subqueries.
+    """
+
+    error_message = "Unable to get net expenses"
+
+    async def get_data(self, request):
+        from_date, to_date = month_range(request.GET.get("year"), request.GET.get("month"))
+        user = request.user
+        (expense_sum, expense_count), (income_sum, income_count), category_count = await asyncio.gather(
+            run_query(DailyRollup.objects.summary, user, DailyRollup.EXPENSE, from_date, to_date),
+            run_query(DailyRollup.objects.summary, user, DailyRollup.INCOME, from_date, to_date),
+            run_query(Category.objects.filter(user=user, date__range=(from_date, to_date)).count),
+        )
+        summary = Expense.build_net_summary(
+            expense_sum, expense_count, income_sum, income_count, category_count
+        )
+        return {"filtered": [summary]}
+
+
+class AsyncReportCategoryView(AsyncReportView):
+    error_message = "Unable to group by categories"
+
+    async def get_data(self, request):
+        return {"filtered": await run_query(get_category_spending, request.user)}
+
+
+class AsyncReportPortfolioPerformanceSummaryView(AsyncReportView):
+    error_message = "Unable to get portfolio performance summary"
+
+    async def get_data(self, request):
+        return await run_query(get_portfolio_summary, request.user)
+
+
+class AsyncReportInvestmentsWeekGraphView(AsyncReportView):
+    error_message = "Unable to get weekly investments for the month"
+
+    async def get_data(self, request):
+        return {"filtered": await run_query(get_weekly_investments, request.user)}
+
+
+class AsyncReportInvestmentsTotalView(AsyncReportView):
+    error_message = "Unable to get total investments for the month"
+
+    async def get_data(self, request):
+        return {"filtered": await run_query(get_total_investments, request.user)}
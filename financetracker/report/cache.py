@@ -0,0 +1,185 @@
+"""
+Per-user versioned cache and conditional GET support for report responses.
+
+Cached report data is keyed by the user and the user's data version. The
+version is bumped after every committed write to one of the user's expenses,
+incomes, categories, portfolios or investments (see report/signals.py), so an
+entry is never read again once the data behind it changed and no TTL has to be
+guessed. The backend is the Django cache named by settings.REPORT_CACHE_ALIAS.
+Only processes sharing that cache see a bump, so it must be shared by every
+worker serving the API (see the report.E001 check in report/checks.py).
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.response import Response
+
+HIT = "hit"
+MISS = "miss"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f"report:version:{user_id}"
+
+
+def _modified_key(user_id):
+    return f"report:modified:{user_id}"
+
+
+def get_data_version(user_id):
+    """Returns the current data version of a user."""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Starting from the clock rather than from 1 means a version that was
+        # evicted from the cache can never be handed out again, so entries
+        # cached under it stay unreachable.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidates every cached report of a user once the current transaction commits."""
+    if user_id is None:
+        return
+
+    def bump():
+        cache = get_cache()
+        # A new clock reading rather than incr(): the database and file
+        # backends increment with a read and a write, so two workers bumping
+        # at once could both write the same version.
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+        cache.set(_modified_key(user_id), time.time(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def get_data_last_modified(user_id):
+    """Returns when the data of a user last changed, None if unknown."""
+    modified = get_cache().get(_modified_key(user_id))
+    if modified is None:
+        return None
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def _request_fingerprint(request, *parts):
+    # Reports default to windows relative to today ("the current month", "the
+    # last 7 days"), so the date is part of every key as well.
+    today = datetime.now().date().isoformat()
+    source = ":".join([today, request.get_full_path(), *parts])
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def response_cache_key(request):
+    """Returns the cache key of the report data answering request."""
+    version = get_data_version(request.user.pk)
+    digest = _request_fingerprint(request)
+    return f"report:response:{request.user.pk}:{version}:{digest}"
+
+
+def record_cache_outcome(view_name, outcome):
+    """Counts a cache HIT or MISS of a report view in cache_stats()."""
+    with _stats_lock:
+        _stats[outcome] += 1
+        _stats[(view_name, outcome)] += 1
+
+
+def cache_stats():
+    """Returns the hit and miss counters of this process, in total and per view."""
+    with _stats_lock:
+        stats = dict(_stats)
+    views = {}
+    for key, value in stats.items():
+        if isinstance(key, tuple):
+            view_name, outcome = key
+            views.setdefault(view_name, {HIT: 0, MISS: 0})[outcome] = value
+    return {"hits": stats.get(HIT, 0), "misses": stats.get(MISS, 0), "views": views}
+
+
+def cached_report(view_method):
+    """
+    Caches the data of successful responses of an APIView get method per user
+    and data version. Responses carry an X-Report-Cache header saying whether
+    they were served from the cache.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_cache_key(request)
+        view_name = type(self).__name__
+        data = cache.get(key)
+        if data is not None:
+            record_cache_outcome(view_name, HIT)
+            response = Response(data, status=status.HTTP_200_OK)
+            response["X-Report-Cache"] = HIT
+            return response
+
+        record_cache_outcome(view_name, MISS)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=settings.REPORT_CACHE_TIMEOUT)
+        response["X-Report-Cache"] = MISS
+        return response
+
+    return wrapper
+
+
+def _etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    version = get_data_version(request.user.pk)
+    accept = request.META.get("HTTP_ACCEPT", "")
+    return _request_fingerprint(request, str(request.user.pk), str(version), accept)
+
+
+def _last_modified(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    modified = get_data_last_modified(request.user.pk)
+    if modified is None:
+        return None
+    start_of_today = datetime.combine(datetime.now().date(), datetime.min.time())
+    return max(modified, start_of_today.astimezone(timezone.utc))
+
+
+def conditional_on_data_version(view_method):
+    """
+    Adds a strong ETag and a Last-Modified header, both derived from the
+    user's data version, to an APIView get method, and answers 304 Not
+    Modified without calling it when the client's copy is still current.
+
+    HTTP dates only have a one second resolution, so clients should send
+    If-None-Match rather than If-Modified-Since.
+    """
+    conditional = method_decorator(
+        condition(etag_func=_etag, last_modified_func=_last_modified)
+    )(view_method)
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        response = conditional(self, request, *args, **kwargs)
+        patch_vary_headers(response, ("Accept", "Authorization", "Cookie"))
+        return response
+
+    return wrapper
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_report_cache_is_shared(app_configs, **kwargs):
+    """
+    Cached reports are invalidated by bumping the user's data version in the
+    report cache. A per-process cache only sees the writes its own process
+    handled, so every other worker would keep serving outdated reports.
+    """
+    if settings.WEB_CONCURRENCY > 1 and isinstance(caches[settings.REPORT_CACHE_ALIAS], LocMemCache):
+        return [
+            Error(
+                f"The report cache is local to each process, but WEB_CONCURRENCY is "
+                f"{settings.WEB_CONCURRENCY}: reports invalidated by a write on one worker "
+                f"would still be served by the others.",
+                hint="Set REPORT_CACHE_BACKEND to 'db' (after running createcachetable) or 'file'.",
+                id="report.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,301 @@
+"""
+The report dashboard: any subset of the report widgets computed in one request.
+
+Widgets that read the same rows share one scan of them instead of each
+querying on its own: the expense graphs and the net summary read one scan of
+the daily rollup, made of the grouped sums of their endpoints joined with
+UNION ALL, the category report and the category count of the net summary one
+list of the month's categories. Totals are summed by the database as they
+are for the endpoints, never in Python, so every widget holds the same data
+as the response body of its report endpoint.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.db.models import F, Sum, Value
+from django.db.models.functions import TruncMonth, TruncWeek
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from category.models import Category
+from expense.models import Expense
+from financetracker.dates import month_range
+from .cache import cached_report, conditional_on_data_version
+from .models import DailyRollup
+from .views import (
+    get_most_recent_expenses,
+    get_portfolio_summary,
+    get_total_investments,
+    get_weekly_investments,
+    parse_days,
+    parse_year_range,
+)
+
+NET = "net"
+CATEGORY = "category"
+DAY_GRAPH = "day-graph"
+WEEK_GRAPH = "week-graph"
+MONTH_GRAPH = "month-graph"
+MOST_RECENT_EXPENSES = "most-recent-expenses"
+PORTFOLIOS = "portfolios"
+WEEKLY_INVESTMENTS = "weekly-investments"
+TOTAL_INVESTMENTS = "total-investments"
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+class Dashboard:
+    """
+    Computes report widgets for a user.
+
+    params are the request's query parameters; widgets read the same ones as
+    their endpoints (days, year, month, from_year and to_year). Shared scans
+    run the first time a widget needs them and their durations are kept in
+    shared_timings, apart from the widget timings.
+    """
+
+    # Widget name -> (method name, error message of its endpoint).
+    widgets = {
+        NET: ("net", "Unable to get net expenses"),
+        CATEGORY: ("category", "Unable to group by categories"),
+        DAY_GRAPH: ("day_graph", "Unable to get daily expenses for the last week"),
+        WEEK_GRAPH: ("week_graph", "Unable to get expenses for each week of the month"),
+        MONTH_GRAPH: ("month_graph", "Unable to get monthly expenses for the year"),
+        MOST_RECENT_EXPENSES: ("most_recent_expenses", "Unable to get most recent expenses"),
+        PORTFOLIOS: ("portfolios", "Unable to get portfolio performance summary"),
+        WEEKLY_INVESTMENTS: ("weekly_investments", "Unable to get weekly investments for the month"),
+        TOTAL_INVESTMENTS: ("total_investments", "Unable to get total investments for the month"),
+    }
+
+    def __init__(self, user, params, names):
+        self.user = user
+        self.params = params
+        self.names = names
+        self.scans = {}
+        self.shared_timings = {}
+
+    def render(self):
+        """Returns {name: {"data" or "error", "ms"}} for the requested widgets."""
+        result = {}
+        for name in self.names:
+            method_name, error_message = self.widgets[name]
+            started = time.perf_counter()
+            shared_before = sum(self.shared_timings.values())
+            try:
+                entry = {"data": getattr(self, method_name)()}
+            except:
+                entry = {"error": error_message}
+            shared_ms = sum(self.shared_timings.values()) - shared_before
+            entry["ms"] = round(max(elapsed_ms(started) - shared_ms, 0), 3)
+            result[name] = entry
+        return result
+
+    def shared(self, name, compute):
+        if name not in self.scans:
+            started = time.perf_counter()
+            self.scans[name] = compute()
+            self.shared_timings[name] = elapsed_ms(started)
+        return self.scans[name]
+
+    # Shared scans
+
+    def net_month(self):
+        return month_range(self.params.get("year"), self.params.get("month"))
+
+    def day_graph_range(self):
+        to_date = datetime.now().date()
+        return to_date - timedelta(days=parse_days(self.params.get("days", 7))), to_date
+
+    def month_graph_by_year(self):
+        return bool(self.params.get("from_year") or self.params.get("to_year"))
+
+    def month_graph_years(self):
+        if self.month_graph_by_year():
+            return parse_year_range(self.params.get("from_year"), self.params.get("to_year"))
+        year = self.params.get("year")
+        year = int(year) if year else datetime.now().year
+        return year, year
+
+    def month_graph_span(self):
+        from_year, to_year = self.month_graph_years()
+        return month_range(from_year, 1)[0], month_range(to_year, 12)[1]
+
+    def rollup_groups(self):
+        """
+        Returns {name: (kinds, (from_date, to_date) or None, bucket)} for the
+        requested widgets reading the daily rollup, grouped by bucket like
+        their endpoints group it.
+        """
+        groups = {}
+        for name, kinds, get_range, bucket in (
+            (NET, [DailyRollup.EXPENSE, DailyRollup.INCOME], self.net_month, TruncMonth("day")),
+            (DAY_GRAPH, [DailyRollup.EXPENSE], self.day_graph_range, F("day")),
+            (WEEK_GRAPH, [DailyRollup.EXPENSE], None, TruncWeek("day")),
+            (MONTH_GRAPH, [DailyRollup.EXPENSE], self.month_graph_span, TruncMonth("day")),
+        ):
+            if name not in self.names:
+                continue
+            try:
+                date_range = get_range() if get_range else None
+            except ValueError:
+                # The widget reports the error itself.
+                continue
+            groups[name] = (kinds, date_range, bucket)
+        return groups
+
+    def rollup_totals(self):
+        """Returns {(widget, kind, bucket): (total, count)} for the rollup widgets."""
+
+        def scan():
+            queries = []
+            for name, (kinds, date_range, bucket) in self.rollup_groups().items():
+                queryset = DailyRollup.objects.filter(user=self.user, kind__in=kinds)
+                if date_range is not None:
+                    queryset = queryset.filter(day__range=date_range)
+                queries.append(
+                    queryset.annotate(widget=Value(name), bucket=bucket)
+                    .values("widget", "kind", "bucket")
+                    .annotate(total=Sum("total"), count=Sum("count"))
+                    .order_by()
+                    .values_list("widget", "kind", "bucket", "total", "count")
+                )
+            if not queries:
+                return {}
+            rows = queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0]
+            return {(name, kind, bucket): (total, count) for name, kind, bucket, total, count in rows}
+
+        return self.shared("rollup", scan)
+
+    def widget_totals(self, name, kind=DailyRollup.EXPENSE):
+        """Returns {bucket: total} of a rollup widget."""
+        return {
+            bucket: total
+            for (row_name, row_kind, bucket), (total, _) in self.rollup_totals().items()
+            if (row_name, row_kind) == (name, kind)
+        }
+
+    def month_categories(self):
+        def scan():
+            return list(
+                Category.objects.filter(user=self.user)
+                .filter(date__range=month_range())
+                .with_spending()
+            )
+
+        return self.shared("categories", scan)
+
+    # Widgets
+
+    def net(self):
+        from_date, to_date = self.net_month()
+        totals = self.rollup_totals()
+        sums = {
+            kind: totals.get((NET, kind, from_date), (0.0, 0))
+            for kind in (DailyRollup.EXPENSE, DailyRollup.INCOME)
+        }
+        if (from_date, to_date) == month_range():
+            category_count = len(self.month_categories())
+        else:
+            category_count = Category.objects.filter(
+                user=self.user, date__range=(from_date, to_date)
+            ).count()
+        summary = Expense.build_net_summary(
+            *sums[DailyRollup.EXPENSE], *sums[DailyRollup.INCOME], category_count
+        )
+        return {"filtered": [summary]}
+
+    def category(self):
+        return {
+            "filtered": [
+                {"category": i.name, "amount": i.total_expense_cost}
+                for i in self.month_categories()
+            ]
+        }
+
+    def day_graph(self):
+        from_date, to_date = self.day_graph_range()
+        totals = self.widget_totals(DAY_GRAPH)
+        data = []
+        for i in range((to_date - from_date).days + 1):
+            day = from_date + timedelta(days=i)
+            data.append({"day": day, "amount": totals.get(day, 0)})
+        return {"filtered": data}
+
+    def week_graph(self):
+        totals = self.widget_totals(WEEK_GRAPH)
+        return {
+            "filtered": [{"week": week, "total": totals[week]} for week in sorted(totals)]
+        }
+
+    def month_graph(self):
+        from_year, to_year = self.month_graph_years()
+        totals = self.widget_totals(MONTH_GRAPH)
+        data = Expense.fill_monthly(totals, from_year, to_year)
+        if not self.month_graph_by_year():
+            data = [{"month": entry["month"], "amount": entry["amount"]} for entry in data]
+        return {"filtered": data}
+
+    def most_recent_expenses(self):
+        return {"filtered": get_most_recent_expenses(self.user)}
+
+    def portfolios(self):
+        return get_portfolio_summary(self.user)
+
+    def weekly_investments(self):
+        return {"filtered": get_weekly_investments(self.user)}
+
+    def total_investments(self):
+        return {"filtered": get_total_investments(self.user)}
+
+
+class ReportDashboardView(APIView):
+    """
+    API view returning several report widgets in one response.
+
+    Requires authentication.
+
+    Supported query parameters:
+    - widgets: Comma separated widget names (default: all of them): net,
+      category, day-graph, week-graph, month-graph, most-recent-expenses,
+      portfolios, weekly-investments, total-investments.
+    - days, year, month, from_year, to_year: Passed on to the widgets that
+      read them, as for their own endpoints.
+
+    Returns {"widgets": {name: {"data", "ms"}}, "shared": {scan: ms}, "ms"}.
+    Each widget's data is the response body of its endpoint, or it carries
+    an "error" message instead; "ms" is the time spent in the widget itself,
+    the time of the scans it shares with other widgets being under "shared".
+    A cached response keeps the timings of the request that computed it.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 8}
+
+    @conditional_on_data_version
+    @cached_report
+    def get(self, request):
+        started = time.perf_counter()
+        names = request.GET.get("widgets")
+        if names:
+            names = list(dict.fromkeys(name.strip() for name in names.split(",") if name.strip()))
+        else:
+            names = list(Dashboard.widgets)
+        unknown = [name for name in names if name not in Dashboard.widgets]
+        if unknown:
+            return Response(
+                data={
+                    "message": f"Unknown widgets: {', '.join(unknown)}",
+                    "widgets": list(Dashboard.widgets),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        dashboard = Dashboard(request.user, request.GET, names)
+        widgets = dashboard.render()
+        return Response(
+            {"widgets": widgets, "shared": dashboard.shared_timings, "ms": elapsed_ms(started)},
+            status=status.HTTP_200_OK,
+        )
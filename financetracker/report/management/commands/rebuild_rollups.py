@@ -0,0 +1,123 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from expense.models import Expense
+from income.models import Income
+from report.models import DailyRollup
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily income and expense rollup from the raw rows and "
+        "verifies that both agree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only rebuild and verify this user id. Can be repeated.",
+        )
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Compare the rollup with the raw rows without rebuilding it.",
+        )
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if not options["verify_only"]:
+            written = self.rebuild(users)
+            self.stdout.write(f"Rebuilt {written} rollup rows.")
+        mismatches = self.verify(users)
+        if mismatches:
+            for key, expected, found in mismatches[:20]:
+                self.stderr.write(f"{key}: expected {expected}, found {found}")
+            raise CommandError(f"{len(mismatches)} rollup rows are inconsistent.")
+        self.stdout.write(self.style.SUCCESS("Rollup is consistent."))
+
+    def raw_totals(self, users):
+        """Yields (kind, user_id, day, category_id, total, count) from the raw rows."""
+        for kind, model in ((DailyRollup.EXPENSE, Expense), (DailyRollup.INCOME, Income)):
+            fields = ["user_id", "date"]
+            if kind == DailyRollup.EXPENSE:
+                fields.append("category_id")
+            queryset = model.objects.filter(user__isnull=False)
+            if users:
+                queryset = queryset.filter(user__in=users)
+            rows = (
+                queryset.values(*fields)
+                .annotate(total=Sum("amount"), count=Count("id"))
+                .order_by()
+            )
+            for row in rows.iterator():
+                yield (
+                    kind,
+                    row["user_id"],
+                    row["date"],
+                    row.get("category_id"),
+                    row["total"] or 0,
+                    row["count"],
+                )
+
+    def rebuild(self, users):
+        written = 0
+        with transaction.atomic():
+            rollups = DailyRollup.objects.all()
+            if users:
+                rollups = rollups.filter(user__in=users)
+            rollups.delete()
+            batch = []
+            for kind, user_id, day, category_id, total, count in self.raw_totals(users):
+                batch.append(
+                    DailyRollup(
+                        kind=kind,
+                        user_id=user_id,
+                        day=day,
+                        category_id=category_id,
+                        total=total,
+                        count=count,
+                    )
+                )
+                if len(batch) >= BATCH_SIZE:
+                    DailyRollup.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            DailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+        return written
+
+    def verify(self, users):
+        """Returns (key, expected, found) for every rollup key that disagrees."""
+        expected = {}
+        for kind, user_id, day, category_id, total, count in self.raw_totals(users):
+            expected[(kind, user_id, day, category_id)] = (total, count)
+
+        rollups = DailyRollup.objects.all()
+        if users:
+            rollups = rollups.filter(user__in=users)
+        found = {}
+        rows = (
+            rollups.values("kind", "user_id", "day", "category_id")
+            .annotate(total=Sum("total"), count=Sum("count"))
+            .order_by()
+        )
+        for row in rows.iterator():
+            key = (row["kind"], row["user_id"], row["day"], row["category_id"])
+            found[key] = (row["total"], row["count"])
+
+        mismatches = []
+        for key in expected.keys() | found.keys():
+            want = expected.get(key, (0, 0))
+            have = found.get(key, (0, 0))
+            same_total = math.isclose(want[0], have[0], rel_tol=1e-9, abs_tol=1e-6)
+            if want[1] != have[1] or not same_total:
+                mismatches.append((key, want, have))
+        return mismatches
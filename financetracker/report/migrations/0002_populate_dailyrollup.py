@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+
+
+def populate(apps, schema_editor):
+    DailyRollup = apps.get_model("report", "DailyRollup")
+    sources = (
+        ("expense", apps.get_model("expense", "Expense"), ["user_id", "date", "category_id"]),
+        ("income", apps.get_model("income", "Income"), ["user_id", "date"]),
+    )
+    batch = []
+    for kind, model, fields in sources:
+        rows = (
+            model.objects.filter(user__isnull=False)
+            .values(*fields)
+            .annotate(total=Sum("amount"), count=Count("id"))
+            .order_by()
+        )
+        for row in rows.iterator():
+            batch.append(
+                DailyRollup(
+                    kind=kind,
+                    user_id=row["user_id"],
+                    day=row["date"],
+                    category_id=row.get("category_id"),
+                    total=row["total"] or 0,
+                    count=row["count"],
+                )
+            )
+            if len(batch) >= BATCH_SIZE:
+                DailyRollup.objects.bulk_create(batch)
+                batch = []
+    DailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0001_initial'),
+        ('expense', '0001_initial'),
+        ('income', '0002_alter_income_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
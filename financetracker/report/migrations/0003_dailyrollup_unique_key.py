@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 05:51
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    # Concurrent first writes could create several rows for one key: fold
+    # them into the oldest so the constraint can be added.
+    DailyRollup = apps.get_model("report", "DailyRollup")
+    duplicates = (
+        DailyRollup.objects.values("user_id", "kind", "day", "category_id")
+        .annotate(rows=Count("id"), first=Min("id"), total_sum=Sum("total"), count_sum=Sum("count"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for key in duplicates.iterator():
+        DailyRollup.objects.filter(pk=key["first"]).update(total=key["total_sum"], count=key["count_sum"])
+        DailyRollup.objects.filter(
+            user_id=key["user_id"], kind=key["kind"], day=key["day"], category_id=key["category_id"]
+        ).exclude(pk=key["first"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_budget'),
+        ('report', '0002_populate_dailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('kind'), models.F('day'), django.db.models.functions.comparison.Coalesce(models.F('category'), models.Value(0)), name='report_rollup_unique_key'),
+        ),
+    ]
@@ -1,3 +1,259 @@
-from django.db import models
+from collections import defaultdict
 
-# Create your models here.
+from django.contrib.auth.models import User
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+from .cache import bump_data_version
+
+
+class DailyRollupQuerySet(models.QuerySet):
+    def apply(self, kind, entries):
+        """
+        Applies (user_id, day, category_id, total, count) deltas to the rollup.
+
+        Deltas sharing a key are merged first, then the affected rows are
+        locked and read with one query and written back with one bulk_update,
+        one bulk_create for keys without a row yet and one delete for rows
+        left with neither a count nor a total, however many keys are touched.
+        """
+        merged = defaultdict(lambda: [0.0, 0])
+        for user_id, day, category_id, total, count in entries:
+            if user_id is None:
+                continue
+            merged[(user_id, day, category_id)][0] += total
+            merged[(user_id, day, category_id)][1] += count
+        merged = {key: delta for key, delta in merged.items() if delta[0] or delta[1]}
+        if not merged:
+            return
+        try:
+            with transaction.atomic():
+                self._apply_merged(kind, merged)
+        except IntegrityError:
+            # Another transaction inserted one of the missing keys after they
+            # were read. The unique constraint made this insert wait for it to
+            # commit, so the rows are read again and that one is updated.
+            with transaction.atomic():
+                self._apply_merged(kind, merged)
+
+    def _apply_merged(self, kind, merged):
+        rows = {
+            (row.user_id, row.day, row.category_id): row
+            for row in self.select_for_update().filter(
+                kind=kind,
+                user_id__in={user_id for user_id, _, _ in merged},
+                day__in={day for _, day, _ in merged},
+            )
+        }
+        changed, created, emptied = [], [], []
+        for (user_id, day, category_id), (total, count) in merged.items():
+            row = rows.get((user_id, day, category_id))
+            if row is None:
+                created.append(
+                    self.model(
+                        kind=kind,
+                        user_id=user_id,
+                        day=day,
+                        category_id=category_id,
+                        total=total,
+                        count=count,
+                    )
+                )
+                continue
+            row.total += total
+            row.count += count
+            # A row whose count and total disagree is kept for
+            # rebuild_rollups to find rather than dropped with its total.
+            (emptied if row.count == 0 and round(row.total, 6) == 0 else changed).append(row)
+        if changed:
+            self.bulk_update(changed, ["total", "count"])
+        if created:
+            self.bulk_create(created)
+        if emptied:
+            self.filter(pk__in=[row.pk for row in emptied]).delete()
+
+    def for_user(self, user, kind, from_date=None, to_date=None):
+        queryset = self.filter(user=user, kind=kind)
+        if from_date is not None and to_date is not None:
+            queryset = queryset.filter(day__range=(from_date, to_date))
+        return queryset
+
+    def daily_totals(self, user, kind, from_date, to_date):
+        """Returns {day: total} for the days in the range that have rows."""
+        return dict(
+            self.for_user(user, kind, from_date, to_date)
+            .values("day")
+            .annotate(value=Sum("total"))
+            .order_by()
+            .values_list("day", "value")
+        )
+
+    def weekly_totals(self, user, kind):
+        """Returns [{"week", "total"}] for every week that has rows."""
+        return list(
+            self.for_user(user, kind)
+            .annotate(week=TruncWeek("day"))
+            .values("week")
+            .annotate(total=Sum("total"))
+            .order_by("week")
+        )
+
+    def monthly_totals(self, user, kind, from_date, to_date):
+        """Returns {first day of month: total} for the months that have rows."""
+        return dict(
+            self.for_user(user, kind, from_date, to_date)
+            .annotate(month=TruncMonth("day"))
+            .values("month")
+            .annotate(value=Sum("total"))
+            .order_by()
+            .values_list("month", "value")
+        )
+
+    def total(self, user, kind, from_date, to_date):
+        """Returns the sum over the date range, 0 when there are no rows."""
+        totals = self.for_user(user, kind, from_date, to_date).aggregate(value=Sum("total"))
+        return totals["value"] or 0
+
+    def summary(self, user, kind, from_date, to_date):
+        """Returns (sum, count) over the date range, (0.0, 0) when there are no rows."""
+        totals = self.for_user(user, kind, from_date, to_date).aggregate(
+            value=Sum("total"), count=Sum("count")
+        )
+        return totals["value"] or 0.0, totals["count"] or 0
+
+
+class DailyRollup(models.Model):
+    """
+    Sum and count of a user's incomes or expenses for one day and category.
+
+    Rows are kept in step with the Income and Expense tables by
+    RollupTrackedModel, so reports read a row per day instead of a row per
+    transaction. `manage.py rebuild_rollups` recomputes and verifies them.
+    """
+
+    INCOME = "income"
+    EXPENSE = "expense"
+    KIND_CHOICES = [(INCOME, "Income"), (EXPENSE, "Expense")]
+
+    user = models.ForeignKey(User, related_name="daily_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    category = models.ForeignKey(
+        "category.Category",
+        related_name="daily_rollups",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    total = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+
+    objects = DailyRollupQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "kind", "day"], name="report_rollup_user_day_idx"),
+        ]
+        constraints = [
+            # One row per key. Incomes have no category, and NULLs never
+            # collide in a unique index, so the category is coalesced to 0.
+            models.UniqueConstraint(
+                F("user"),
+                F("kind"),
+                F("day"),
+                Coalesce(F("category"), Value(0)),
+                name="report_rollup_unique_key",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.day}: {self.total}"
+
+
+class RollupTrackedModel(models.Model):
+    """
+    Abstract base for models summed into DailyRollup.
+
+    Saving or deleting a row moves its amount between rollup rows inside the
+    same transaction as the write itself.
+    """
+
+    rollup_kind = None
+
+    class Meta:
+        abstract = True
+
+    def rollup_entry(self, sign=1):
+        category_id = getattr(self, "category_id", None)
+        if category_id is not None:
+            # Views set the id from request data, where it may be a string.
+            category_id = int(category_id)
+        return (
+            self.user_id,
+            self.date,
+            category_id,
+            sign * float(self.amount or 0),
+            sign,
+        )
+
+    def stored_rollup_entry(self, sign=1):
+        """The rollup entry of this row as currently stored, None if unsaved."""
+        if self.pk is None:
+            return None
+        fields = ["user_id", "date", "amount"]
+        if hasattr(self, "category_id"):
+            fields.append("category_id")
+        stored = type(self)._default_manager.filter(pk=self.pk).values(*fields).first()
+        if stored is None:
+            return None
+        return (
+            stored["user_id"],
+            stored["date"],
+            stored.get("category_id"),
+            sign * float(stored["amount"] or 0),
+            sign,
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.stored_rollup_entry(sign=-1)
+            super().save(*args, **kwargs)
+            entries = [self.rollup_entry()]
+            if previous is not None:
+                entries.append(previous)
+            DailyRollup.objects.apply(self.rollup_kind, entries)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.stored_rollup_entry(sign=-1)
+            if previous is not None:
+                DailyRollup.objects.apply(self.rollup_kind, [previous])
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def bulk_create_tracked(cls, objs, batch_size=None):
+        """
+        Inserts objs with bulk_create and adds them to the rollup in the same
+        transaction. bulk_create sends no signals, so the owners' cached
+        reports are invalidated here as well.
+        """
+        with transaction.atomic():
+            created = cls._default_manager.bulk_create(objs, batch_size=batch_size)
+            DailyRollup.objects.apply(cls.rollup_kind, [obj.rollup_entry() for obj in created])
+            for user_id in {obj.user_id for obj in created}:
+                bump_data_version(user_id)
+        return created
+
+    @classmethod
+    def delete_tracked(cls, queryset):
+        """
+        Deletes the rows of queryset and removes them from the rollup in the
+        same transaction, which QuerySet.delete() alone does not do. Returns
+        the number of rows deleted.
+        """
+        with transaction.atomic():
+            objs = list(queryset.select_for_update())
+            DailyRollup.objects.apply(cls.rollup_kind, [obj.rollup_entry(sign=-1) for obj in objs])
+            cls._default_manager.filter(pk__in=[obj.pk for obj in objs]).delete()
+        return len(objs)
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from category.models import Category
+from expense.models import Expense
+from income.models import Income
+from investment.models import Investment, Portfolio
+
+from .cache import bump_data_version
+
+
+# Invalidate the cached reports of the owner whenever report data is written
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Income)
+@receiver(post_delete, sender=Income)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_delete, sender=Portfolio)
+def invalidate_owner_reports(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=Investment)
+@receiver(post_delete, sender=Investment)
+def invalidate_investor_reports(sender, instance, **kwargs):
+    if Investment.portfolio.is_cached(instance):
+        user_id = instance.portfolio.user_id
+    else:
+        user_id = (
+            Portfolio.objects.filter(pk=instance.portfolio_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    bump_data_version(user_id)
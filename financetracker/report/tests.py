@@ -1,3 +1,353 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from category.models import Category
+from expense.models import Expense
+from financetracker.dates import month_range
+from income.models import Income
+from investment.models import Investment, Portfolio
+
+from .cache import bump_data_version, get_cache
+from .checks import check_report_cache_is_shared
+from .models import DailyRollup, DailyRollupQuerySet
+
+
+class ReportQueryPlanTests(TestCase):
+    """
+    Checks with EXPLAIN that the hot report queries are answered from the
+    composite indexes rather than by scanning a user's whole history.
+    """
+
+    DAYS = 400
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f"user{i}") for i in range(3)]
+        cls.user = cls.users[0]
+        today = datetime.now().date()
+        expenses, incomes, investments = [], [], []
+        for user in cls.users:
+            category = Category.objects.filter(user=user).first()
+            portfolio = Portfolio.objects.create(user=user, name="Stocks")
+            for offset in range(0, cls.DAYS, 5):
+                name = str(offset)
+                expenses.append(Expense(user=user, category=category, name=name, amount=offset))
+                incomes.append(Income(user=user, name=name, amount=offset))
+                investments.append(Investment(portfolio=portfolio, name=name, amount=offset, value=offset))
+        Expense.objects.bulk_create(expenses)
+        Income.objects.bulk_create(incomes)
+        Investment.objects.bulk_create(investments)
+        # date and date_invested are set automatically on insert, so spread
+        # the rows over the past year and a bit afterwards.
+        for offset in range(0, cls.DAYS, 5):
+            day = today - timedelta(days=offset)
+            Expense.objects.filter(name=str(offset)).update(date=day)
+            Income.objects.filter(name=str(offset)).update(date=day)
+            Investment.objects.filter(name=str(offset)).update(date_invested=day)
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(index_name in plan for index_name in index_names),
+            f"{' or '.join(index_names)} not used by:\n{queryset.query}\n{plan}",
+        )
+
+    def test_monthly_expense_list_uses_user_date_index(self):
+        queryset = Expense.objects.filter(user=self.user, date__range=month_range()).order_by("-id")
+        self.assertUsesIndex(queryset, "expense_user_date_id_idx")
+
+    def test_expense_date_range_page_uses_user_date_index(self):
+        from_date, to_date = month_range()
+        queryset = (
+            Expense.objects.filter(user=self.user, date__range=(from_date - timedelta(days=365), to_date))
+            .order_by("-date", "-id")[:100]
+        )
+        self.assertUsesIndex(queryset, "expense_user_date_id_idx")
+
+    def test_category_total_uses_covering_category_amount_index(self):
+        category = Category.objects.filter(user=self.user).first()
+        queryset = (
+            Expense.objects.filter(category=category)
+            .values("category")
+            .annotate(total=Sum("amount"))
+        )
+        self.assertUsesIndex(queryset, "expense_category_amount_idx")
+
+    def test_monthly_income_list_uses_user_date_index(self):
+        queryset = Income.objects.filter(user=self.user, date__range=month_range())
+        self.assertUsesIndex(queryset, "income_user_date_id_idx")
+
+    def test_monthly_category_report_uses_user_date_index(self):
+        queryset = Category.objects.filter(user=self.user, date__range=month_range())
+        self.assertUsesIndex(queryset, "category_user_date_idx")
+
+    def test_investment_date_range_uses_portfolio_date_index(self):
+        from_date, to_date = month_range()
+        queryset = Investment.objects.filter(
+            portfolio__user=self.user, date_invested__range=(from_date, to_date)
+        )
+        self.assertUsesIndex(queryset, "investment_portfolio_date_idx")
+
+    def test_rollup_range_uses_user_day_index(self):
+        from_date, to_date = month_range()
+        queryset = DailyRollup.objects.for_user(self.user, DailyRollup.EXPENSE, from_date, to_date)
+        # The unique key starts with the same columns.
+        self.assertUsesIndex(queryset, "report_rollup_user_day_idx", "report_rollup_unique_key")
+
+
+class RollupTrackingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tracked")
+        self.category = Category.objects.filter(user=self.user).first()
+
+    def rollup(self):
+        return list(DailyRollup.objects.filter(user=self.user).values_list("category_id", "total", "count"))
+
+    def test_save_and_delete_keep_the_rollup_in_step(self):
+        other = Category.objects.filter(user=self.user).exclude(pk=self.category.pk).first()
+        lunch = Expense.objects.create(user=self.user, category=self.category, amount=10)
+        Expense.objects.create(user=self.user, category=self.category, amount=20)
+        self.assertEqual(self.rollup(), [(self.category.pk, 30, 2)])
+
+        lunch.amount = 12
+        lunch.save()
+        self.assertEqual(self.rollup(), [(self.category.pk, 32, 2)])
+
+        lunch.category = other
+        lunch.save()
+        self.assertCountEqual(self.rollup(), [(self.category.pk, 20, 1), (other.pk, 12, 1)])
+
+        lunch.delete()
+        self.assertEqual(self.rollup(), [(self.category.pk, 20, 1)])
+
+    def test_incomes_are_rolled_up_without_a_category(self):
+        salary = Income.objects.create(user=self.user, name="Salary", amount=100)
+        Income.objects.create(user=self.user, name="Bonus", amount=50)
+        salary.delete()
+        self.assertEqual(
+            list(DailyRollup.objects.filter(user=self.user).values_list("kind", "category_id", "total", "count")),
+            [(DailyRollup.INCOME, None, 50, 1)],
+        )
+
+    def test_category_id_from_request_data_shares_the_rollup_row(self):
+        expense = Expense.objects.create(user=self.user, category_id=str(self.category.pk), amount=10)
+        Expense.objects.create(user=self.user, category_id=str(self.category.pk), amount=20)
+        expense.amount = 15
+        expense.save()
+        self.assertEqual(self.rollup(), [(self.category.pk, 35, 2)])
+
+    def test_delete_tracked_removes_the_rows_from_the_rollup(self):
+        kept = Expense.objects.create(user=self.user, category=self.category, amount=5, name="kept")
+        for amount in (10, 20):
+            Expense.objects.create(user=self.user, category=self.category, amount=amount, name="gone")
+        self.assertEqual(Expense.delete_tracked(Expense.objects.filter(name="gone")), 2)
+        self.assertEqual(list(Expense.objects.filter(user=self.user)), [kept])
+        self.assertEqual(self.rollup(), [(self.category.pk, 5, 1)])
+
+    def test_rollup_keys_are_unique_with_and_without_a_category(self):
+        day = datetime.now().date()
+        for category in (self.category, None):
+            kind = DailyRollup.EXPENSE if category else DailyRollup.INCOME
+            DailyRollup.objects.create(user=self.user, kind=kind, day=day, category=category, total=1, count=1)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                DailyRollup.objects.create(user=self.user, kind=kind, day=day, category=category, total=1, count=1)
+
+    def test_row_keeping_a_total_is_not_deleted_with_its_count(self):
+        day = datetime.now().date()
+        DailyRollup.objects.create(
+            user=self.user, kind=DailyRollup.EXPENSE, day=day, category=self.category, total=10, count=1
+        )
+        DailyRollup.objects.apply(DailyRollup.EXPENSE, [(self.user.pk, day, self.category.pk, -5.0, -1)])
+        self.assertEqual(self.rollup(), [(self.category.pk, 5, 0)])
+        DailyRollup.objects.apply(DailyRollup.EXPENSE, [(self.user.pk, day, self.category.pk, -5.0, 0)])
+        self.assertEqual(self.rollup(), [])
+
+    def test_row_inserted_concurrently_is_updated(self):
+        apply_merged = DailyRollupQuerySet._apply_merged
+        attempts = []
+
+        def racing_apply_merged(queryset, kind, merged):
+            attempts.append(kind)
+            if len(attempts) == 1:
+                # Another transaction inserted the key after it was read.
+                raise IntegrityError
+            day = next(iter(merged))[1]
+            DailyRollup.objects.create(user=self.user, kind=kind, day=day, category=self.category, total=7, count=1)
+            return apply_merged(queryset, kind, merged)
+
+        with mock.patch.object(DailyRollupQuerySet, "_apply_merged", racing_apply_merged):
+            Expense.objects.create(user=self.user, category=self.category, amount=10)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(self.rollup(), [(self.category.pk, 17, 2)])
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username="cached")
+        self.token = Token.objects.create(user=self.user)
+        self.category = Category.objects.filter(user=self.user).first()
+
+    def request(self, method, path, **kwargs):
+        return getattr(self.client, method)(path, HTTP_AUTHORIZATION=f"Token {self.token.key}", **kwargs)
+
+    def test_writes_invalidate_cached_reports(self):
+        path = "/api/report-net/"
+        first = self.request("get", path)
+        self.assertEqual(first["X-Report-Cache"], "miss")
+        self.assertEqual(self.request("get", path)["X-Report-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.request(
+                "post",
+                "/api/expense/",
+                data={"name": "Lunch", "amount": 12, "description": "", "category": self.category.pk},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        second = self.request("get", path)
+        self.assertEqual(second["X-Report-Cache"], "miss")
+        self.assertNotEqual(second.data, first.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request("delete", f"/api/expense/{response.data['id']}/")
+        third = self.request("get", path)
+        self.assertEqual(third["X-Report-Cache"], "miss")
+        self.assertEqual(third.data, first.data)
+
+    def test_writes_of_other_users_keep_the_cache(self):
+        path = "/api/report-net/"
+        self.request("get", path)
+        other = User.objects.create(username="other")
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=other, category=Category.objects.filter(user=other).first(), amount=5)
+        self.assertEqual(self.request("get", path)["X-Report-Cache"], "hit")
+
+    def test_etag_from_before_a_version_bump_gets_the_full_report(self):
+        path = "/api/report-net/"
+        etag = self.request("get", path)["ETag"]
+        self.assertEqual(self.request("get", path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version(self.user.pk)
+        response = self.request("get", path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(WEB_CONCURRENCY=3)
+    def test_per_process_cache_fails_the_check_with_several_workers(self):
+        self.assertEqual([error.id for error in check_report_cache_is_shared(None)], ["report.E001"])
+        shared = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        with override_settings(CACHES={**settings.CACHES, settings.REPORT_CACHE_ALIAS: shared}):
+            self.assertEqual(check_report_cache_is_shared(None), [])
+
+
+class ReportDashboardTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username="dashboard")
+        self.token = Token.objects.create(user=self.user)
+        first, second = Category.objects.filter(user=self.user)[:2]
+        today = datetime.now().date()
+        days = (today - timedelta(days=1), today)
+        # Summed a day at a time these come to 0.7, in one go to 0.7000000000000001.
+        DailyRollup.objects.bulk_create(
+            DailyRollup(user=self.user, kind=DailyRollup.EXPENSE, day=day, category=category, total=total, count=1)
+            for day, category, total in (
+                (days[0], first, 0.1),
+                (days[0], second, 0.1),
+                (days[1], first, 0.1),
+                (days[1], second, 0.4),
+            )
+        )
+        DailyRollup.objects.create(user=self.user, kind=DailyRollup.INCOME, day=today, total=2, count=1)
+        # The same amounts invested over two weeks.
+        portfolio = Portfolio.objects.create(user=self.user, name="Stocks", budget=1000)
+        for day, amount in ((today - timedelta(days=7), 0.1), (today - timedelta(days=7), 0.1), (today, 0.1), (today, 0.4)):
+            investment = Investment.objects.create(portfolio=portfolio, name="Fund", amount=amount, value=amount)
+            Investment.objects.filter(pk=investment.pk).update(date_invested=day)
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_widgets_hold_the_bodies_of_their_endpoints(self):
+        response = self.get("/api/report-dashboard/")
+        self.assertEqual(response.status_code, 200)
+        widgets = response.json()["widgets"]
+        for name in widgets:
+            with self.subTest(widget=name):
+                self.assertEqual(widgets[name]["data"], self.get(f"/api/report-{name}/").json())
+
+    def test_rollup_widgets_share_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("/api/report-dashboard/?widgets=net,day-graph,week-graph,month-graph")
+        self.assertEqual(response.status_code, 200)
+        # The category count of the net summary joins the rollup as well.
+        rollup_queries = [
+            query["sql"] for query in queries if "report_dailyrollup" in query["sql"] and "category_category" not in query["sql"]
+        ]
+        self.assertEqual(len(rollup_queries), 1)
+
+
+class AsyncReportTests(TransactionTestCase):
+    """
+    The async views run their queries on threads with connections of their
+    own, which only see committed rows, hence the TransactionTestCase.
+    """
+
+    PATHS = (
+        "report-date-range/?select=expense&from_date=2000-01-01&to_date=2100-12-31",
+        "report-date-range/?select=income&from_date=2000-01-01&to_date=2100-12-31",
+        "report-category/",
+        "report-day-graph/?days=30",
+        "report-week-graph/",
+        "report-month-graph/",
+        "report-most-recent-expenses/",
+        "report-net/",
+        "report-portfolios/",
+        "report-weekly-investments/",
+        "report-total-investments/",
+    )
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username="async")
+        self.token = Token.objects.create(user=self.user)
+        category = Category.objects.filter(user=self.user).first()
+        portfolio = Portfolio.objects.create(user=self.user, name="Stocks", budget=1000)
+        for amount in (12.5, 30, 7.25):
+            Expense.objects.create(user=self.user, category=category, name="Lunch", amount=amount)
+            Income.objects.create(user=self.user, name="Salary", amount=amount * 10)
+            Investment.objects.create(portfolio=portfolio, name="Fund", amount=amount, value=amount * 1.1)
+
+    def get(self, path, **headers):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}", **headers)
+
+    def test_async_views_answer_like_the_sync_views(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                expected = self.get(f"/api/{path}")
+                response = self.get(f"/api/async/{path}")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response["X-Report-Cache"], "miss")
+                cached = self.get(f"/api/async/{path}")
+                self.assertEqual(cached["X-Report-Cache"], "hit")
+                self.assertEqual(cached.content, expected.content)
+
+    def test_async_views_need_a_valid_token(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                response = self.client.get(f"/api/async/{path}")
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response["WWW-Authenticate"], "Token")
+                response = self.client.get(f"/api/async/{path}", HTTP_AUTHORIZATION="Token invalid")
+                self.assertEqual(response.status_code, 401)
@@ -1,6 +1,7 @@
 from django.urls import path
 
 from . import views
+from .dashboard import ReportDashboardView
 
 urlpatterns = [
     path("report-date-range/", views.ReportDateRangeView.as_view(), name="report_date_range"),
@@ -13,5 +14,7 @@ urlpatterns = [
     path("report-portfolios/", views.ReportPortfolioPerformanceSummaryView.as_view(), name="report_portfolios"),
     path("report-weekly-investments/", views.ReportInvestmentsWeekGraphView.as_view(), name="report_weekly_investments"),
     path("report-total-investments/", views.ReportInvestmentsTotalView.as_view(), name="report_total_investments"),
+    path("report-dashboard/", ReportDashboardView.as_view(), name="report_dashboard"),
+    path("report-cache-stats/", views.ReportCacheStatsView.as_view(), name="report_cache_stats"),
 
 ]
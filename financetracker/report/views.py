@@ -1,16 +1,25 @@
 from category.models import Category
 from expense.models import Expense
-from expense.serializers import ExpenseSerializer
+from expense.serializers import ExpenseReadSerializer
 from income.models import Income
-from income.serializers import IncomeSerializer
+from income.serializers import IncomeReadSerializer
+from investment.models import Investment, Portfolio
+from investment.serializers import PortfolioReadSerializer
+from financetracker.dates import month_range
+from financetracker.pagination import KeysetPagination
+from .cache import cache_stats, cached_report, conditional_on_data_version
+from .models import DailyRollup
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import datetime, timedelta
 INCOME = "income"
 EXPENSE = "expense"
-current_month = datetime.now().month
+MAX_REPORT_YEARS = 50
 
 class ReportDateRangeView(APIView):
     """
@@ -22,44 +31,61 @@ class ReportDateRangeView(APIView):
     - from_date: The start date of the date range (format: YYYY-MM-DD).
     - to_date: The end date of the date range (format: YYYY-MM-DD).
     - select: The type of data to retrieve (either 'expense' or 'income').
+    - cursor, page_size: Optional. Return one page of the rows, newest first,
+      with a "next" link to the following page (see KeysetPagination). The
+      total still covers the whole date range.
 
     Returns a JSON response containing the filtered data and the total sum of expenses or income.
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 4}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         from_date = request.GET.get("from_date")
         to_date = request.GET.get("to_date")
         select = request.GET.get("select")
         try:
             if select == EXPENSE:
-                filtered_expense = (
+                filtered_expense = ExpenseReadSerializer.values(
                     Expense.objects.filter(user=request.user)
                     .filter(date__range=(from_date, to_date))
                     .order_by("-id")
                 )
-                serializer = ExpenseSerializer(filtered_expense, many=True)
+                paginator = KeysetPagination()
+                page = paginator.paginate_queryset(filtered_expense, request, view=self)
+                serializer = ExpenseReadSerializer(filtered_expense if page is None else page)
                 expense_sum = Expense.get_expense_total(
                     from_date, to_date, request.user
                 )
                 json_data = {"filtered": serializer.data, "total": expense_sum}
+                if page is not None:
+                    json_data["next"] = paginator.get_next_link()
                 if json_data:
                     return Response(json_data, status=status.HTTP_200_OK)
 
             if select == INCOME:
-                filtered_income = (
+                filtered_income = IncomeReadSerializer.values(
                     Income.objects.filter(user=request.user)
                     .filter(date__range=(from_date, to_date))
                     .order_by("-id")
                 )
-                serializer = IncomeSerializer(filtered_income, many=True)
+                paginator = KeysetPagination()
+                page = paginator.paginate_queryset(filtered_income, request, view=self)
+                serializer = IncomeReadSerializer(filtered_income if page is None else page)
                 income_sum = Income.get_income_total(from_date, to_date, request.user)
                 json_data = {"filtered": serializer.data, "total": income_sum}
+                if page is not None:
+                    json_data["next"] = paginator.get_next_link()
 
                 if json_data:
                     return Response(json_data, status=status.HTTP_200_OK)
 
+        except APIException:
+            # Such as the invalid cursor error of KeysetPagination.
+            raise
         except:
             return Response(
                 data={"message": "Results not found, Invalid parameters"},
@@ -74,16 +100,23 @@ class ReportDayGraph(APIView):
 
     Requires authentication.
 
+    Supported query parameters:
+    - days: The number of days to look back, up to 366 (default: 7).
+
     Methods:
     - get: Retrieves the daily expenses for the last week and returns a response with the filtered data.
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
+            days = parse_days(request.GET.get("days", 7))
             return Response(
-                {"filtered": Expense.get_expenses_daily_for_the_week(request.user)},
+                {"filtered": Expense.get_expenses_daily_for_the_week(request.user, days)},
                 status=status.HTTP_200_OK,
             )
         except:
@@ -105,7 +138,10 @@ class ReportWeekGraph(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
             return Response(
@@ -127,16 +163,29 @@ class ReportMonthGraph(APIView):
 
     This view requires authentication and returns a filtered dataset of monthly expenses for the year.
 
+    Supported query parameters:
+    - year: The year to report on (default: the current year).
+    - from_year, to_year: Report on every month of a range of years instead.
+      Each entry then also carries its year.
+
     Methods:
     - get: Retrieves the monthly expenses for the year and returns a filtered dataset.
 
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            data = Expense.get_expenses_monthly_for_the_year(request.user)
+            data = get_expenses_by_month(
+                request.user,
+                request.GET.get("year"),
+                request.GET.get("from_year"),
+                request.GET.get("to_year"),
+            )
             return Response({"filtered": data}, status=status.HTTP_200_OK)
         except:
             return Response(
@@ -156,16 +205,16 @@ class ReportMostRecentView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            filtered = (
-                Expense.objects.filter(user=request.user)
-                .filter(date__month=str(current_month))
-                .order_by("-id")[:5]
+            return Response(
+                {"filtered": get_most_recent_expenses(request.user)},
+                status=status.HTTP_200_OK,
             )
-            serializer = ExpenseSerializer(filtered, many=True)
-            return Response({"filtered": serializer.data}, status=status.HTTP_200_OK)
         except:
             return Response(
                 data={"message": "Unable to get most recent expenses"},
@@ -179,24 +228,24 @@ class ReportNetView(APIView):
 
     Requires authentication.
 
+    Supported query parameters:
+    - year: The year of the month to report on (default: the current year).
+    - month: The month to report on, 1-12 (default: the current month).
+
     Methods:
     - get: Retrieves net expenses for the month for the authenticated user.
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            category_count = (
-                Category.objects.filter(user=request.user)
-                .filter(date__month=str(current_month))
-                .all()
-                .count()
+            data = Expense.get_net_expenses_for_the_month(
+                request.user, request.GET.get("year"), request.GET.get("month")
             )
-
-            data = Expense.get_net_expenses_for_the_month(request.user)
-            data[0]["categoryCount"] = category_count
-
             return Response({"filtered": data}, status=status.HTTP_200_OK)
         except:
             return Response(
@@ -211,32 +260,96 @@ class ReportCategoryView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            categories = Category.objects.filter(user=request.user).filter(
-                date__month=str(current_month)
+            return Response(
+                {"filtered": get_category_spending(request.user)},
+                status=status.HTTP_200_OK,
             )
-            data = []
-            for i in categories:
-                data.append({"category": i.name, "amount": i.total_expense_cost})
-            return Response({"filtered": data}, status=status.HTTP_200_OK)
         except:
             return Response(
                 data={"message": "Unable to group by categories"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+def parse_days(days):
+    days = int(days)
+    if not 0 <= days <= 366:
+        raise ValueError("days must be between 0 and 366")
+    return days
+
+
+def parse_year_range(from_year, to_year):
+    from_year = int(from_year or to_year)
+    to_year = int(to_year or from_year)
+    if not 0 <= to_year - from_year < MAX_REPORT_YEARS:
+        raise ValueError("Invalid year range")
+    return from_year, to_year
+
+
+def get_expenses_by_month(user, year=None, from_year=None, to_year=None):
+    if from_year or to_year:
+        from_year, to_year = parse_year_range(from_year, to_year)
+        return Expense.get_expenses_monthly(user, from_year, to_year)
+    return Expense.get_expenses_monthly_for_the_year(user, int(year) if year else None)
+
+
 def get_expenses_daily_for_the_week(user):
+    return DailyRollup.objects.weekly_totals(user, DailyRollup.EXPENSE)
+
+
+def get_most_recent_expenses(user):
     filtered = (
-        Expense.objects.all()
-        .filter(user=user)
-        .annotate(week=TruncWeek("date"))
+        Expense.objects.filter(user=user)
+        .filter(date__range=month_range())
+        .order_by("-id")[:5]
+    )
+    return ExpenseReadSerializer(filtered).data
+
+
+def get_category_spending(user):
+    categories = (
+        Category.objects.filter(user=user)
+        .filter(date__range=month_range())
+        .with_spending()
+    )
+    data = []
+    for i in categories:
+        data.append({"category": i.name, "amount": i.total_expense_cost})
+    return data
+
+
+def get_portfolio_summary(user):
+    portfolios = Portfolio.objects.filter(user=user).with_totals()
+    return PortfolioReadSerializer(portfolios).data
+
+
+def get_weekly_investments(user):
+    end_date = datetime.today()
+    start_date = end_date - timedelta(days=30)
+    return list(
+        Investment.objects.filter(portfolio__user=user)
+        .filter(date_invested__range=[start_date, end_date])
+        .annotate(week=TruncWeek("date_invested"))
         .values("week")
         .annotate(total=Sum("amount"))
         .order_by("week")
     )
-    return filtered
+
+
+def get_total_investments(user):
+    end_date = datetime.today()
+    start_date = end_date - timedelta(days=30)
+    return (
+        Investment.objects.filter(portfolio__user=user)
+        .filter(date_invested__range=[start_date, end_date])
+        .aggregate(total=Sum("amount"))
+    )
+
 
 class ReportPortfolioPerformanceSummaryView(APIView):
     """
@@ -244,12 +357,13 @@ class ReportPortfolioPerformanceSummaryView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            portfolios = Portfolio.objects.filter(user=request.user)
-            serializer = PortfolioSerializer(portfolios, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(get_portfolio_summary(request.user), status=status.HTTP_200_OK)
         except:
             return Response(
                 data={"message": "Unable to get portfolio performance summary"},
@@ -262,20 +376,16 @@ class ReportInvestmentsWeekGraphView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            end_date = datetime.today()
-            start_date = end_date - timedelta(days=30)
-            weekly_investments = (
-                Investment.objects.filter(portfolio__user=request.user)
-                .filter(date_invested__range=[start_date, end_date])
-                .annotate(week=TruncWeek("date_invested"))
-                .values("week")
-                .annotate(total=Sum("amount"))
-                .order_by("week")
+            return Response(
+                {"filtered": get_weekly_investments(request.user)},
+                status=status.HTTP_200_OK,
             )
-            return Response({"filtered": weekly_investments}, status=status.HTTP_200_OK)
         except:
             return Response(
                 data={"message": "Unable to get weekly investments for the month"},
@@ -289,19 +399,31 @@ class ReportInvestmentsTotalView(APIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    query_budget = {"GET": 3}
 
+    @conditional_on_data_version
+    @cached_report
     def get(self, request):
         try:
-            end_date = datetime.today()
-            start_date = end_date - timedelta(days=30)
-            total_investments = (
-                Investment.objects.filter(portfolio__user=request.user)
-                .filter(date_invested__range=[start_date, end_date])
-                .aggregate(total=Sum("amount"))
+            return Response(
+                {"filtered": get_total_investments(request.user)},
+                status=status.HTTP_200_OK,
             )
-            return Response({"filtered": total_investments}, status=status.HTTP_200_OK)
         except:
             return Response(
                 data={"message": "Unable to get total investments for the month"},
                 status=status.HTTP_400_BAD_REQUEST,
-            )
\ No newline at end of file
+            )
+
+
+class ReportCacheStatsView(APIView):
+    """
+    API view exposing the report cache hit and miss counters of the serving process.
+
+    Requires an admin user.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
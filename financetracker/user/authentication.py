@@ -0,0 +1,160 @@
+"""
+Token authentication with a cache in front of the token lookup.
+
+DRF's TokenAuthentication reads the token and its user with a join on every
+request. CachedTokenAuthentication keeps recently authenticated tokens in a
+bounded in-process LRU for TOKEN_AUTH_CACHE_TTL seconds, and optionally in
+the shared Django cache named by TOKEN_AUTH_CACHE_ALIAS so that workers can
+reuse each other's lookups.
+
+Entries are dropped when a token is saved or deleted and when its user is
+saved or deleted (see the receivers in user/models.py). Those signals only
+reach the process that made the change and the shared cache: another
+process would keep accepting a revoked token from its own LRU for up to
+TOKEN_AUTH_CACHE_TTL seconds. Servers running several processes therefore
+set TOKEN_AUTH_CACHE_SIZE to 0 and rely on the shared cache alone, which the
+user.E001 system check enforces (see user/checks.py).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    A thread-safe LRU of token key -> (user, token) whose entries expire
+    after ttl seconds, backed by an optional shared Django cache.
+    """
+
+    def __init__(self, size, ttl, alias=None):
+        self.size = size
+        self.ttl = ttl
+        self.alias = alias
+        self.entries = OrderedDict()
+        # user id -> token keys cached for that user, to invalidate by user.
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+
+    def shared_cache(self):
+        return caches[self.alias] if self.alias else None
+
+    @staticmethod
+    def shared_key(key):
+        # Token keys are credentials; the shared cache only sees a digest.
+        return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    return entry[1]
+                self._remove(key)
+        shared_cache = self.shared_cache()
+        if shared_cache is None:
+            return None
+        cached = shared_cache.get(self.shared_key(key))
+        if cached is not None:
+            self._store(key, cached)
+        return cached
+
+    def set(self, key, user, token):
+        # Rows read inside a transaction are only cached once it commits (at
+        # once outside of one), so that a rollback, such as the one ending
+        # every TestCase test, cannot leave a token cached that never existed.
+        transaction.on_commit(lambda: self._set(key, (user, token)))
+
+    def _set(self, key, cached):
+        self._store(key, cached)
+        shared_cache = self.shared_cache()
+        if shared_cache is not None:
+            shared_cache.set(self.shared_key(key), cached, timeout=self.ttl)
+
+    def _store(self, key, cached):
+        if self.size <= 0:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, cached)
+            self.keys_by_user.setdefault(cached[0].pk, set()).add(key)
+            while len(self.entries) > self.size:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        # Called with the lock held.
+        _, (user, _) = self.entries.pop(key)
+        keys = self.keys_by_user.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[user.pk]
+
+    def invalidate(self, keys=(), user_id=None):
+        """Drops the given token keys and every token cached for user_id."""
+        keys = set(keys)
+        with self.lock:
+            if user_id is not None:
+                keys |= self.keys_by_user.get(user_id, set())
+            for key in keys:
+                if key in self.entries:
+                    self._remove(key)
+        shared_cache = self.shared_cache()
+        if shared_cache is not None and keys:
+            shared_cache.delete_many([self.shared_key(key) for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE_SIZE,
+    settings.TOKEN_AUTH_CACHE_TTL,
+    settings.TOKEN_AUTH_CACHE_ALIAS,
+)
+
+
+def invalidate_tokens(keys=(), user_id=None):
+    """
+    Drops cached tokens now and again once the current transaction commits,
+    so a request that read the old rows meanwhile cannot cache them again.
+    """
+    token_cache.invalidate(keys, user_id)
+    transaction.on_commit(lambda: token_cache.invalidate(keys, user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that answers repeated requests with the same token
+    from token_cache instead of the database.
+
+    Only active users are cached, and every request gets its own copy of
+    the cached user and token, so one request cannot leak state into the
+    next through them.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, *self.copy(user, token))
+            return user, token
+        return self.copy(*cached)
+
+    @staticmethod
+    def copy(user, token):
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_token_cache_is_shared(app_configs, **kwargs):
+    """
+    Revoking a token drops it from the cache of the process handling the
+    change and from the shared cache. Another worker's own LRU, or a shared
+    cache that is local to each process after all, keeps accepting it until
+    TOKEN_AUTH_CACHE_TTL runs out.
+    """
+    if settings.WEB_CONCURRENCY <= 1:
+        return []
+    alias = settings.TOKEN_AUTH_CACHE_ALIAS
+    if settings.TOKEN_AUTH_CACHE_SIZE > 0 or (alias and isinstance(caches[alias], LocMemCache)):
+        return [
+            Error(
+                f"Tokens are cached in each process, but WEB_CONCURRENCY is "
+                f"{settings.WEB_CONCURRENCY}: a token revoked on one worker would still be "
+                f"accepted by the others for up to TOKEN_AUTH_CACHE_TTL seconds.",
+                hint=(
+                    "Set TOKEN_AUTH_CACHE_SIZE to 0, and REPORT_CACHE_BACKEND or "
+                    "TOKEN_AUTH_CACHE_ALIAS to a cache shared by every worker."
+                ),
+                id="user.E001",
+            )
+        ]
+    return []
@@ -1,3 +1,24 @@
-from django.db import models
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 
-# Create your models here.
+from .authentication import invalidate_tokens, token_cache
+
+
+# Drop cached token lookups when a token is regenerated or deleted
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key], instance.user_id)
+
+
+# Drop the cached tokens of a user that is updated (e.g. deactivated) or deleted
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    keys = ()
+    if token_cache.alias and kwargs.get("created") is False:
+        # Other workers may have cached tokens this process has not seen.
+        keys = list(Token.objects.filter(user=instance).values_list("key", flat=True))
+    invalidate_tokens(keys, instance.pk)
@@ -1,3 +1,78 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .checks import check_token_cache_is_shared
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="cached")
+        self.token = Token.objects.create(user=self.user)
+        # Deleting a token clears its key, which is its primary key.
+        self.key = self.token.key
+
+    def get_profile(self, key=None):
+        return self.client.get("/api/user/profile/", HTTP_AUTHORIZATION=f"Token {key or self.key}")
+
+    def cache_token(self):
+        # Lookups are cached once the transaction they were read in commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.get_profile().status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.key))
+
+    def test_repeated_requests_skip_the_token_lookup(self):
+        self.cache_token()
+        with self.assertNumQueries(0):
+            response = self.get_profile()
+        self.assertEqual(response.data["username"], "cached")
+
+    def test_lookups_rolled_back_are_not_cached(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.assertIsNone(token_cache.get(self.key))
+
+    def test_deleted_token_is_rejected(self):
+        self.cache_token()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_regenerated_token_replaces_the_old_one(self):
+        self.cache_token()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+            token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get_profile(token.key).status_code, 200)
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.cache_token()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_deactivation_drops_tokens_other_processes_shared(self):
+        with mock.patch.object(token_cache, "alias", "default"):
+            self.cache_token()
+            shared_key = token_cache.shared_key(self.key)
+            self.assertIsNotNone(caches["default"].get(shared_key))
+            # This process never saw the token; another worker cached it.
+            token_cache.clear()
+            self.user.is_active = False
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+            self.assertIsNone(caches["default"].get(shared_key))
+            self.assertEqual(self.get_profile().status_code, 401)
+
+    @override_settings(WEB_CONCURRENCY=3, TOKEN_AUTH_CACHE_SIZE=10000, TOKEN_AUTH_CACHE_ALIAS=None)
+    def test_per_process_token_cache_fails_the_check_with_several_workers(self):
+        self.assertEqual([error.id for error in check_token_cache_is_shared(None)], ["user.E001"])
+        with override_settings(TOKEN_AUTH_CACHE_SIZE=0):
+            self.assertEqual(check_token_cache_is_shared(None), [])
+            with override_settings(TOKEN_AUTH_CACHE_ALIAS="default"):
+                self.assertEqual([error.id for error in check_token_cache_is_shared(None)], ["user.E001"])
@@ -68,6 +68,7 @@ class UserProfile(APIView):
     View for retrieving user profile.
     """
     permission_classes = (permissions.IsAuthenticated,)
+    query_budget = {'GET': 2}
 
     def get(self, request, format=None):
         """